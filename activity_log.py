@@ -1,5 +1,11 @@
-from psycopg2.extras import RealDictCursor
 from db_pool import get_connection
+from statements import prepared
+from tracing import traced
+
+INSERT_ACTIVITY = prepared('activity_insert', '''
+    INSERT INTO activity_logs (user_id, username, action_type, action_details)
+    VALUES (%s, %s, %s, %s)
+''')
 
 def init_activity_log_table():
     with get_connection() as conn:
@@ -15,20 +21,20 @@ def init_activity_log_table():
             )
         ''')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_activity_logs_created_at ON activity_logs(created_at DESC)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_activity_logs_action_created ON activity_logs(action_type, created_at DESC)')
         conn.commit()
         cur.close()
 
+@traced('db.log_activity')
 def log_activity(user_id, username, action_type, action_details=None):
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute('''
-            INSERT INTO activity_logs (user_id, username, action_type, action_details)
-            VALUES (%s, %s, %s, %s)
-        ''', (user_id, username, action_type, action_details))
+        INSERT_ACTIVITY.execute(cur, (user_id, username, action_type, action_details))
         conn.commit()
         cur.close()
 
 def get_activity_logs(limit=100):
+    from psycopg2.extras import RealDictCursor
     with get_connection() as conn:
         cur = conn.cursor(cursor_factory=RealDictCursor)
         cur.execute('''
@@ -39,18 +45,64 @@ def get_activity_logs(limit=100):
         cur.close()
         return logs
 
+def get_activity_logs_page(page_size=50, before=None, username=None, action_type=None, date_from=None, date_to=None):
+    """
+    Keyset pagination over the log, newest first.
+    `before` is the (created_at, id) of the last row of the previous page; the
+    returned cursor is None when there is nothing older to show.
+    """
+    from psycopg2.extras import RealDictCursor
+    query = '''SELECT id, user_id, username, action_type, action_details, created_at
+               FROM activity_logs WHERE 1=1'''
+    params = []
+    if action_type:
+        query += ' AND action_type = %s'
+        params.append(action_type)
+    if username:
+        query += ' AND username = %s'
+        params.append(username)
+    if date_from:
+        query += ' AND created_at >= %s'
+        params.append(date_from)
+    if date_to:
+        query += ' AND created_at < %s'
+        params.append(date_to)
+    if before:
+        query += ' AND (created_at, id) < (%s, %s)'
+        params.extend(before)
+    query += ' ORDER BY created_at DESC, id DESC LIMIT %s'
+    params.append(page_size + 1)
+
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(query, params)
+        logs = cur.fetchall()
+        cur.close()
+
+    next_cursor = None
+    if len(logs) > page_size:
+        logs = logs[:page_size]
+        next_cursor = (logs[-1]['created_at'], logs[-1]['id'])
+    return logs, next_cursor
+
+ACTION_LABELS = {
+    'login': 'Connexion',
+    'logout': 'Déconnexion',
+    'ota_helper_open': 'Ouverture OTA Helper',
+    'ota_helper_generate': 'Génération résumé OTA',
+    'cms_helper_open': 'Ouverture CMS Helper',
+    'cms_helper_generate': 'Génération tableau CMS',
+    'cms_reconciliation': 'Rapprochement PMS / résumés',
+    'backoffice_open': 'Ouverture Back Office',
+    'analytics_open': 'Ouverture Tableau de bord',
+    'user_created': 'Création utilisateur',
+    'user_deleted': 'Suppression utilisateur',
+    'user_password_changed': 'Modification mot de passe',
+    'user_admin_toggled': 'Modification droits admin',
+    'parser_shadow_mismatch': 'Écart moteur candidat (shadow)',
+    'rule_telemetry_error': 'Échec télémétrie des règles',
+    'data_exported': 'Export de données'
+}
+
 def get_action_label(action_type):
-    labels = {
-        'login': 'Connexion',
-        'logout': 'Déconnexion',
-        'ota_helper_open': 'Ouverture OTA Helper',
-        'ota_helper_generate': 'Génération résumé OTA',
-        'cms_helper_open': 'Ouverture CMS Helper',
-        'cms_helper_generate': 'Génération tableau CMS',
-        'backoffice_open': 'Ouverture Back Office',
-        'user_created': 'Création utilisateur',
-        'user_deleted': 'Suppression utilisateur',
-        'user_password_changed': 'Modification mot de passe',
-        'user_admin_toggled': 'Modification droits admin'
-    }
-    return labels.get(action_type, action_type)
+    return ACTION_LABELS.get(action_type, action_type)
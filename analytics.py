@@ -0,0 +1,106 @@
+from db_pool import get_connection
+from statements import prepared
+
+ROLLUP_COLUMNS = ('booking_count', 'total_tarif', 'total_vad', 'total_commission')
+
+ADD_ROLLUP_DELTA = prepared('rollup_add_delta', '''
+    INSERT INTO summary_daily_rollups (day, platform, booking_count, total_tarif, total_vad, total_commission)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (day, platform) DO UPDATE SET
+        booking_count = summary_daily_rollups.booking_count + EXCLUDED.booking_count,
+        total_tarif = summary_daily_rollups.total_tarif + EXCLUDED.total_tarif,
+        total_vad = summary_daily_rollups.total_vad + EXCLUDED.total_vad,
+        total_commission = summary_daily_rollups.total_commission + EXCLUDED.total_commission
+''')
+
+def init_analytics_tables():
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS summary_daily_rollups (
+                day DATE NOT NULL,
+                platform VARCHAR(100) NOT NULL,
+                booking_count INTEGER NOT NULL DEFAULT 0,
+                total_tarif DECIMAL(12, 2) NOT NULL DEFAULT 0,
+                total_vad DECIMAL(12, 2) NOT NULL DEFAULT 0,
+                total_commission DECIMAL(12, 2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, platform)
+            )
+        ''')
+        cur.execute('SELECT EXISTS(SELECT 1 FROM summary_daily_rollups)')
+        has_rollups = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    if not has_rollups:
+        # First run on an existing history: build the rollups from scratch.
+        rebuild_rollups()
+
+def apply_rollup_delta(cur, day, platform, booking_count, tarif, vad, commission):
+    """
+    Add one booking (or remove it, with negative values) to the daily rollup.
+    Runs on the caller's cursor so it commits atomically with the summary row.
+    """
+    ADD_ROLLUP_DELTA.execute(cur, (day, platform or 'Inconnue', booking_count, tarif or 0, vad or 0, commission or 0))
+
+def rebuild_rollups(since=None):
+    """
+    Recompute the rollups from the raw summaries, from `since` (a date) onwards
+    or for the whole history. Used for the initial backfill and for repairs.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        if since is None:
+            cur.execute('DELETE FROM summary_daily_rollups')
+            where, params = '', ()
+        else:
+            cur.execute('DELETE FROM summary_daily_rollups WHERE day >= %s', (since,))
+            where, params = 'WHERE created_at >= %s', (since,)
+        cur.execute(f'''
+            INSERT INTO summary_daily_rollups (day, platform, booking_count, total_tarif, total_vad, total_commission)
+            SELECT CAST(created_at AS DATE), COALESCE(platform, 'Inconnue'), COUNT(*),
+                   COALESCE(SUM(tarif), 0), COALESCE(SUM(vad), 0), COALESCE(SUM(commission), 0)
+            FROM summaries {where}
+            GROUP BY CAST(created_at AS DATE), COALESCE(platform, 'Inconnue')
+        ''', params)
+        count = cur.rowcount
+        conn.commit()
+        cur.close()
+        return count
+
+def get_daily_rollups(date_from, date_to, platform=None):
+    """Daily rollup rows between two dates (inclusive), oldest first."""
+    query = '''SELECT day, platform, booking_count, total_tarif, total_vad, total_commission
+               FROM summary_daily_rollups WHERE day >= %s AND day <= %s'''
+    params = [date_from, date_to]
+    if platform:
+        query += ' AND platform = %s'
+        params.append(platform)
+    query += ' ORDER BY day, platform'
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        rows = [dict(zip(('day', 'platform') + ROLLUP_COLUMNS, row)) for row in cur.fetchall()]
+        cur.close()
+        return rows
+
+def get_platform_totals(date_from, date_to):
+    """Totals per platform between two dates (inclusive), read from the rollups only."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''
+            SELECT platform, SUM(booking_count), SUM(total_tarif), SUM(total_vad), SUM(total_commission)
+            FROM summary_daily_rollups WHERE day >= %s AND day <= %s
+            GROUP BY platform ORDER BY SUM(total_tarif) DESC
+        ''', (date_from, date_to))
+        rows = [dict(zip(('platform',) + ROLLUP_COLUMNS, row)) for row in cur.fetchall()]
+        cur.close()
+        return rows
+
+if __name__ == '__main__':
+    import argparse
+    from datetime import date
+
+    parser = argparse.ArgumentParser(description="Reconstruit les agrégats journaliers par plateforme.")
+    parser.add_argument('--since', type=date.fromisoformat, help="Date de début (AAAA-MM-JJ), tout l'historique par défaut")
+    args = parser.parse_args()
+    print(f"{rebuild_rollups(args.since)} agrégats journaliers reconstruits")
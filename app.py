@@ -1,14 +1,32 @@
+import importlib
 import streamlit as st
-from views import ota_helper, cms_helper, backoffice
 from auth import init_users_table, verify_user, create_user, user_exists
-from activity_log import init_activity_log_table, log_activity
+from activity_log import init_activity_log_table
+from rule_telemetry import init_rule_stats_table
+from views.cache import record_activity
 
 st.set_page_config(page_title="Hôtel du Causse Comtal - Outils",
                    page_icon="🏰",
                    layout="wide")
 
-init_users_table()
-init_activity_log_table()
+
+@st.cache_resource(show_spinner=False)
+def init_tables():
+    # Une seule fois par processus, et non à chaque rerun du script.
+    init_users_table()
+    init_activity_log_table()
+    init_rule_stats_table()
+    return True
+
+
+init_tables()
+
+VIEW_MODULES = {
+    'ota': 'views.ota_helper',
+    'cms': 'views.cms_helper',
+    'backoffice': 'views.backoffice',
+    'analytics': 'views.analytics',
+}
 
 if 'current_app' not in st.session_state:
     st.session_state.current_app = None
@@ -57,7 +75,7 @@ def show_login():
                     user = verify_user(username, password)
                     if user:
                         st.session_state.user = user
-                        log_activity(user['id'], user['username'], 'login')
+                        record_activity(user['id'], user['username'], 'login')
                         st.rerun()
                     else:
                         st.error("Identifiants incorrects.")
@@ -74,7 +92,7 @@ def show_home():
     with col_user:
         st.markdown(f"**{st.session_state.user['username']}**")
         if st.button("Déconnexion", key="logout_btn"):
-            log_activity(st.session_state.user['id'], st.session_state.user['username'], 'logout')
+            record_activity(st.session_state.user['id'], st.session_state.user['username'], 'logout')
             st.session_state.user = None
             st.session_state.current_app = None
             st.rerun()
@@ -106,7 +124,7 @@ def show_home():
                      use_container_width=True,
                      type="primary"):
             st.session_state.current_app = 'ota'
-            log_activity(st.session_state.user['id'], st.session_state.user['username'], 'ota_helper_open')
+            record_activity(st.session_state.user['id'], st.session_state.user['username'], 'ota_helper_open')
             st.rerun()
 
         st.markdown("""
@@ -140,7 +158,7 @@ def show_home():
                      use_container_width=True,
                      type="primary"):
             st.session_state.current_app = 'cms'
-            log_activity(st.session_state.user['id'], st.session_state.user['username'], 'cms_helper_open')
+            record_activity(st.session_state.user['id'], st.session_state.user['username'], 'cms_helper_open')
             st.rerun()
 
         st.markdown("""
@@ -164,7 +182,7 @@ def show_home():
         ">
             <h2 style="margin: 0; color: white;">⚙️ Back Office</h2>
             <p style="margin: 15px 0; opacity: 0.9;">
-                Gérez les utilisateurs et les accès à l'application
+                Gérez les utilisateurs et les accès, suivez le chiffre d'affaires par plateforme
             </p>
         </div>
         """,
@@ -175,14 +193,27 @@ def show_home():
                      use_container_width=True,
                      type="secondary"):
             st.session_state.current_app = 'backoffice'
-            log_activity(st.session_state.user['id'], st.session_state.user['username'], 'backoffice_open')
+            record_activity(st.session_state.user['id'], st.session_state.user['username'], 'backoffice_open')
+            st.rerun()
+
+        if st.button("Ouvrir le Tableau de bord",
+                     key="btn_analytics",
+                     use_container_width=True,
+                     type="secondary"):
+            st.session_state.current_app = 'analytics'
+            record_activity(st.session_state.user['id'], st.session_state.user['username'], 'analytics_open')
             st.rerun()
 
     st.markdown("---")
     st.caption("Hôtel du Causse Comtal - Socito Industries - Tous droits réservés © 2025")
 
 
-def show_app_with_nav(app_name, app_func):
+def load_view(app_name):
+    """Import a view module only once the user has selected it."""
+    return importlib.import_module(VIEW_MODULES[app_name])
+
+
+def show_app_with_nav(app_name):
     col_nav, col_spacer, col_user = st.columns([1, 4, 1])
     with col_nav:
         if st.button("← Accueil", key="back_home"):
@@ -194,22 +225,18 @@ def show_app_with_nav(app_name, app_func):
     with col_user:
         st.markdown(f"**{st.session_state.user['username']}**")
         if st.button("Déconnexion", key="logout_nav"):
-            log_activity(st.session_state.user['id'], st.session_state.user['username'], 'logout')
+            record_activity(st.session_state.user['id'], st.session_state.user['username'], 'logout')
             st.session_state.user = None
             st.session_state.current_app = None
             st.rerun()
 
     st.markdown("---")
-    app_func()
+    load_view(app_name).run()
 
 
 if st.session_state.user is None:
     show_login()
-elif st.session_state.current_app == 'ota':
-    show_app_with_nav('ota', ota_helper.run)
-elif st.session_state.current_app == 'cms':
-    show_app_with_nav('cms', cms_helper.run)
-elif st.session_state.current_app == 'backoffice':
-    show_app_with_nav('backoffice', backoffice.run)
+elif st.session_state.current_app in VIEW_MODULES:
+    show_app_with_nav(st.session_state.current_app)
 else:
     show_home()
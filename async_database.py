@@ -0,0 +1,187 @@
+import asyncio
+import os
+from datetime import datetime
+import activity_log
+import analytics
+import auth
+import database
+from db_pool import BACKEND, DATABASE_URL
+
+# Async variant of the data layer, for callers running an event loop (API
+# service, batch ingestion): the same operations as database.py, auth.py and
+# activity_log.py, as coroutines on an asyncpg pool. The Streamlit pages keep
+# the synchronous modules. asyncpg is optional (pip install asyncpg) and only
+# imported by get_pool(). On the SQLite backend the coroutines run the
+# synchronous functions in a worker thread.
+
+POOL_MAX = int(os.environ.get('OTA_ASYNC_POOL_MAX', '10'))
+
+_pool = None
+_pool_lock = None
+_pool_loop = None
+
+async def get_pool():
+    global _pool, _pool_lock, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool_loop is not loop:
+        # The lock and the asyncpg pool belong to the event loop that created
+        # them; each asyncio.run() gets its own.
+        _pool, _pool_lock, _pool_loop = None, asyncio.Lock(), loop
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                try:
+                    import asyncpg
+                except ImportError:
+                    raise RuntimeError("La couche async nécessite le paquet asyncpg (pip install asyncpg).")
+                _pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=POOL_MAX)
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+# The statements of the synchronous modules, with $n placeholders for asyncpg.
+INSERT_SUMMARY = database.INSERT_SUMMARY.numbered_query
+LOCK_RESERVATION = database.LOCK_RESERVATION.numbered_query
+ARCHIVE_VERSION = database.ARCHIVE_VERSION.numbered_query
+REPLACE_SUMMARY = database.REPLACE_SUMMARY.numbered_query
+INSERT_NEW_SUMMARY = database.INSERT_NEW_SUMMARY.numbered_query
+ADD_ROLLUP_DELTA = analytics.ADD_ROLLUP_DELTA.numbered_query
+INSERT_ACTIVITY = activity_log.INSERT_ACTIVITY.numbered_query
+
+async def _apply_rollup_delta(conn, day, platform, booking_count, tarif, vad, commission):
+    """analytics.apply_rollup_delta on an asyncpg connection."""
+    await conn.execute(ADD_ROLLUP_DELTA, day, platform or 'Inconnue', booking_count, tarif or 0, vad or 0, commission or 0)
+
+async def save_summary(data, summary_text, receptionist_name, email_raw):
+    """database.save_summary: insert, or replace and archive the previous version. Returns the id."""
+    if BACKEND == 'sqlite':
+        return await asyncio.to_thread(database.save_summary, data, summary_text, receptionist_name, email_raw)
+
+    values = database._summary_values(data, summary_text, receptionist_name, email_raw)
+    platform, reservation_id = values[0], database.reservation_key(values[3])
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            if reservation_id is None:
+                result = await conn.fetchrow(INSERT_SUMMARY, *values)
+            else:
+                for _ in range(2):
+                    previous = await conn.fetchrow(LOCK_RESERVATION, platform, reservation_id)
+                    if previous:
+                        await conn.execute(ARCHIVE_VERSION, previous['id'])
+                        await _apply_rollup_delta(conn, previous['created_at'].date(), platform, -1,
+                                                  -(previous['tarif'] or 0), -(previous['vad'] or 0),
+                                                  -(previous['commission'] or 0))
+                        upsert = REPLACE_SUMMARY
+                    else:
+                        upsert = INSERT_NEW_SUMMARY
+                    result = await conn.fetchrow(upsert, *values)
+                    if result:
+                        break
+            if result:
+                await _apply_rollup_delta(conn, result['created_at'].date(), platform, 1,
+                                          data.get('tarif'), data.get('vad'), data.get('commission'))
+    return result['id'] if result else None
+
+async def save_summaries(items):
+    """
+    Save (data, summary_text, receptionist_name, email_raw) tuples concurrently,
+    one pooled connection each; returns the ids in order.
+    """
+    return await asyncio.gather(*(save_summary(*item) for item in items))
+
+async def log_activity(user_id, username, action_type, action_details=None):
+    if BACKEND == 'sqlite':
+        return await asyncio.to_thread(activity_log.log_activity, user_id, username, action_type, action_details)
+    pool = await get_pool()
+    await pool.execute(INSERT_ACTIVITY, user_id, username, action_type, action_details)
+
+async def log_activities(entries):
+    """Insert many (user_id, username, action_type, action_details) entries in one round-trip batch."""
+    entries = [tuple(entry) + (None,) * (4 - len(entry)) for entry in entries]
+    if not entries:
+        return
+    if BACKEND == 'sqlite':
+        def insert_all():
+            for entry in entries:
+                activity_log.log_activity(*entry)
+        return await asyncio.to_thread(insert_all)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.executemany(INSERT_ACTIVITY, entries)
+
+async def verify_user(username, password):
+    """auth.verify_user: the user dict, or None."""
+    if BACKEND == 'sqlite':
+        return await asyncio.to_thread(auth.verify_user, username, password)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        user = await conn.fetchrow('''
+            SELECT id, username, password_hash, salt, is_admin
+            FROM users WHERE username = $1
+        ''', username.lower().strip())
+        if user and auth.hash_password(password, user['salt'])[0] == user['password_hash']:
+            await conn.execute('UPDATE users SET last_login = $1 WHERE id = $2', datetime.now(), user['id'])
+            return {'id': user['id'], 'username': user['username'], 'is_admin': user['is_admin']}
+    return None
+
+async def get_current_summary(platform, reservation_id):
+    if BACKEND == 'sqlite':
+        return await asyncio.to_thread(database.get_current_summary, platform, reservation_id)
+    pool = await get_pool()
+    row = await pool.fetchrow('''SELECT id, created_at, updated_at, version, platform, receptionist_name, guest_name,
+                                 reservation_id, tarif, vad, commission, date_arrivee, date_depart,
+                                 arrival_date, departure_date, sejour_details, summary_text
+                                 FROM summaries WHERE platform = $1 AND reservation_id = $2''',
+                              platform, reservation_id)
+    return dict(row) if row else None
+
+async def get_summaries(limit=50, search_query=None, platform_filter=None):
+    if BACKEND == 'sqlite':
+        return await asyncio.to_thread(database.get_summaries, limit, search_query, platform_filter)
+    query = '''SELECT id, created_at, platform, receptionist_name, guest_name, reservation_id,
+               tarif, vad, commission, date_arrivee, date_depart, sejour_details, summary_text
+               FROM summaries WHERE 1=1'''
+    params = []
+    if search_query:
+        params.append(f'%{search_query}%')
+        query += f' AND (guest_name ILIKE ${len(params)} OR reservation_id ILIKE ${len(params)})'
+    if platform_filter and platform_filter != 'all':
+        params.append(platform_filter)
+        query += f' AND platform = ${len(params)}'
+    params.append(limit)
+    query += f' ORDER BY created_at DESC LIMIT ${len(params)}'
+    pool = await get_pool()
+    return [dict(row) for row in await pool.fetch(query, *params)]
+
+async def get_activity_logs_page(page_size=50, before=None, username=None, action_type=None, date_from=None, date_to=None):
+    """activity_log.get_activity_logs_page: (logs, next_cursor)."""
+    if BACKEND == 'sqlite':
+        return await asyncio.to_thread(activity_log.get_activity_logs_page, page_size, before,
+                                       username, action_type, date_from, date_to)
+    query = '''SELECT id, user_id, username, action_type, action_details, created_at
+               FROM activity_logs WHERE 1=1'''
+    params = []
+    for condition, value in (('action_type = ${}', action_type), ('username = ${}', username),
+                             ('created_at >= ${}', date_from), ('created_at < ${}', date_to)):
+        if value:
+            params.append(value)
+            query += ' AND ' + condition.format(len(params))
+    if before:
+        params.extend(before)
+        query += f' AND (created_at, id) < (${len(params) - 1}, ${len(params)})'
+    params.append(page_size + 1)
+    query += f' ORDER BY created_at DESC, id DESC LIMIT ${len(params)}'
+
+    pool = await get_pool()
+    logs = [dict(row) for row in await pool.fetch(query, *params)]
+    next_cursor = None
+    if len(logs) > page_size:
+        logs = logs[:page_size]
+        next_cursor = (logs[-1]['created_at'], logs[-1]['id'])
+    return logs, next_cursor
@@ -1,11 +1,19 @@
 import hashlib
 import secrets
-from psycopg2.extras import RealDictCursor
 from datetime import datetime
 from db_pool import get_connection
+from statements import prepared
+from tracing import traced
 
 _user_exists_cache = None
 
+USER_BY_NAME = prepared('auth_user_by_name', '''
+    SELECT id, username, password_hash, salt, is_admin
+    FROM users WHERE username = %s
+''')
+SET_LAST_LOGIN = prepared('auth_set_last_login', 'UPDATE users SET last_login = %s WHERE id = %s')
+LIST_USERS = prepared('auth_list_users', 'SELECT id, username, is_admin, created_at, last_login FROM users ORDER BY created_at DESC')
+
 def init_users_table():
     with get_connection() as conn:
         cur = conn.cursor()
@@ -51,29 +59,30 @@ def create_user(username, password, is_admin=False):
         finally:
             cur.close()
 
+@traced('db.verify_user')
 def verify_user(username, password):
+    # Plain tuple cursor: the login page must not pull in psycopg2.extras.
     with get_connection() as conn:
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute('''
-            SELECT id, username, password_hash, salt, is_admin
-            FROM users WHERE username = %s
-        ''', (username.lower().strip(),))
+        cur = conn.cursor()
+        USER_BY_NAME.execute(cur, (username.lower().strip(),))
         user = cur.fetchone()
         
         if user:
-            password_hash, _ = hash_password(password, user['salt'])
-            if password_hash == user['password_hash']:
-                cur.execute('UPDATE users SET last_login = %s WHERE id = %s', (datetime.now(), user['id']))
+            user_id, user_name, stored_hash, salt, is_admin = user
+            password_hash, _ = hash_password(password, salt)
+            if password_hash == stored_hash:
+                SET_LAST_LOGIN.execute(cur, (datetime.now(), user_id))
                 conn.commit()
                 cur.close()
-                return {'id': user['id'], 'username': user['username'], 'is_admin': user['is_admin']}
+                return {'id': user_id, 'username': user_name, 'is_admin': is_admin}
         cur.close()
         return None
 
 def get_all_users():
+    from psycopg2.extras import RealDictCursor
     with get_connection() as conn:
         cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute('SELECT id, username, is_admin, created_at, last_login FROM users ORDER BY created_at DESC')
+        LIST_USERS.execute(cur)
         users = cur.fetchall()
         cur.close()
         return users
@@ -0,0 +1,155 @@
+"""
+Benchmark of the CMS Helper transform on multi-month PMS exports.
+
+Builds an export from the sample CSV of attached_assets/ (--months of daily
+check-ins, --rows-per-day rows) where a share of the rows are repeat guests
+(--repeat) and a share use Expedia relay addresses, then times:
+
+    ligne, sans cache       transform_row with the memoization bypassed
+    ligne, cache froid      transform_row, caches emptied before the run
+    ligne, cache chaud      transform_row, caches filled by a previous export
+                            (the next day's overlapping upload in the same process)
+    par colonne             lookup_table per column + Series.map
+    parse_csv_data          the full CSV -> DataFrame path of the page
+
+Each timing is the best of --runs. Also prints the hit rate of each cache
+on the cold run (cms_parser.normalizer_cache_info).
+
+    python benchmarks/bench_cms.py [--months 6] [--rows-per-day 60] [--repeat 0.4]
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cms_parser
+from cms_parser import (
+    clear_normalizer_caches,
+    lookup_table,
+    normalizer_cache_info,
+    parse_csv_data,
+    parse_name,
+    pms_records,
+    read_pms_csv,
+    transform_email,
+    transform_row,
+)
+
+SAMPLE = os.path.join(ROOT, 'attached_assets', 'checkin_2025-12-04_1765278769119.csv')
+
+SURNAMES = ['MARTIN', 'BERNARD', 'DUBOIS', 'THOMAS', 'ROBERT', 'RICHARD', 'PETIT', 'DURAND', 'LEROY', 'MOREAU',
+            'SIMON', 'LAURENT', 'LEFEBVRE', 'MICHEL', 'GARCIA', 'DAVID', 'BERTRAND', 'ROUX', 'VINCENT', 'FOURNIER']
+FIRST_NAMES = ['Jean', 'Marie', 'Pierre', 'Sophie', 'Luc', 'Claire', 'Paul', 'Julie', 'Marc', 'Anne', 'Hugo', 'Léa']
+
+
+def build_export(months, rows_per_day, repeat, relay_share, seed):
+    """CSV text of a synthetic export in the format of the sample."""
+    rng = random.Random(seed)
+    with open(SAMPLE, encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter=';')
+        header = next(reader)
+        templates = list(reader)
+    column = {name: i for i, name in enumerate(header)}
+
+    guests = []
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=';')
+    writer.writerow(header)
+    day = date(2025, 1, 1)
+    for n in range(months * 30 * rows_per_day):
+        if n % rows_per_day == 0 and n:
+            day += timedelta(days=1)
+        if guests and rng.random() < repeat:
+            # Regulars come back more often than occasional guests.
+            name, email = guests[min(int(rng.paretovariate(1.2)) - 1, len(guests) - 1)]
+        else:
+            name = f"{rng.choice(SURNAMES)}{len(guests)} {rng.choice(FIRST_NAMES)}"
+            local = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(10))
+            email = (f"{local}@m.expediapartnercentral.com" if rng.random() < relay_share
+                     else f"{local}@gmail.com")
+            guests.append((name, email))
+        row = list(templates[n % len(templates)])
+        row[column['Nom']] = name
+        row[column['Email']] = email
+        row[column['Référence']] = f"HCC{n}"
+        row[column['Date arrivée']] = day.isoformat()
+        writer.writerow(row)
+    return out.getvalue(), len(guests)
+
+
+def timed(func, runs, setup=None):
+    best = None
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def row_path(records):
+    return [transform_row(record) for record in records]
+
+
+def column_path(df):
+    names = df['Nom'].map(lookup_table(df['Nom'], parse_name))
+    emails = df['Email'].map(lookup_table(df['Email'], transform_email))
+    return names, emails
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--rows-per-day', type=int, default=60)
+    parser.add_argument('--repeat', type=float, default=0.4, help="Part des lignes de clients déjà venus")
+    parser.add_argument('--relay', type=float, default=0.35, help="Part des adresses relais Expedia")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    text, unique_guests = build_export(args.months, args.rows_per_day, args.repeat, args.relay, args.seed)
+    df = read_pms_csv(text)
+    records = pms_records(df)
+    print(f"Export : {len(records)} lignes, {unique_guests} clients distincts, {args.months} mois\n")
+
+    # Without memoization: the cached functions replaced by the functions they wrap.
+    cached = cms_parser._split_name, cms_parser._normalize_email
+    cms_parser._split_name, cms_parser._normalize_email = cached[0].__wrapped__, cached[1].__wrapped__
+    try:
+        uncached_seconds, uncached = timed(lambda: row_path(records), args.runs)
+    finally:
+        cms_parser._split_name, cms_parser._normalize_email = cached
+
+    cold_seconds, result = timed(lambda: row_path(records), args.runs, setup=clear_normalizer_caches)
+    if result != uncached:
+        sys.exit("Résultats différents avec et sans cache")
+    info = normalizer_cache_info()
+    warm_seconds, _ = timed(lambda: row_path(records), args.runs)
+
+    column_seconds, _ = timed(lambda: column_path(df), args.runs, setup=clear_normalizer_caches)
+    full_seconds, _ = timed(lambda: parse_csv_data(text), args.runs, setup=clear_normalizer_caches)
+
+    print(f"{'chemin':<26}{'ms':>10}{'µs/ligne':>10}")
+    for name, seconds in [('ligne, sans cache', uncached_seconds), ('ligne, cache froid', cold_seconds),
+                          ('ligne, cache chaud', warm_seconds), ('par colonne', column_seconds),
+                          ('parse_csv_data', full_seconds)]:
+        print(f"{name:<26}{seconds * 1000:>10.1f}{seconds / len(records) * 1e6:>10.2f}")
+
+    print(f"\n{'cache':<18}{'hits':>9}{'misses':>9}{'taux':>8}{'taille':>9}")
+    for name, stats in info.items():
+        calls = stats.hits + stats.misses
+        print(f"{name:<18}{stats.hits:>9}{stats.misses:>9}{stats.hits / calls if calls else 0:>8.1%}"
+              f"{stats.currsize:>9}")
+
+
+if __name__ == '__main__':
+    main()
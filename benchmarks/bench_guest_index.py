@@ -0,0 +1,115 @@
+"""
+Benchmark of the guest identity index (guest_index.py) on synthetic exports.
+
+Each synthetic guest appears one to several times, under the variants seen
+in the PMS exports: case swapped between name and first name ("Erard
+JOHANN"), doubled letter, accents dropped, a civility, a new Expedia relay
+address per booking. Prints the time to build the index and to dedupe the
+CMS table, the candidate pairs scored, and pairwise precision / recall
+against the known identities.
+
+    python benchmarks/bench_guest_index.py [--guests 15000] [--visits 2.5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cms_parser import transform_rows
+from guest_index import build_index, dedupe_cms, records_from_cms
+
+SURNAMES = ['MARTIN', 'BERNARD', 'DUBOIS', 'THOMAS', 'ROBERT', 'RICHARD', 'PETIT', 'DURAND', 'LEROY', 'MOREAU',
+            'SIMON', 'LAURENT', 'LEFEBVRE', 'MICHEL', 'GARCIA', 'DAVID', 'BERTRAND', 'ROUX', 'VINCENT', 'FOURNIER',
+            'MOREL', 'GIRARD', 'ANDRÉ', 'MERCIER', 'BLANC', 'GUÉRIN', 'BOYER', 'GARNIER', 'CHEVALIER', 'FRANÇOIS']
+FIRST_NAMES = ['Jean', 'Marie', 'Pierre', 'Sophie', 'Luc', 'Claire', 'Paul', 'Julie', 'Marc', 'Anne', 'Hugo', 'Léa',
+               'Émilie', 'Nicolas', 'Camille', 'Thomas', 'Manon', 'Louis', 'Chloé', 'Antoine', 'Inès', 'Jules']
+SYLLABLES = ['ba', 'ker', 'lo', 'mi', 'ran', 'tel', 'vi', 'son', 'dor', 'gue', 'nal', 'pre', 'chu', 'mon']
+
+
+def random_local(rng):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(10))
+
+
+def variant(rng, surname, first_name):
+    """A spelling of the guest's name as another PMS export could give it."""
+    kind = rng.random()
+    if kind < 0.15:
+        return f"{surname.capitalize()} {first_name.upper()}"  # case swapped
+    if kind < 0.25:
+        i = rng.randrange(1, len(surname))
+        return f"{surname[:i] + surname[i - 1] + surname[i:]} {first_name}"  # doubled letter
+    if kind < 0.30:
+        return f"{surname} Mr {first_name}"
+    if kind < 0.35:
+        return f"{surname.replace('É', 'E').replace('Ç', 'C')} {first_name.replace('é', 'e').replace('É', 'E')}"
+    return f"{surname} {first_name}"
+
+
+def build_rows(guests, visits, relay_share, seed):
+    rng = random.Random(seed)
+    rows, truth = [], []
+    names = set()
+    for guest in range(guests):
+        # Rare surnames for most guests, a common one for the others; no two
+        # guests share a full name (homonyms cannot be told apart by name).
+        while True:
+            surname = (rng.choice(SURNAMES) if rng.random() < 0.3
+                       else ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).upper())
+            first_name = rng.choice(FIRST_NAMES)
+            if (surname, first_name) not in names:
+                names.add((surname, first_name))
+                break
+        email = f"{random_local(rng)}@gmail.com"
+        for _ in range(max(1, int(rng.expovariate(1 / visits)))):
+            relay = rng.random() < relay_share
+            rows.append({
+                'Nom': variant(rng, surname, first_name),
+                'Email': f"{random_local(rng)}@m.expediapartnercentral.com" if relay else email,
+                'Date arrivée': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            })
+            truth.append(guest)
+    order = list(range(len(rows)))
+    rng.shuffle(order)
+    return [rows[i] for i in order], [truth[i] for i in order]
+
+
+def pairs(sizes):
+    return sum(n * (n - 1) // 2 for n in sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guests', type=int, default=15000)
+    parser.add_argument('--visits', type=float, default=2.5, help="Séjours moyens par client")
+    parser.add_argument('--relay', type=float, default=0.35, help="Part des réservations avec adresse relais")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows, truth = build_rows(args.guests, args.visits, args.relay, args.seed)
+    df = transform_rows(rows)
+    print(f"Export : {len(df)} lignes, {len(set(truth))} clients réels")
+
+    start = time.perf_counter()
+    guest_of, stats = build_index(records_from_cms(df))
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    deduped, _ = dedupe_cms(df)
+    dedupe_seconds = time.perf_counter() - start
+
+    true_pairs = pairs(Counter(truth).values())
+    found_pairs = pairs(Counter(guest_of).values())
+    correct_pairs = pairs(Counter(zip(guest_of, truth)).values())
+    print(f"Index : {index_seconds:.2f} s ({stats['distinct']} enregistrements distincts, "
+          f"{stats['pairs_scored']} paires comparées, {stats['blocks_skipped']} blocs ignorés)")
+    print(f"Dédoublonnage CMS : {dedupe_seconds:.2f} s, {len(df)} -> {len(deduped)} lignes")
+    print(f"Précision {correct_pairs / found_pairs if found_pairs else 1:.1%}, "
+          f"rappel {correct_pairs / true_pairs if true_pairs else 1:.1%} (par paires)")
+
+
+if __name__ == '__main__':
+    main()
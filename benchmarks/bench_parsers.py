@@ -0,0 +1,166 @@
+"""
+Throughput and latency benchmark of the OTA parsing pipeline.
+
+Every target (preprocessing, platform detection, each parse_* function,
+parse_email and the summary templates) runs over the same synthesized corpus
+(see corpus.py). A calibration workload that does not depend on the repo's
+code runs on each email just before the target; the baseline stores each
+target's mean, p50 and p99 time per email as multiples of the calibration's
+mean time, so it holds on any machine and under varying load.
+Results are compared to benchmarks/baseline_parsers.json; the script exits
+with status 1 when a target is slower than its baseline beyond the tolerance.
+
+    python benchmarks/bench_parsers.py                 # compare to the baseline
+    python benchmarks/bench_parsers.py --update        # store a new baseline
+    python benchmarks/bench_parsers.py --only parse_weekendesk --count 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parsers import (
+    detect_platform,
+    parse_email,
+    parse_weekendesk,
+    parse_expedia,
+    parse_keytel,
+    parse_smartbox,
+    parse_direct
+)
+from templates import generate_summary_with_template
+from preprocess import preprocess_email
+from benchmarks.corpus import synthesize
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_parsers.json')
+
+TARGETS = {
+    'preprocess_email': lambda text, data: preprocess_email(text),
+    'detect_platform': lambda text, data: detect_platform(text),
+    'parse_weekendesk': lambda text, data: parse_weekendesk(text),
+    'parse_expedia': lambda text, data: parse_expedia(text),
+    'parse_keytel': lambda text, data: parse_keytel(text),
+    'parse_smartbox': lambda text, data: parse_smartbox(text),
+    'parse_direct': lambda text, data: parse_direct(text),
+    'parse_email': lambda text, data: parse_email(text),
+    'generate_summary_with_template': lambda text, data: generate_summary_with_template(data, 'Maxime'),
+}
+
+
+# Below one calibration unit, the p99 of a target is made of scheduler and GC
+# pauses rather than of its own work: it is shown but not checked.
+P99_NOISE_FLOOR = 1.0
+
+
+def calibration(text, data):
+    """Fixed workload independent of the repo's code: the time unit of the baseline."""
+    return sum(len(line.strip().lower()) for line in text.splitlines())
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_target(func, corpus, parsed, rounds):
+    """
+    Timings of `func` over the corpus. The calibration workload runs on the
+    same email just before each call, so that 'unit_us' (its mean time per
+    email) follows the machine's speed during this very run.
+    """
+    durations = []
+    unit_ns = 0
+    for _ in range(rounds):
+        for (name, text), data in zip(corpus, parsed):
+            start = time.perf_counter_ns()
+            calibration(text, data)
+            middle = time.perf_counter_ns()
+            func(text, data)
+            durations.append(time.perf_counter_ns() - middle)
+            unit_ns += middle - start
+    durations.sort()
+    total_s = sum(durations) / 1e9
+    return {
+        'docs_per_s': round(len(durations) / total_s, 1),
+        'p50_us': round(percentile(durations, 50) / 1000, 1),
+        'p99_us': round(percentile(durations, 99) / 1000, 1),
+        'unit_us': unit_ns / len(durations) / 1000,
+    }
+
+
+def relative(result, unit_us):
+    """Mean, p50 and p99 time per email in calibration units."""
+    return {
+        'mean': round(1e6 / result['docs_per_s'] / unit_us, 3),
+        'p50': round(result['p50_us'] / unit_us, 3),
+        'p99': round(result['p99_us'] / unit_us, 3),
+    }
+
+
+def compare(name, ratios, baseline, tolerance):
+    """Regression messages for one target; p99 gets twice the tolerance (noisier)."""
+    failures = []
+    if not baseline:
+        return failures
+    for key, key_tolerance in (('mean', tolerance), ('p50', tolerance), ('p99', 2 * tolerance)):
+        if key == 'p99' and ratios[key] < P99_NOISE_FLOOR:
+            continue
+        if ratios[key] > baseline[key] * (1 + key_tolerance):
+            failures.append(f"{name}: {key} x{ratios[key]} > x{baseline[key]}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=400, help="Nombre d'emails du corpus synthétique")
+    parser.add_argument('--pad-kb', type=int, default=16, help="Taille du remplissage des variantes 'padded'")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', action='append', choices=sorted(TARGETS), help="Limiter à certaines cibles")
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--update', action='store_true', help="Enregistre les résultats comme nouvelle référence")
+    args = parser.parse_args()
+
+    corpus = synthesize(args.count, seed=args.seed, pad_kb=args.pad_kb)
+    parsed = [parse_email(text) for _, text in corpus]
+    size_mb = sum(len(text.encode('utf-8')) for _, text in corpus) / 1024 / 1024
+    print(f"Corpus : {len(corpus)} emails, {size_mb:.2f} Mo, {args.rounds} passes\n")
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    ratios = {}
+    failures = []
+    print(f"{'cible':<32}{'docs/s':>10}{'Mo/s':>8}{'p50 µs':>10}{'p99 µs':>10}{'unité µs':>10}{'x moy.':>9}{'x p50':>9}")
+    for name in args.only or TARGETS:
+        result = run_target(TARGETS[name], corpus, parsed, args.rounds)
+        ratios[name] = relative(result, result['unit_us'])
+        regressions = compare(name, ratios[name], baseline.get(name), args.tolerance)
+        failures.extend(regressions)
+        mb_per_s = result['docs_per_s'] * size_mb / len(corpus)
+        print(f"{name:<32}{result['docs_per_s']:>10.0f}{mb_per_s:>8.1f}{result['p50_us']:>10.1f}"
+              f"{result['p99_us']:>10.1f}{result['unit_us']:>10.1f}{ratios[name]['mean']:>9.2f}{ratios[name]['p50']:>9.2f}"
+              f"{'  REGRESSION' if regressions else ''}")
+
+    if args.update:
+        baseline.update(ratios)
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nRéférence enregistrée dans {os.path.relpath(BASELINE_FILE, ROOT)}")
+        return 0
+
+    if failures:
+        print('\n'.join(['', 'Régressions :'] + failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
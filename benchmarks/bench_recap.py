@@ -0,0 +1,140 @@
+"""
+Benchmark of the Weekendesk / Smartbox recap extraction on adversarial input.
+
+Compares the former DOTALL patterns with the line scanners of recap.py on
+inputs built to make the lazy groups backtrack: long forwarded threads without
+the closing 'Prix établissement', repeated start markers, long runs of blanks.
+The former patterns are quadratic there (tens of seconds from 16 KB), hence the
+small default size. --fuzz also checks that both give the same result on
+random emails assembled from recap fragments.
+
+    python benchmarks/bench_recap.py [--size-kb 8] [--fuzz 20000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import recap
+from benchmarks.corpus import load_samples
+
+LEGACY_WEEKENDESK_PATTERNS = [
+    r'externe[s]?\s+[àa]\s+votre\s+[eé]tablissement\)?(.+?)Prix\s+[eé]tablissement\s+pay[eé]\s+par\s+le\s+client',
+    r'R[eé]capitulatif\s+des\s+activit[eé]s(.+?)Prix\s+[eé]tablissement',
+    r'(\d{1,2}/\d{1,2}/\d{4}\s*\n(?:[\s\S]*?(?:\n\d{1,2}/\d{1,2}/\d{4}[\s\S]*?)*)?)(?=\s*Prix\s+[eé]tablissement|\s*$)',
+]
+LEGACY_SMARTBOX_PATTERNS = [
+    r'R[eé]capitulatif\s*[:\-]?\s*([^\n]+(?:\n[^\n]+)*?)(?=\s*(?:Prix|Total|Montant|$))',
+    r'D[eé]tails?\s+(?:du\s+)?s[eé]jour\s*[:\-]?\s*([^\n]+(?:\n[^\n]+)*?)(?=\s*(?:Prix|Total|Montant|$))',
+]
+
+
+def legacy_first_group(patterns, text):
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        if match:
+            return match.group(1)
+    return None
+
+
+def legacy_weekendesk(text):
+    return legacy_first_group(LEGACY_WEEKENDESK_PATTERNS, text)
+
+
+def legacy_smartbox(text):
+    return legacy_first_group(LEGACY_SMARTBOX_PATTERNS, text)
+
+
+def scan_weekendesk(text):
+    for start_pattern, end_pattern in recap.WEEKENDESK_SECTIONS:
+        block = recap.section_between(text, start_pattern, end_pattern)
+        if block is not None:
+            return block
+    return recap.weekendesk_dated_block(text, float('inf'))
+
+
+def scan_smartbox(text):
+    return recap.smartbox_block(text, float('inf'))
+
+
+def adversarial_inputs(size_kb):
+    """(name, text) pairs of about size_kb KB each."""
+    size = size_kb * 1024
+    forwarded = '> ' + 'Bonjour, merci pour votre retour.\n> ' * (size // 36)
+    return [
+        ('weekendesk sans fin de récapitulatif',
+         "Activités (externe à votre établissement)\n12/03/2025\nSpa\n" + forwarded),
+        ('weekendesk marqueurs répétés',
+         'externe à votre établissement\n' * (size // 30)),
+        ('weekendesk blancs finaux',
+         "12/03/2025\nSpa\n" + ' \n' * (size // 2) + 'x'),
+        ('smartbox ligne de blancs',
+         'Récapitulatif : Spa' + ' ' * size + '\n\nfin'),
+        ('smartbox bloc long sans prix',
+         'Récapitulatif : ' + 'activité\n' * (size // 9) + '\nfin'),
+    ]
+
+
+def timed(func, text):
+    start = time.perf_counter()
+    func(text)
+    return time.perf_counter() - start
+
+
+FRAGMENTS = [
+    'Récapitulatif', 'récapitulatif des activités', 'Détails du séjour', 'Details sejour',
+    'externe à votre établissement', 'externes a votre etablissement)', ')',
+    'Prix établissement payé par le client', 'Prix etablissement', 'Prix', 'Total', 'MONTANT', 'subtotal',
+    '12/03/2025', '1/2/2024', '123/04/20245', 'Spa', 'Dîner', ':', ' : ', '-', ' ', '  ', '\t', ' ',
+    '\n', '\n', '\n\n', ' \n', 'x',
+]
+
+
+def fuzz(count, seed):
+    """Number of random emails where the scanners disagree with the former patterns."""
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(count):
+        text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 25)))
+        for name, legacy, scan in (('weekendesk', legacy_weekendesk, scan_weekendesk),
+                                   ('smartbox', legacy_smartbox, scan_smartbox)):
+            expected, actual = legacy(text), scan(text)
+            if expected != actual:
+                failures += 1
+                if failures <= 5:
+                    print(f"✗ {name} {text!r}\n    attendu : {expected!r}\n    obtenu  : {actual!r}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=8)
+    parser.add_argument('--fuzz', type=int, default=0, help="Nombre d'emails aléatoires à comparer")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    samples = [(name, text) for name, text in load_samples()]
+    mismatches = sum(1 for _, text in samples
+                     if legacy_weekendesk(text) != scan_weekendesk(text) or legacy_smartbox(text) != scan_smartbox(text))
+    print(f"Échantillons attached_assets : {len(samples) - mismatches}/{len(samples)} identiques\n")
+
+    print(f"{'entrée':<40}{'avant (ms)':>12}{'après (ms)':>12}")
+    for name, text in adversarial_inputs(args.size_kb):
+        legacy = legacy_smartbox if name.startswith('smartbox') else legacy_weekendesk
+        scan = scan_smartbox if name.startswith('smartbox') else scan_weekendesk
+        print(f"{name:<40}{timed(legacy, text) * 1000:>12.1f}{timed(scan, text) * 1000:>12.1f}")
+
+    if args.fuzz:
+        failures = fuzz(args.fuzz, args.seed)
+        print(f"\nFuzz : {args.fuzz - failures}/{args.fuzz} emails identiques")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
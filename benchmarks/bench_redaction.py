@@ -0,0 +1,77 @@
+"""
+Benchmark of card-number masking on the save path.
+
+Compares the former three-pass masking with redaction.redact_card_numbers
+on the sample emails of attached_assets/, repeated to the requested size,
+with card numbers, phone numbers and reservation references mixed in.
+
+    python benchmarks/bench_redaction.py [--size-kb 512] [--repeat 20]
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from redaction import redact_card_numbers, redact_stream
+from benchmarks.corpus import load_samples
+
+LEGACY_PATTERNS = [r'\b(?:\d{4}[-\s]?){3}\d{4}\b', r'\b\d{15,16}\b', r'\b(?:\d{4}[-\s]?){2}\d{4,6}\b']
+
+INJECTED_LINES = [
+    "Numéro de carte : 4111 1111 1111 1111",
+    "Carte 5500-0055-5555-5559 exp 12/27",
+    "Carte : 4111\u00a01111\u00a01111\u00a01111",
+    "Carte :\t4111\t1111\t1111\t1111",
+    "Carte : 4111  1111  1111  1111",
+    "Téléphone : 06 44 35 91 00",
+    "Numéro de confirmation : 1030333758",
+    "Ref:1030333758/3029514843",
+    "Total : 1 234,56 EUR",
+]
+
+
+def legacy_sanitize(text):
+    for pattern in LEGACY_PATTERNS:
+        text = re.sub(pattern, '[CARTE MASQUÉE]', text)
+    return text
+
+
+def build_text(size_kb):
+    samples = [text for _, text in load_samples()]
+    chunk = '\n'.join(samples + INJECTED_LINES)
+    target = size_kb * 1024
+    return (chunk * (target // len(chunk) + 1))[:target]
+
+
+def stream_redact(text):
+    out = io.StringIO()
+    redact_stream(io.StringIO(text), out)
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    text = build_text(args.size_kb)
+    size_mb = len(text.encode('utf-8')) / 1024 / 1024
+
+    print(f"Texte : {size_mb:.2f} Mo, {args.repeat} répétitions")
+    print(f"{'méthode':<18}{'ms/passe':>10}{'Mo/s':>10}{'masquées':>10}")
+    for name, func in [('legacy (3 passes)', legacy_sanitize),
+                       ('redaction', redact_card_numbers),
+                       ('redaction stream', stream_redact)]:
+        seconds = min(timeit.repeat(lambda: func(text), number=1, repeat=args.repeat))
+        masked = func(text).count('[CARTE MASQUÉE]')
+        print(f"{name:<18}{seconds * 1000:>10.2f}{size_mb / seconds:>10.1f}{masked:>10}")
+
+
+if __name__ == '__main__':
+    main()
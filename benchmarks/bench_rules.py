@@ -0,0 +1,52 @@
+"""
+Per-rule cost of the extraction patterns of parsers.py.
+
+Runs parse_email over the synthesized corpus (see corpus.py) with the rule
+telemetry enabled and prints every (function, pattern) pair: backtracking
+patterns first, then patterns that never matched, then by total time.
+Nothing is written to the database.
+
+    python benchmarks/bench_rules.py [--count 400] [--pad-kb 64] [--top 30]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import rule_telemetry
+from parsers import parse_email
+from benchmarks.corpus import synthesize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=400, help="Nombre d'emails du corpus synthétique")
+    parser.add_argument('--pad-kb', type=int, default=64, help="Taille du remplissage des variantes 'padded'")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=0, help="Limiter l'affichage aux N premières règles")
+    parser.add_argument('--backtracking-us-per-kb', type=float, default=rule_telemetry.BACKTRACKING_US_PER_KB)
+    args = parser.parse_args()
+
+    corpus = synthesize(args.count, seed=args.seed, pad_kb=args.pad_kb)
+    rule_telemetry.FLUSH_INTERVAL = 0
+    rule_telemetry.set_enabled(True)
+    for _, text in corpus:
+        parse_email(text)
+    rule_telemetry.set_enabled(False)
+
+    rows = rule_telemetry.rank(rule_telemetry.pending_stats(), args.backtracking_us_per_kb)
+    if args.top:
+        rows = rows[:args.top]
+
+    print(f"Corpus : {len(corpus)} emails\n")
+    print(f"{'diagnostic':<14}{'fonction':<36}{'appels':>8}{'succès':>8}{'moy. µs':>10}{'max µs':>10}{'µs/Ko':>9}  motif")
+    for row in rows:
+        pattern = row['pattern'] if len(row['pattern']) <= 60 else row['pattern'][:57] + '...'
+        print(f"{row['verdict']:<14}{row['site']:<36}{row['calls']:>8}{row['hits']:>8}{row['avg_us']:>10.1f}"
+              f"{row['max_us']:>10.1f}{row['worst_us_per_kb']:>9.1f}  {pattern}")
+
+
+if __name__ == '__main__':
+    main()
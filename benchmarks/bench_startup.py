@@ -0,0 +1,125 @@
+"""
+Import-time budget for the Streamlit entry point.
+
+Runs `python -X importtime` in a fresh interpreter that imports app.py for
+real, i.e. renders the login page in bare mode, so the imports made at run
+time by init_tables() and the login form are counted too; then the same plus
+each view. Needs DATABASE_URL, like the app. Each profile is measured relative
+to a calibration profile (streamlit alone, which every page pays for) in the
+same run, so the stored budgets are ratios that hold on any machine. The login
+page must also never import FORBIDDEN_AT_LOGIN.
+
+    python benchmarks/bench_startup.py            # report, exit 1 on regression
+    python benchmarks/bench_startup.py --update   # store the current ratios
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_budget.json')
+
+VIEW_MODULES = ['views.ota_helper', 'views.cms_helper', 'views.backoffice', 'views.analytics']
+
+# Entry point of the login profile. Its own time includes the database calls
+# of the login page, so only the modules it pulls in are counted.
+ENTRY_MODULE = 'app'
+
+# Modules the login page must never pull in.
+FORBIDDEN_AT_LOGIN = ['pandas', 'numpy', 'psycopg2.extras']
+
+# What every page pays whatever the app does; the budgets are multiples of it.
+CALIBRATION_MODULES = ['streamlit']
+
+DEFAULT_TOLERANCE = 0.15
+
+
+def measure(modules):
+    """Import `modules` in a fresh interpreter and return (total_us, imported)."""
+    code = '\n'.join(f'import {m}' for m in modules)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line.split('|')
+        name = name.strip()
+        imported.add(name)
+        if name != ENTRY_MODULE:
+            total_us += int(self_us.split(':')[1])
+    return total_us, imported
+
+
+def run_profiles(profiles, repeat):
+    """
+    Median import time (ms) and imported modules of each profile. Profiles are
+    measured in turn on each repetition so that they share the machine's load.
+    """
+    timings = {name: [] for name in profiles}
+    imported = {}
+    for _ in range(repeat):
+        for name, modules in profiles.items():
+            total_us, imported[name] = measure(modules)
+            timings[name].append(total_us)
+    return {name: statistics.median(values) / 1000 for name, values in timings.items()}, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--update', action='store_true', help="Enregistre les ratios mesurés comme nouveau budget")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    profiles = {'calibration': CALIBRATION_MODULES, 'login': [ENTRY_MODULE]}
+    for view in VIEW_MODULES:
+        profiles[view] = [ENTRY_MODULE, view]
+
+    timings, imported = run_profiles(profiles, args.repeat)
+    calibration_ms = timings.pop('calibration')
+    failures = []
+    leaked = [m for m in FORBIDDEN_AT_LOGIN if m in imported['login']]
+    if leaked:
+        failures.append(f"login imports {', '.join(leaked)}")
+    ratios = {name: round(ms / calibration_ms, 3) for name, ms in timings.items()}
+
+    budget = {}
+    if os.path.exists(BUDGET_FILE):
+        with open(BUDGET_FILE, encoding='utf-8') as f:
+            budget = json.load(f)
+
+    print(f"Calibration ({', '.join(CALIBRATION_MODULES)}) : {calibration_ms:.1f} ms\n")
+    print(f"{'profile':<22}{'import (ms)':>12}{'ratio':>8}{'budget':>8}")
+    for name, ratio in ratios.items():
+        limit = budget.get(name)
+        flag = ''
+        if limit is not None and ratio > limit * (1 + args.tolerance):
+            flag = '  REGRESSION'
+            failures.append(f"{name}: x{ratio} > x{limit} (+{args.tolerance:.0%})")
+        print(f"{name:<22}{timings[name]:>12.1f}{ratio:>8.3f}{(limit if limit is not None else '-'):>8}{flag}")
+
+    if args.update:
+        with open(BUDGET_FILE, 'w', encoding='utf-8') as f:
+            json.dump(ratios, f, indent=2)
+            f.write('\n')
+        print(f"Budget enregistré dans {os.path.relpath(BUDGET_FILE, ROOT)}")
+        return 0
+
+    if failures:
+        print('\n'.join(['', 'Échec :'] + failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Latency of the storage backends on the app's own data functions.
+
+Runs the same workload (save_summary, history and log pages, login, rollup
+totals) against each DATABASE_URL given, each in a fresh process since the
+backend is chosen when db_pool is imported, and prints p50/p95 per
+operation and backend. The workload writes to the usual tables: point it at
+a scratch database only. Without --url, a temporary SQLite file is used.
+
+    python benchmarks/bench_storage.py [--url sqlite:///bench.db] [--url postgresql://.../scratch] [--rounds 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_workload(rounds):
+    """Timings in ms per operation, for the backend of the current DATABASE_URL."""
+    from datetime import date, timedelta
+    import auth
+    import activity_log
+    import analytics
+    import database
+    from benchmarks.corpus import load_samples
+    from parsers import detect_platform, parse_email, generate_summary
+    from preprocess import preprocess_email
+
+    auth.init_users_table()
+    activity_log.init_activity_log_table()
+    database.init_db()
+    auth.create_user('bench', 'bench-password')
+
+    parsed = []
+    for _, text in load_samples():
+        email_text = preprocess_email(text)
+        data = parse_email(email_text, detect_platform(email_text))
+        parsed.append((data, generate_summary(data, 'Bench'), text))
+
+    today = date.today()
+    operations = {
+        'save_summary (nouvelle)': lambda i: database.save_summary(
+            dict(parsed[i % len(parsed)][0], reservation_id=f"BENCH{time.time_ns()}"),
+            parsed[i % len(parsed)][1], 'Bench', parsed[i % len(parsed)][2]),
+        'save_summary (modification)': lambda i: database.save_summary(
+            dict(parsed[i % len(parsed)][0], reservation_id=f"BENCH-MODIF-{i % 10}"),
+            parsed[i % len(parsed)][1], 'Bench', parsed[i % len(parsed)][2]),
+        'get_summaries (50)': lambda i: database.get_summaries(50),
+        'get_summaries (recherche)': lambda i: database.get_summaries(50, search_query='dupont'),
+        'get_overlapping_stays': lambda i: database.get_overlapping_stays(today, today + timedelta(days=30)),
+        'log_activity': lambda i: activity_log.log_activity(1, 'bench', 'login'),
+        'get_activity_logs_page (50)': lambda i: activity_log.get_activity_logs_page(50),
+        'verify_user': lambda i: auth.verify_user('bench', 'bench-password'),
+        'get_platform_totals': lambda i: analytics.get_platform_totals(today - timedelta(days=365), today),
+    }
+    timings = {}
+    for name, operation in operations.items():
+        durations = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            operation(i)
+            durations.append((time.perf_counter() - start) * 1000)
+        timings[name] = sorted(durations)
+    return {name: {'p50': percentile(d, 50), 'p95': percentile(d, 95)} for name, d in timings.items()}
+
+
+def measure(url, rounds):
+    env = dict(os.environ, DATABASE_URL=url)
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', '--rounds', str(rounds)],
+                             env=env, cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        sys.exit(f"Échec sur {url} :\n{process.stderr.strip().splitlines()[-1]}")
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', action='append', help="DATABASE_URL d'une base jetable (répétable)")
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_workload(args.rounds)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = args.url or [f"sqlite:///{os.path.join(tmp, 'bench.db')}"]
+        results = {url: measure(url, args.rounds) for url in urls}
+
+    schemes = [url.split(':', 1)[0] for url in urls]
+    labels = {url: scheme if schemes.count(scheme) == 1 else f"{scheme} #{i + 1}"
+              for i, (url, scheme) in enumerate(zip(urls, schemes))}
+    header = f"{'opération':<32}" + ''.join(f"{labels[url] + ' p50/p95 (ms)':>28}" for url in urls)
+    print(header)
+    for name in next(iter(results.values())):
+        cells = ''.join(f"{results[url][name]['p50']:>18.2f} / {results[url][name]['p95']:<7.2f}" for url in urls)
+        print(f"{name:<32}{cells}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Email corpus for the parser benchmarks and regression checks.
+
+The real samples come from attached_assets/. Keytel and Smartbox have no
+sample there, so representative emails are generated from the formats
+documented in replit.md. synthesize() derives a larger, deterministic corpus
+from these bases: line-ending and NBSP variants, forwarded-thread headers and
+quoted padding, mixed across platforms.
+"""
+import glob
+import os
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_DIR = os.path.join(ROOT, 'attached_assets')
+
+KEYTEL_TEMPLATE = """KEYTEL - Confirmation de réservation
+Hôtel Causse Comtal Rodez
+N° de réservation : KT{ref}
+Client : {first} {last}
+Date d'arrivée : {arrival}
+Date de départ : {departure}
+Chambre : {room}
+Régime : Petit-déjeuner inclus
+TOTAL A FACTURER
+Total : {price} EUR
+Paiement Keytel
+"""
+
+SMARTBOX_TEMPLATE = """Vous avez reçu une nouvelle réservation
+Smartbox infoinfo@serv.smartbox.com
+Cher partenaire,
+Bonne nouvelle ! Vous avez reçu une nouvelle réservation de la part de {first} {last}.
+Date d'arrivée : {arrival}
+Date de départ : {departure}
+Nuit(s) {nights} Personne(s) 2
+Coffret : {room}
+Récapitulatif : {nights} nuit(s) avec petit-déjeuner
+Dîner du terroir pour 2 personnes
+Prix client : {price} EUR
+Commission : {commission} EUR
+Prix hors commission : {net} EUR
+N° de réservation : SB{ref}
+"""
+
+FIRST_NAMES = ['Johann', 'Sophie', 'Olivier', 'Stéphanie', 'Hervé', 'Claire', 'Mathieu', 'Élodie']
+LAST_NAMES = ['Erard', 'Araujo', 'Coldre', 'Camilleri', 'Bonnet', 'Fabre', 'Roux', 'Vidal']
+ROOMS = ['Chambre Confort', 'Suite vue jardin', 'Chambre Supérieure Double', 'Single confort']
+
+FORWARD_HEADER = """---------- Forwarded message ---------
+De : Réception <reception@causse-comtal.fr>
+Date : lun. 8 déc. 2025 à 09:12
+Objet : Tr: Confirmation de réservation
+À : <direction@causse-comtal.fr>
+
+"""
+
+QUOTED_PARAGRAPH = """> Bonjour, merci de bien vouloir nous confirmer la bonne réception de cette
+> réservation ainsi que les conditions d'annulation applicables. Cordialement,
+> L'équipe réservation
+>
+"""
+
+
+def load_samples():
+    """Real emails from attached_assets/, as a list of (name, text)."""
+    samples = []
+    for path in sorted(glob.glob(os.path.join(ASSETS_DIR, '*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            samples.append((os.path.basename(path), f.read()))
+    return samples
+
+
+def generated_samples(rng, count=2):
+    """Keytel and Smartbox emails built from the documented formats."""
+    samples = []
+    for i in range(count):
+        day = rng.randint(1, 25)
+        nights = rng.randint(1, 3)
+        price = rng.randint(90, 600) + rng.choice([0, 0.5, 0.99])
+        commission = round(price * 0.2, 2)
+        values = {
+            'ref': rng.randint(100000, 999999),
+            'first': rng.choice(FIRST_NAMES),
+            'last': rng.choice(LAST_NAMES),
+            'arrival': f"{day:02d}/12/2025",
+            'departure': f"{day + nights:02d}/12/2025",
+            'nights': nights,
+            'room': rng.choice(ROOMS),
+            'price': f"{price:.2f}",
+            'commission': f"{commission:.2f}",
+            'net': f"{price - commission:.2f}",
+        }
+        samples.append((f"keytel-{i}", KEYTEL_TEMPLATE.format(**values)))
+        samples.append((f"smartbox-{i}", SMARTBOX_TEMPLATE.format(**values)))
+    return samples
+
+
+def base_corpus(seed=0):
+    """Real samples plus generated Keytel/Smartbox samples."""
+    return load_samples() + generated_samples(random.Random(seed))
+
+
+def _pad(text, rng, pad_kb):
+    padding = QUOTED_PARAGRAPH * max(1, (pad_kb * 1024) // len(QUOTED_PARAGRAPH))
+    return text + '\n' + padding if rng.random() < 0.5 else FORWARD_HEADER + text + '\n' + padding
+
+
+VARIANTS = {
+    'original': lambda text, rng, pad_kb: text,
+    'crlf': lambda text, rng, pad_kb: text.replace('\n', '\r\n'),
+    'nbsp': lambda text, rng, pad_kb: text.replace(' EUR', '\u00a0EUR').replace(' : ', '\u00a0: '),
+    'forwarded': lambda text, rng, pad_kb: FORWARD_HEADER + text,
+    'padded': _pad,
+}
+
+
+def synthesize(count, seed=0, pad_kb=16, variants=None):
+    """
+    A deterministic corpus of `count` emails as a list of (name, text), mixing
+    every base sample and platform with the requested variants.
+    """
+    rng = random.Random(seed)
+    bases = base_corpus(seed)
+    variant_names = variants or list(VARIANTS)
+    corpus = []
+    for i in range(count):
+        name, text = bases[i % len(bases)]
+        variant = variant_names[rng.randrange(len(variant_names))]
+        corpus.append((f"{name}#{variant}", VARIANTS[variant](text, rng, pad_kb)))
+    rng.shuffle(corpus)
+    return corpus
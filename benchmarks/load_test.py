@@ -0,0 +1,235 @@
+"""
+Load test: concurrent front-desk sessions on the real application flows.
+
+Each simulated receptionist logs in (verify_user + log), then loops over the
+flows below, picked at random according to --mix, with an optional think
+time between clicks:
+
+    ota         preprocess + parse + render + save_summary + log_activity
+    cms         PMS CSV transform + log_activity
+    backoffice  user list + activity log page + history page
+
+Sessions run on threads, or as asyncio tasks handing the blocking calls to a
+thread pool (--mode asyncio), as an async server would. Reports throughput,
+latency percentiles per flow, connection pool waits (db_pool.pool_stats) and
+errors. The flows write to the usual tables: use a scratch database.
+Without --url, a temporary SQLite file is used.
+
+    python benchmarks/load_test.py --sessions 20 --duration 30 [--url postgresql://.../scratch]
+    python benchmarks/load_test.py --sessions 20 --pool-max 10 --mix ota=6,cms=1,backoffice=1
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = 'ota=5,cms=1,backoffice=1'
+CMS_SAMPLE = os.path.join(ROOT, 'attached_assets', 'checkin_2025-12-04_1765278769119.csv')
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def parse_mix(spec):
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Flows:
+    """The application flows, driven through the same functions as the pages."""
+
+    def __init__(self):
+        import activity_log
+        import auth
+        import cms_parser
+        import database
+        from benchmarks.corpus import load_samples
+        from parsers import detect_platform, generate_summary, parse_email
+        from preprocess import preprocess_email
+
+        self.activity_log, self.auth, self.cms_parser, self.database = activity_log, auth, cms_parser, database
+        self.detect_platform, self.parse_email, self.generate_summary = detect_platform, parse_email, generate_summary
+        self.preprocess_email = preprocess_email
+        self.emails = [text for _, text in load_samples()]
+        with open(CMS_SAMPLE, encoding='utf-8-sig') as f:
+            self.cms_csv = f.read()
+
+    def setup(self, sessions):
+        self.auth.init_users_table()
+        self.activity_log.init_activity_log_table()
+        self.database.init_db()
+        for i in range(sessions):
+            self.auth.create_user(f'charge{i}', 'charge-password')
+
+    def login(self, session):
+        user = self.auth.verify_user(f'charge{session}', 'charge-password')
+        if user is None:
+            raise RuntimeError("connexion refusée")
+        self.activity_log.log_activity(user['id'], user['username'], 'login')
+        return user
+
+    def ota(self, user, rng):
+        email_text = self.preprocess_email(rng.choice(self.emails))
+        platform = self.detect_platform(email_text)
+        data = self.parse_email(email_text, platform)
+        # A fresh reference half of the time, a modification of a known one otherwise.
+        data['reservation_id'] = f"LT{rng.randrange(10 ** 9)}" if rng.random() < 0.5 else f"LT-MODIF-{rng.randrange(50)}"
+        summary = self.generate_summary(data, user['username'])
+        self.database.save_summary(data, summary, user['username'], email_text)
+        self.activity_log.log_activity(user['id'], user['username'], 'ota_helper_generate', f"Plateforme: {platform}")
+
+    def cms(self, user, rng):
+        self.cms_parser.process_pms_file(self.cms_csv, ';')
+        self.activity_log.log_activity(user['id'], user['username'], 'cms_helper_generate')
+
+    def backoffice(self, user, rng):
+        self.auth.get_all_users()
+        self.activity_log.get_activity_logs_page(50)
+        self.database.get_summaries(50)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+
+    def record(self, flow, seconds, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies[flow].append(seconds * 1000)
+            else:
+                self.errors[(flow, error)] += 1
+
+
+def run_step(flows, recorder, flow, *args):
+    start = time.perf_counter()
+    try:
+        result = getattr(flows, flow)(*args)
+    except Exception as e:
+        recorder.record(flow, time.perf_counter() - start, f"{type(e).__name__}: {str(e).splitlines()[0][:80] if str(e) else ''}")
+        return None
+    recorder.record(flow, time.perf_counter() - start)
+    return result or True
+
+
+def thread_session(flows, recorder, session, mix, deadline, think, seed):
+    rng = random.Random(seed)
+    user = run_step(flows, recorder, 'login', session)
+    if user is None:
+        return
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        run_step(flows, recorder, rng.choices(names, weights)[0], user, rng)
+        if think:
+            time.sleep(rng.uniform(0, 2 * think))
+
+
+async def async_session(executor, flows, recorder, session, mix, deadline, think, seed):
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    user = await loop.run_in_executor(executor, run_step, flows, recorder, 'login', session)
+    if user is None:
+        return
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await loop.run_in_executor(executor, run_step, flows, recorder, rng.choices(names, weights)[0], user, rng)
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+
+
+def run_load(flows, sessions, mix, duration, think, mode, seed):
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    if mode == 'threads':
+        threads = [threading.Thread(target=thread_session,
+                                    args=(flows, recorder, i, mix, deadline, think, seed + i))
+                   for i in range(sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        async def main():
+            with ThreadPoolExecutor(sessions) as executor:
+                await asyncio.gather(*(async_session(executor, flows, recorder, i, mix, deadline, think, seed + i)
+                                       for i in range(sessions)))
+        asyncio.run(main())
+    return recorder
+
+
+def report(recorder, elapsed, pool):
+    total = sum(len(values) for values in recorder.latencies.values())
+    errors = sum(recorder.errors.values())
+    print(f"\n{total} opérations réussies en {elapsed:.1f} s — {total / elapsed:.1f} op/s, {errors} erreurs\n")
+    print(f"{'flux':<12}{'n':>7}{'op/s':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}")
+    for flow, values in sorted(recorder.latencies.items()):
+        values.sort()
+        print(f"{flow:<12}{len(values):>7}{len(values) / elapsed:>8.1f}{percentile(values, 50):>10.1f}"
+              f"{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}{values[-1]:>10.1f}")
+    print(f"\nPool : {pool['max_connections']} connexions max, {pool['acquisitions']} acquisitions, "
+          f"attente moyenne {pool['wait_mean_ms']:.2f} ms, p95 {pool['wait_p95_ms']:.2f} ms, "
+          f"max {pool['wait_max_ms']:.1f} ms, {pool['timeouts']} délais dépassés")
+    if recorder.errors:
+        print("\nErreurs :")
+        for (flow, error), count in recorder.errors.most_common(10):
+            print(f"  {count:>5} × {flow} — {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="DATABASE_URL d'une base jetable (SQLite temporaire par défaut)")
+    parser.add_argument('--sessions', type=int, default=10, help="Réceptionnistes simultanés")
+    parser.add_argument('--duration', type=float, default=20, help="Durée en secondes")
+    parser.add_argument('--think-ms', type=float, default=0, help="Pause moyenne entre deux actions")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Poids des flux (défaut : {DEFAULT_MIX})")
+    parser.add_argument('--mode', choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('--pool-max', type=int, help="Taille max du pool (OTA_DB_POOL_MAX)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - {'ota', 'cms', 'backoffice'}
+    if unknown:
+        parser.error(f"flux inconnu(s) : {', '.join(sorted(unknown))}")
+
+    tmp = None
+    if args.url:
+        os.environ['DATABASE_URL'] = args.url
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'load_test.db')}"
+    if args.pool_max:
+        os.environ['OTA_DB_POOL_MAX'] = str(args.pool_max)
+    # db_pool reads its configuration at import: only now.
+    import db_pool
+
+    flows = Flows()
+    flows.setup(args.sessions)
+    db_pool.reset_pool_stats()
+    print(f"{args.sessions} sessions ({args.mode}), {args.duration:g} s, base {db_pool.BACKEND}, mix {args.mix}")
+
+    start = time.perf_counter()
+    recorder = run_load(flows, args.sessions, mix, args.duration, args.think_ms / 1000, args.mode, args.seed)
+    report(recorder, time.perf_counter() - start, db_pool.pool_stats())
+    if tmp:
+        tmp.cleanup()
+    return 1 if recorder.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
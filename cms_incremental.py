@@ -0,0 +1,133 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from cms_parser import TRANSFORM_COLUMNS, pms_records, read_pms_csv, transform_rows, generate_markdown_table
+from db_pool import get_connection, execute_batch
+
+# Incremental CMS mode: daily PMS exports overlap, so only the guests that are
+# new or whose CMS fields changed since the last export are transformed and
+# emitted. Each row is fingerprinted by its Référence plus a 64-bit hash of
+# the columns the CMS output is built from; the seen-set keeps one
+# (reference, hash) pair per guest and per hotel, and forgets guests not seen
+# for SEEN_RETENTION_DAYS.
+
+DEFAULT_HOTEL = os.environ.get('OTA_HOTEL', 'causse-comtal')
+SEEN_RETENTION_DAYS = int(os.environ.get('OTA_CMS_SEEN_RETENTION_DAYS', '120'))
+
+# The columns read by cms_parser.transform_row: a change elsewhere (Statut,
+# Solde...) does not change the CMS line, so it does not re-emit the guest.
+FINGERPRINT_COLUMNS = TRANSFORM_COLUMNS
+
+LOOKUP_CHUNK = 500
+
+def init_cms_seen_table():
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS cms_seen_rows (
+                hotel VARCHAR(100) NOT NULL,
+                reference VARCHAR(100) NOT NULL,
+                fingerprint BIGINT NOT NULL,
+                seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (hotel, reference)
+            )
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_cms_seen_rows_seen_at ON cms_seen_rows(seen_at)')
+        conn.commit()
+        cur.close()
+
+def _text(value):
+    if value is None or value != value:  # NaN from pandas
+        return ''
+    return str(value).strip()
+
+def row_fingerprint(row):
+    """(reference, signed 64-bit hash of the CMS columns). Rows without Référence are keyed by their hash."""
+    content = '\x1f'.join(_text(row.get(column)) for column in FINGERPRINT_COLUMNS)
+    fingerprint = int.from_bytes(hashlib.blake2b(content.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+    reference = _text(row.get('Référence')) or f'#{fingerprint & 0xFFFFFFFFFFFFFFFF:016x}'
+    return reference, fingerprint
+
+def _load_seen(cur, hotel, references):
+    seen = {}
+    for start in range(0, len(references), LOOKUP_CHUNK):
+        chunk = references[start:start + LOOKUP_CHUNK]
+        cur.execute(f'''SELECT reference, fingerprint FROM cms_seen_rows
+                        WHERE hotel = %s AND reference IN ({', '.join(['%s'] * len(chunk))})''',
+                    [hotel] + chunk)
+        seen.update(cur.fetchall())
+    return seen
+
+def process_pms_file_incremental(file_content, hotel=DEFAULT_HOTEL, separator=';', mark_seen=False):
+    """
+    Like cms_parser.process_pms_file, but only for the rows not seen in a
+    previous export of this hotel (new guest or changed CMS fields).
+    Returns (df, markdown_output, stats) with stats = {'total', 'new', 'changed',
+    'unchanged', 'seen_rows'}. The seen-set is not updated unless mark_seen:
+    pass stats['seen_rows'] to record_seen() once the export reached the CMS.
+    """
+    rows = pms_records(read_pms_csv(file_content, separator), extra_columns=('Référence',))
+    keys = [row_fingerprint(row) for row in rows]
+    # Duplicate references within one file: the last row wins, as on import in the PMS.
+    latest = {reference: index for index, (reference, _) in enumerate(keys)}
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        seen = _load_seen(cur, hotel, list(latest))
+        cur.close()
+
+    emitted, unchanged = [], []
+    stats = {'total': len(rows), 'new': 0, 'changed': 0, 'unchanged': 0}
+    for reference, index in latest.items():
+        previous = seen.get(reference)
+        if previous == keys[index][1]:
+            stats['unchanged'] += 1
+            unchanged.append(reference)
+            continue
+        stats['new' if previous is None else 'changed'] += 1
+        emitted.append(index)
+    emitted.sort()
+    stats['seen_rows'] = {'emitted': [keys[index] for index in emitted], 'unchanged': unchanged}
+
+    if mark_seen:
+        record_seen(stats['seen_rows'], hotel)
+
+    df = transform_rows(rows[index] for index in emitted)
+    return df, generate_markdown_table(df), stats
+
+def record_seen(seen_rows, hotel=DEFAULT_HOTEL):
+    """
+    Record an export in the seen-set once it was sent to the CMS (download or
+    confirmation): seen_rows is stats['seen_rows'] of process_pms_file_incremental.
+    """
+    now = datetime.now()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        if seen_rows['emitted']:
+            execute_batch(cur, '''
+                INSERT INTO cms_seen_rows (hotel, reference, fingerprint, seen_at) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (hotel, reference) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, seen_at = EXCLUDED.seen_at
+            ''', [(hotel, reference, fingerprint, now) for reference, fingerprint in seen_rows['emitted']])
+        # Guests still present in the export stay in the seen-set; their
+        # seen_at is only rewritten once half the retention has passed.
+        unchanged = seen_rows['unchanged']
+        for start in range(0, len(unchanged), LOOKUP_CHUNK):
+            chunk = unchanged[start:start + LOOKUP_CHUNK]
+            cur.execute(f'''UPDATE cms_seen_rows SET seen_at = %s
+                            WHERE hotel = %s AND seen_at < %s
+                            AND reference IN ({', '.join(['%s'] * len(chunk))})''',
+                        [now, hotel, now - timedelta(days=SEEN_RETENTION_DAYS / 2)] + chunk)
+        cur.execute('DELETE FROM cms_seen_rows WHERE hotel = %s AND seen_at < %s',
+                    (hotel, now - timedelta(days=SEEN_RETENTION_DAYS)))
+        conn.commit()
+        cur.close()
+
+def forget_hotel(hotel=DEFAULT_HOTEL):
+    """Empty the seen-set of a hotel: the next export is emitted in full."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('DELETE FROM cms_seen_rows WHERE hotel = %s', (hotel,))
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
@@ -1,17 +1,40 @@
-import pandas as pd
 import re
 import io
+from functools import lru_cache
+
+# pandas est importé dans les fonctions qui en ont besoin : importer ce module
+# (et donc la page de connexion) reste léger lors des démarrages à froid.
+
+CMS_COLUMNS = ['Date de checkin', 'Nom', 'Prénom', 'Mail', 'Plan Tarifaire', 'Provenance', 'Groupe', 'Catégorie']
+
+# Colonnes PMS lues par transform_row.
+TRANSFORM_COLUMNS = ('Date arrivée', 'Date arrivee', 'Nom', 'Email')
+
+# Les clients réguliers et les adresses relais reviennent d'un export à
+# l'autre : les normalisations sont mémorisées (caches bornés), et partagées
+# entre le traitement ligne à ligne et les tables de correspondance
+# (lookup_table) d'un traitement par colonne.
+NORMALIZER_CACHE_SIZE = 65536
+
+# Adresses relais des plateformes : marqueur (en minuscules) -> valeur CMS.
+EMAIL_RELAY_LABELS = {
+    'm.expediapartnercentral.com': 'EXPEDIA',
+}
 
 def parse_name(full_name):
     """
     Sépare NOM Prénom à partir d'une chaîne.
     La partie en MAJUSCULES = Nom, le reste = Prénom.
     """
+    if isinstance(full_name, str):
+        return _split_name(full_name)
+    import pandas as pd
     if not full_name or pd.isna(full_name):
         return "_", "_"
-    
-    full_name = str(full_name).strip()
-    
+    return _split_name(str(full_name))
+
+@lru_cache(maxsize=NORMALIZER_CACHE_SIZE)
+def _split_name(full_name):
     words = full_name.split()
     nom_parts = []
     prenom_parts = []
@@ -29,28 +52,55 @@ def parse_name(full_name):
 
 def transform_email(email):
     """
-    Transforme l'email : si contient 'm.expediapartnercentral.com', retourne 'EXPEDIA'.
+    Transforme l'email : adresse relais d'une plateforme (EMAIL_RELAY_LABELS,
+    ex. 'm.expediapartnercentral.com') -> nom de la plateforme ('EXPEDIA').
     """
+    if isinstance(email, str):
+        return _normalize_email(email)
+    import pandas as pd
     if not email or pd.isna(email):
         return "_"
-    
-    email = str(email).strip()
-    
-    if "m.expediapartnercentral.com" in email.lower():
-        return "EXPEDIA"
-    
+    return _normalize_email(str(email))
+
+@lru_cache(maxsize=NORMALIZER_CACHE_SIZE)
+def _normalize_email(email):
+    email = email.strip()
+    lowered = email.lower()
+    for marker, label in EMAIL_RELAY_LABELS.items():
+        if marker in lowered:
+            return label
     return email if email else "_"
 
 def fill_empty(value):
     """Remplace les valeurs vides par '_'."""
+    if isinstance(value, str):
+        return value.strip() or "_"
+    import pandas as pd
     if pd.isna(value) or str(value).strip() == "":
         return "_"
     return str(value).strip()
 
-def parse_csv_data(file_content, separator=';'):
+def lookup_table(values, normalizer):
     """
-    Parse le contenu CSV et retourne un DataFrame transformé.
+    Table valeur -> résultat de la normalisation, calculée une fois par valeur
+    distincte (via les mêmes caches), pour transformer une colonne entière :
+    df['Nom'].map(lookup_table(df['Nom'], parse_name)).
+    """
+    return {value: normalizer(value) for value in dict.fromkeys(values)}
+
+def normalizer_cache_info():
+    """Statistiques des caches (hits, misses, maxsize, currsize) par normalisation."""
+    return {'parse_name': _split_name.cache_info(), 'transform_email': _normalize_email.cache_info()}
+
+def clear_normalizer_caches():
+    _split_name.cache_clear()
+    _normalize_email.cache_clear()
+
+def read_pms_csv(file_content, separator=';'):
+    """
+    Lit l'export PMS brut dans un DataFrame (colonnes d'origine).
     """
+    import pandas as pd
     try:
         df = pd.read_csv(io.StringIO(file_content), sep=separator, encoding='utf-8-sig')
     except Exception as e:
@@ -58,30 +108,52 @@ def parse_csv_data(file_content, separator=';'):
             df = pd.read_csv(io.StringIO(file_content), sep=separator, encoding='latin-1')
         except Exception as e2:
             raise ValueError(f"Impossible de lire le fichier CSV: {str(e2)}")
+    return df
+
+def parse_csv_data(file_content, separator=';'):
+    """
+    Parse le contenu CSV et retourne un DataFrame transformé.
+    """
+    df = read_pms_csv(file_content, separator)
+    return transform_rows(pms_records(df))
+
+def pms_records(df, extra_columns=()):
+    """
+    Les lignes du DataFrame PMS en dicts, limitées aux colonnes utiles
+    (bien plus rapide que iterrows sur les 21 colonnes de l'export).
+    """
+    columns = [column for column in TRANSFORM_COLUMNS + tuple(extra_columns) if column in df.columns]
+    return df[columns].to_dict('records')
+
+def transform_row(row):
+    """
+    Transforme une ligne PMS (Series ou dict) en ligne CMS.
+    """
+    date_checkin = fill_empty(row.get('Date arrivée', row.get('Date arrivee', '')))
     
-    result_data = []
+    full_name = row.get('Nom', '')
+    nom, prenom = parse_name(full_name)
     
-    for _, row in df.iterrows():
-        date_checkin = fill_empty(row.get('Date arrivée', row.get('Date arrivee', '')))
-        
-        full_name = row.get('Nom', '')
-        nom, prenom = parse_name(full_name)
-        
-        email = row.get('Email', '')
-        mail = transform_email(email)
-        
-        result_data.append({
-            'Date de checkin': date_checkin,
-            'Nom': nom,
-            'Prénom': prenom,
-            'Mail': mail,
-            'Plan Tarifaire': '_',
-            'Provenance': '_',
-            'Groupe': '_',
-            'Catégorie': '_'
-        })
+    email = row.get('Email', '')
+    mail = transform_email(email)
     
-    return pd.DataFrame(result_data)
+    return {
+        'Date de checkin': date_checkin,
+        'Nom': nom,
+        'Prénom': prenom,
+        'Mail': mail,
+        'Plan Tarifaire': '_',
+        'Provenance': '_',
+        'Groupe': '_',
+        'Catégorie': '_'
+    }
+
+def transform_rows(rows):
+    """
+    Transforme des lignes PMS en DataFrame CMS.
+    """
+    import pandas as pd
+    return pd.DataFrame([transform_row(row) for row in rows], columns=CMS_COLUMNS)
 
 def generate_markdown_table(df):
     """
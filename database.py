@@ -1,15 +1,61 @@
 import re
 from psycopg2.extras import RealDictCursor
-from db_pool import get_connection
+from db_pool import get_connection, execute_batch
+from analytics import init_analytics_tables, apply_rollup_delta, rebuild_rollups
+from date_parsing import normalize_date
+from redaction import redact_card_numbers
+from statements import prepared
+from tracing import traced
 
 def sanitize_card_numbers(text):
-    if not text:
-        return text
-    patterns = [r'\b(?:\d{4}[-\s]?){3}\d{4}\b', r'\b\d{15,16}\b', r'\b(?:\d{4}[-\s]?){2}\d{4,6}\b']
-    sanitized = text
-    for pattern in patterns:
-        sanitized = re.sub(pattern, '[CARTE MASQUÉE]', sanitized)
-    return sanitized
+    return redact_card_numbers(text)
+
+# Nuits du séjour : l'arrivée est incluse, le départ exclu. Seules les lignes dont
+# les deux dates sont connues et cohérentes sont indexées.
+STAY_RANGE = "daterange(arrival_date, departure_date, '[)')"
+STAY_RANGE_VALID = 'arrival_date IS NOT NULL AND departure_date IS NOT NULL AND departure_date >= arrival_date'
+
+SUMMARY_COLUMNS = (
+    'platform', 'receptionist_name', 'guest_name', 'reservation_id', 'tarif', 'vad', 'commission',
+    'date_arrivee', 'date_depart', 'arrival_date', 'departure_date', 'sejour_details', 'summary_text', 'email_raw'
+)
+
+# Lignes dont la référence sert de clé d'upsert : celles qui contiennent un chiffre.
+# Prédicat de l'index unique partiel et des ON CONFLICT ; les autres valeurs
+# ('de' capturé par un motif de secours...) restent stockées telles quelles.
+RESERVATION_KEYED = "reservation_id ~ '[0-9]'"
+RESERVATION_KEY_INDEX = 'idx_summaries_reservation_key'
+DIGIT = re.compile('[0-9]')
+
+# Colonnes conservées pour chaque version remplacée d'une réservation.
+VERSION_COLUMNS = (
+    'version', 'receptionist_name', 'guest_name', 'tarif', 'vad', 'commission',
+    'date_arrivee', 'date_depart', 'arrival_date', 'departure_date', 'summary_text'
+)
+
+# Statements of save_summary, prepared once per pooled connection.
+_columns = ', '.join(SUMMARY_COLUMNS)
+_placeholders = ', '.join(['%s'] * len(SUMMARY_COLUMNS))
+_updates = ', '.join(f'{col} = EXCLUDED.{col}' for col in SUMMARY_COLUMNS[1:])
+_version_columns = ', '.join(VERSION_COLUMNS)
+_upsert = f'''
+    INSERT INTO summaries ({_columns}) VALUES ({_placeholders})
+    ON CONFLICT (platform, reservation_id) WHERE {RESERVATION_KEYED}
+    {{}}
+    RETURNING id, created_at
+'''
+INSERT_SUMMARY = prepared('summary_insert', f'INSERT INTO summaries ({_columns}) VALUES ({_placeholders}) RETURNING id, created_at')
+LOCK_RESERVATION = prepared('summary_lock_reservation', '''
+    SELECT id, created_at, tarif, vad, commission FROM summaries
+    WHERE platform = %s AND reservation_id = %s FOR UPDATE
+''')
+ARCHIVE_VERSION = prepared('summary_archive_version', f'''
+    INSERT INTO summary_versions (summary_id, saved_at, {_version_columns})
+    SELECT id, COALESCE(updated_at, created_at), {_version_columns} FROM summaries WHERE id = %s
+''')
+REPLACE_SUMMARY = prepared('summary_replace', _upsert.format(
+    f'DO UPDATE SET {_updates}, version = summaries.version + 1, updated_at = CURRENT_TIMESTAMP'))
+INSERT_NEW_SUMMARY = prepared('summary_insert_new', _upsert.format('DO NOTHING'))
 
 def init_db():
     with get_connection() as conn:
@@ -34,27 +80,179 @@ def init_db():
         ''')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_summaries_created_at ON summaries(created_at DESC)')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_summaries_platform ON summaries(platform)')
+        cur.execute('ALTER TABLE summaries ADD COLUMN IF NOT EXISTS arrival_date DATE')
+        cur.execute('ALTER TABLE summaries ADD COLUMN IF NOT EXISTS departure_date DATE')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_summaries_arrival_date ON summaries(arrival_date)')
+        cur.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_summaries_stay ON summaries
+            USING GIST ({STAY_RANGE}) WHERE {STAY_RANGE_VALID}
+        ''')
+        cur.execute('ALTER TABLE summaries ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1')
+        cur.execute('ALTER TABLE summaries ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP')
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS summary_versions (
+                id SERIAL PRIMARY KEY,
+                summary_id INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                saved_at TIMESTAMP,
+                receptionist_name VARCHAR(200),
+                guest_name VARCHAR(200),
+                tarif DECIMAL(10, 2),
+                vad DECIMAL(10, 2),
+                commission DECIMAL(10, 2),
+                date_arrivee VARCHAR(50),
+                date_depart VARCHAR(50),
+                arrival_date DATE,
+                departure_date DATE,
+                summary_text TEXT
+            )
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_summary_versions_summary ON summary_versions(summary_id, version DESC)')
+        cur.execute(f"SELECT to_regclass('{RESERVATION_KEY_INDEX}') IS NOT NULL")
+        merged = 0
+        if not cur.fetchone()[0]:
+            merged = _merge_duplicate_reservations(cur)
+            cur.execute(f'''
+                CREATE UNIQUE INDEX {RESERVATION_KEY_INDEX}
+                ON summaries(platform, reservation_id) WHERE {RESERVATION_KEYED}
+            ''')
         conn.commit()
         cur.close()
+    init_analytics_tables()
+    if merged:
+        rebuild_rollups()
+
+def _merge_duplicate_reservations(cur):
+    """
+    One-off migration before the unique index exists: for every reservation
+    saved several times, keep the most recent row and move the older ones to
+    summary_versions. Returns the number of rows archived.
+    """
+    version_columns = ', '.join(VERSION_COLUMNS[1:])
+    cur.execute(f'''
+        WITH ranked AS (
+            SELECT id,
+                   FIRST_VALUE(id) OVER w AS keep_id,
+                   COUNT(*) OVER (PARTITION BY platform, reservation_id) - ROW_NUMBER() OVER w + 1 AS version
+            FROM summaries WHERE {RESERVATION_KEYED}
+            WINDOW w AS (PARTITION BY platform, reservation_id ORDER BY created_at DESC, id DESC)
+        )
+        INSERT INTO summary_versions (summary_id, version, saved_at, {version_columns})
+        SELECT r.keep_id, r.version, s.created_at, {', '.join('s.' + c for c in VERSION_COLUMNS[1:])}
+        FROM ranked r JOIN summaries s ON s.id = r.id
+        WHERE r.id <> r.keep_id
+    ''')
+    merged = cur.rowcount
+    if merged:
+        cur.execute(f'''
+            WITH ranked AS (
+                SELECT id, COUNT(*) OVER (PARTITION BY platform, reservation_id) AS versions,
+                       ROW_NUMBER() OVER (PARTITION BY platform, reservation_id ORDER BY created_at DESC, id DESC) AS rn
+                FROM summaries WHERE {RESERVATION_KEYED}
+            )
+            UPDATE summaries SET version = ranked.versions FROM ranked
+            WHERE summaries.id = ranked.id AND ranked.rn = 1 AND ranked.versions > 1
+        ''')
+        cur.execute(f'''
+            DELETE FROM summaries WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY platform, reservation_id ORDER BY created_at DESC, id DESC) AS rn
+                    FROM summaries WHERE {RESERVATION_KEYED}
+                ) ranked WHERE rn > 1
+            )
+        ''')
+    return merged
+
+def _clean_reservation_id(reservation_id):
+    if reservation_id is None:
+        return None
+    return str(reservation_id).strip() or None
+
+def reservation_key(reservation_id):
+    """
+    The reservation id as a deduplication key, or None. Fallback patterns can
+    capture a plain word (e.g. 'de' from 'Numéro de réservation'); only values
+    containing a digit are treated as real references.
+    """
+    reservation_id = _clean_reservation_id(reservation_id)
+    if reservation_id is None or not DIGIT.search(reservation_id):
+        return None
+    return reservation_id
 
+def _summary_values(data, summary_text, receptionist_name, email_raw):
+    return (
+        data.get('platform'), receptionist_name, data.get('guest_name'), _clean_reservation_id(data.get('reservation_id')),
+        data.get('tarif'), data.get('vad'), data.get('commission'), data.get('dates_arrivee'),
+        data.get('dates_depart'),
+        data.get('arrival_date') or normalize_date(data.get('dates_arrivee')),
+        data.get('departure_date') or normalize_date(data.get('dates_depart')),
+        sanitize_card_numbers(data.get('sejour_details')),
+        sanitize_card_numbers(summary_text), sanitize_card_numbers(email_raw)
+    )
+
+@traced('db.save_summary')
 def save_summary(data, summary_text, receptionist_name, email_raw):
+    """
+    Insert a summary, or, when the platform already sent this reservation_id
+    (modification, cancellation), replace the current row and archive the
+    previous version in summary_versions. Returns the summary id.
+    """
+    values = _summary_values(data, summary_text, receptionist_name, email_raw)
+    platform, reservation_id = values[0], reservation_key(values[3])
+
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute('''
-            INSERT INTO summaries (platform, receptionist_name, guest_name, reservation_id,
-                tarif, vad, commission, date_arrivee, date_depart, sejour_details, summary_text, email_raw)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
-        ''', (
-            data.get('platform'), receptionist_name, data.get('guest_name'), data.get('reservation_id'),
-            data.get('tarif'), data.get('vad'), data.get('commission'), data.get('dates_arrivee'),
-            data.get('dates_depart'), sanitize_card_numbers(data.get('sejour_details')),
-            sanitize_card_numbers(summary_text), sanitize_card_numbers(email_raw)
-        ))
-        result = cur.fetchone()
+        if reservation_id is None:
+            INSERT_SUMMARY.execute(cur, values)
+            result = cur.fetchone()
+        else:
+            # Two attempts: if a concurrent save inserts the same reservation
+            # between our lookup and our insert, the second pass archives it.
+            for _ in range(2):
+                LOCK_RESERVATION.execute(cur, (platform, reservation_id))
+                previous = cur.fetchone()
+                if previous:
+                    previous_id, previous_created_at, previous_tarif, previous_vad, previous_commission = previous
+                    ARCHIVE_VERSION.execute(cur, (previous_id,))
+                    apply_rollup_delta(cur, previous_created_at.date(), platform, -1,
+                                       -(previous_tarif or 0), -(previous_vad or 0), -(previous_commission or 0))
+                    upsert = REPLACE_SUMMARY
+                else:
+                    upsert = INSERT_NEW_SUMMARY
+                upsert.execute(cur, values)
+                result = cur.fetchone()
+                if result:
+                    break
+        if result:
+            apply_rollup_delta(cur, result[1].date(), platform, 1,
+                               data.get('tarif'), data.get('vad'), data.get('commission'))
         conn.commit()
         cur.close()
         return result[0] if result else None
 
+def get_current_summary(platform, reservation_id):
+    """Current state of a reservation: a single lookup on the unique index."""
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute('''SELECT id, created_at, updated_at, version, platform, receptionist_name, guest_name,
+                       reservation_id, tarif, vad, commission, date_arrivee, date_depart,
+                       arrival_date, departure_date, sejour_details, summary_text
+                       FROM summaries WHERE platform = %s AND reservation_id = %s''',
+                    (platform, reservation_id))
+        result = cur.fetchone()
+        cur.close()
+        return result
+
+def get_summary_versions(summary_id):
+    """Previous versions of a summary, most recent first."""
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(f'''SELECT saved_at, {', '.join(VERSION_COLUMNS)}
+                       FROM summary_versions WHERE summary_id = %s ORDER BY version DESC''', (summary_id,))
+        results = cur.fetchall()
+        cur.close()
+        return results
+
 def get_summaries(limit=50, search_query=None, platform_filter=None):
     with get_connection() as conn:
         cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -75,3 +273,83 @@ def get_summaries(limit=50, search_query=None, platform_filter=None):
         results = cur.fetchall()
         cur.close()
         return results
+
+def get_arrivals(day):
+    """Summaries whose stay starts on `day` (a date), e.g. tomorrow's arrivals."""
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute('''SELECT id, platform, guest_name, reservation_id, tarif, arrival_date, departure_date
+                       FROM summaries WHERE arrival_date = %s ORDER BY guest_name''', (day,))
+        results = cur.fetchall()
+        cur.close()
+        return results
+
+def get_arrivals_between(date_from, date_to):
+    """Summaries arriving between two dates (inclusive), for the PMS reconciliation."""
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute('''SELECT id, platform, guest_name, reservation_id, tarif, arrival_date, departure_date
+                       FROM summaries WHERE arrival_date BETWEEN %s AND %s''', (date_from, date_to))
+        results = cur.fetchall()
+        cur.close()
+        return results
+
+def get_overlapping_stays(date_from, date_to, platform_filter=None):
+    """Summaries whose stay shares at least one night with [date_from, date_to)."""
+    query = f'''SELECT id, platform, guest_name, reservation_id, tarif, arrival_date, departure_date
+                  FROM summaries
+                  WHERE {STAY_RANGE_VALID} AND {STAY_RANGE} && daterange(%s, %s, '[)')'''
+    params = [date_from, date_to]
+    if platform_filter and platform_filter != 'all':
+        query += ' AND platform = %s'
+        params.append(platform_filter)
+    query += ' ORDER BY arrival_date'
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(query, params)
+        results = cur.fetchall()
+        cur.close()
+        return results
+
+def backfill_stay_dates(batch_size=500):
+    """
+    Fill arrival_date/departure_date for rows saved before the typed columns
+    existed. Walks the table by id in short transactions; rows whose dates
+    cannot be parsed stay NULL. Returns the number of rows updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute('''SELECT id, date_arrivee, date_depart FROM summaries
+                           WHERE id > %s AND arrival_date IS NULL AND departure_date IS NULL
+                           ORDER BY id LIMIT %s''', (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                cur.close()
+                return updated
+            last_id = rows[-1][0]
+            values = []
+            for row_id, date_arrivee, date_depart in rows:
+                arrival, departure = normalize_date(date_arrivee), normalize_date(date_depart)
+                if arrival or departure:
+                    values.append((arrival, departure, row_id))
+            execute_batch(cur, 'UPDATE summaries SET arrival_date = %s, departure_date = %s WHERE id = %s', values)
+            conn.commit()
+            cur.close()
+            updated += len(values)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance de la table summaries.")
+    parser.add_argument('--backfill-stay-dates', action='store_true',
+                        help="Renseigne arrival_date/departure_date à partir des dates texte existantes")
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    if args.backfill_stay_dates:
+        init_db()
+        print(f"{backfill_stay_dates(args.batch_size)} résumés mis à jour")
+    else:
+        parser.print_help()
@@ -0,0 +1,69 @@
+import re
+import unicodedata
+from datetime import date
+
+MONTHS = {
+    'janvier': 1, 'janv': 1, 'january': 1, 'jan': 1,
+    'fevrier': 2, 'fevr': 2, 'fev': 2, 'february': 2, 'feb': 2,
+    'mars': 3, 'march': 3, 'mar': 3,
+    'avril': 4, 'avr': 4, 'april': 4, 'apr': 4,
+    'mai': 5, 'may': 5,
+    'juin': 6, 'june': 6, 'jun': 6,
+    'juillet': 7, 'juil': 7, 'july': 7, 'jul': 7,
+    'aout': 8, 'august': 8, 'aug': 8,
+    'septembre': 9, 'sept': 9, 'september': 9, 'sep': 9,
+    'octobre': 10, 'oct': 10, 'october': 10,
+    'novembre': 11, 'nov': 11, 'november': 11,
+    'decembre': 12, 'dec': 12, 'december': 12,
+}
+
+ISO_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+NUMERIC_DATE = re.compile(r'(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{4}|\d{2})(?!\d)')
+DAY_MONTH_YEAR = re.compile(r'(\d{1,2})(?:er|st|nd|rd|th)?\s+([a-z]+)\.?,?\s+(\d{4})')
+MONTH_DAY_YEAR = re.compile(r'([a-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})')
+
+def _fold(text):
+    """Lowercase and strip accents so 'Décembre' and 'decembre' compare equal."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+def _make_date(year, month, day):
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+def normalize_date(text):
+    """
+    Convert a date as captured from an OTA email to a datetime.date.
+    Accepts ISO dates, day-first numeric dates (12/03/2025, 24.11.2025, 12-03-25)
+    and French or English month names (12 mars 2025, 2 décembre, 2025,
+    December 8, 2025, Lu. 24.11.2025). Returns None when nothing matches.
+    """
+    if not text:
+        return None
+    if isinstance(text, date):
+        return text
+
+    folded = _fold(str(text))
+
+    match = ISO_DATE.search(folded)
+    if match:
+        return _make_date(match.group(1), match.group(2), match.group(3))
+
+    match = NUMERIC_DATE.search(folded)
+    if match:
+        return _make_date(match.group(3), match.group(2), match.group(1))
+
+    for match in DAY_MONTH_YEAR.finditer(folded):
+        if match.group(2) in MONTHS:
+            return _make_date(match.group(3), MONTHS[match.group(2)], match.group(1))
+
+    for match in MONTH_DAY_YEAR.finditer(folded):
+        if match.group(1) in MONTHS:
+            return _make_date(match.group(3), MONTHS[match.group(1)], match.group(2))
+
+    return None
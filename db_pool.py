@@ -1,21 +1,82 @@
 import os
-from psycopg2 import pool
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
+from tracing import is_enabled as tracing_enabled, TracedConnection
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
+# postgresql://... (production) or sqlite:///path.db (offline and dev runs, see sqlite_backend).
+BACKEND = 'sqlite' if (DATABASE_URL or '').startswith('sqlite:') else 'postgresql'
+
+# At most POOL_MAX connections; beyond, get_connection() waits for one to be
+# returned, up to POOL_TIMEOUT seconds.
+POOL_MAX = int(os.environ.get('OTA_DB_POOL_MAX', '5'))
+POOL_TIMEOUT = float(os.environ.get('OTA_DB_POOL_TIMEOUT', '30'))
+
 _connection_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(POOL_MAX)
+
+# Time spent waiting for a connection (seconds), last acquisitions only.
+_waits = deque(maxlen=10000)
+_counts = {'acquisitions': 0, 'timeouts': 0}
+_counts_lock = threading.Lock()
 
 def get_pool():
     global _connection_pool
     if _connection_pool is None:
-        _connection_pool = pool.SimpleConnectionPool(1, 5, DATABASE_URL)
+        with _pool_lock:
+            if _connection_pool is None:
+                if BACKEND == 'sqlite':
+                    from sqlite_backend import SQLitePool, path_from_url
+                    _connection_pool = SQLitePool(1, POOL_MAX, path_from_url(DATABASE_URL))
+                else:
+                    from psycopg2 import pool
+                    _connection_pool = pool.ThreadedConnectionPool(1, POOL_MAX, DATABASE_URL)
     return _connection_pool
 
 @contextmanager
 def get_connection():
-    conn = get_pool().getconn()
+    start = time.perf_counter()
+    if not _slots.acquire(timeout=POOL_TIMEOUT):
+        with _counts_lock:
+            _counts['timeouts'] += 1
+        raise TimeoutError(f"Aucune connexion libre après {POOL_TIMEOUT:g} s ({POOL_MAX} connexions)")
     try:
-        yield conn
+        conn = get_pool().getconn()
+        _waits.append(time.perf_counter() - start)
+        with _counts_lock:
+            _counts['acquisitions'] += 1
+        try:
+            yield TracedConnection(conn) if tracing_enabled() else conn
+        finally:
+            get_pool().putconn(conn)
     finally:
-        get_pool().putconn(conn)
+        _slots.release()
+
+def pool_stats():
+    """Connection acquisitions and waits since start (or reset_pool_stats)."""
+    waits = sorted(_waits)
+    return {
+        'max_connections': POOL_MAX,
+        'acquisitions': _counts['acquisitions'],
+        'timeouts': _counts['timeouts'],
+        'wait_mean_ms': sum(waits) / len(waits) * 1000 if waits else 0.0,
+        'wait_p95_ms': waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+        'wait_max_ms': waits[-1] * 1000 if waits else 0.0,
+    }
+
+def reset_pool_stats():
+    _waits.clear()
+    with _counts_lock:
+        _counts.update(acquisitions=0, timeouts=0)
+
+def execute_batch(cur, query, params_seq):
+    """psycopg2.extras.execute_batch, or executemany on SQLite."""
+    if BACKEND == 'sqlite':
+        from sqlite_backend import execute_batch as backend_execute_batch
+    else:
+        from psycopg2.extras import execute_batch as backend_execute_batch
+    backend_execute_batch(cur, query, params_seq)
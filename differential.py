@@ -0,0 +1,123 @@
+import importlib
+import os
+import random
+import re
+import threading
+from datetime import date
+from types import SimpleNamespace
+
+import parsers
+import templates
+from preprocess import preprocess_email
+
+# The production engine: what the OTA Helper runs today. A candidate engine is
+# any object (or module) exposing the same three callables, plus an optional
+# preprocess() applied to the raw email first.
+PRODUCTION_ENGINE = SimpleNamespace(
+    preprocess=preprocess_email,
+    detect_platform=parsers.detect_platform,
+    parse_email=parsers.parse_email,
+    generate_summary=templates.generate_summary_with_template,
+)
+
+REFERENCE_RECEPTIONIST = 'Maxime'
+
+# The footer carries today's date; it is neutralized so snapshots stay stable.
+SUMMARY_DATE = re.compile(r', le \d{2}/\d{2}/\d{4}$', re.MULTILINE)
+
+def load_engine(spec):
+    """Load an engine from 'module' or 'module:attribute'."""
+    module_name, _, attribute = spec.partition(':')
+    engine = importlib.import_module(module_name)
+    if attribute:
+        engine = getattr(engine, attribute)
+    for name in ('detect_platform', 'parse_email', 'generate_summary'):
+        if not callable(getattr(engine, name, None)):
+            raise ValueError(f"Le moteur '{spec}' ne fournit pas {name}()")
+    return engine
+
+def _jsonable(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def engine_output(platform, data, summary):
+    """Comparable, JSON-serializable form of one parse + render result."""
+    return {
+        'platform': platform,
+        'fields': {key: _jsonable(value) for key, value in sorted(data.items())},
+        'summary': SUMMARY_DATE.sub(', le <DATE>', summary),
+    }
+
+def run_engine(engine, email_text, platform=None, receptionist_name=REFERENCE_RECEPTIONIST):
+    """Platform, extracted fields and summary produced by `engine` for one raw email."""
+    preprocess = getattr(engine, 'preprocess', None)
+    if preprocess is not None:
+        email_text = preprocess(email_text)
+    if platform is None:
+        platform = engine.detect_platform(email_text)
+    data = engine.parse_email(email_text, platform)
+    return engine_output(platform, data, engine.generate_summary(data, receptionist_name))
+
+def diff_outputs(expected, actual):
+    """Field-level differences between two run_engine() outputs, as (field, expected, actual)."""
+    diffs = []
+    if expected['platform'] != actual['platform']:
+        diffs.append(('platform', expected['platform'], actual['platform']))
+    fields = sorted(set(expected['fields']) | set(actual['fields']))
+    for field in fields:
+        if expected['fields'].get(field) != actual['fields'].get(field):
+            diffs.append((f"fields.{field}", expected['fields'].get(field), actual['fields'].get(field)))
+    if expected['summary'] != actual['summary']:
+        diffs.append(('summary', expected['summary'], actual['summary']))
+    return diffs
+
+def format_diffs(diffs, width=120):
+    lines = []
+    for field, expected, actual in diffs:
+        lines.append(f"  {field}")
+        lines.append(f"    attendu : {repr(expected)[:width]}")
+        lines.append(f"    obtenu  : {repr(actual)[:width]}")
+    return '\n'.join(lines)
+
+# Shadow mode: OTA_SHADOW_ENGINE=module:attribute runs a candidate engine next to
+# production in the OTA Helper. Mismatches go to the activity log (visible to
+# admins only); the receptionist always gets the production summary.
+
+_shadow_engine = None
+_shadow_loaded = False
+
+def get_shadow_engine():
+    global _shadow_engine, _shadow_loaded
+    if not _shadow_loaded:
+        spec = os.environ.get('OTA_SHADOW_ENGINE')
+        _shadow_engine = load_engine(spec) if spec else None
+        _shadow_loaded = True
+    return _shadow_engine
+
+def _shadow_compare(engine, email_text, platform, receptionist_name, production_output, on_mismatch):
+    try:
+        candidate_output = run_engine(engine, email_text, platform, receptionist_name)
+        diffs = diff_outputs(production_output, candidate_output)
+    except Exception as e:
+        diffs = [('exception', None, f"{type(e).__name__}: {e}")]
+    if diffs:
+        on_mismatch(diffs)
+
+def run_shadow(email_text, platform, data, summary, receptionist_name, on_mismatch):
+    """
+    Compare the candidate engine with the production result in a background
+    thread. `on_mismatch(diffs)` is called only when outputs differ.
+    OTA_SHADOW_SAMPLE (0 to 1, default 1) limits the share of emails checked.
+    """
+    engine = get_shadow_engine()
+    if engine is None:
+        return
+    if random.random() >= float(os.environ.get('OTA_SHADOW_SAMPLE', '1')):
+        return
+    production_output = engine_output(platform, data, summary)
+    threading.Thread(
+        target=_shadow_compare,
+        args=(engine, email_text, platform, receptionist_name, production_output, on_mismatch),
+        daemon=True
+    ).start()
@@ -0,0 +1,186 @@
+import csv
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from db_pool import get_connection
+
+# Full-table exports (accounting asks for whole years). Rows are read by a
+# server-side cursor, `itersize` rows per round-trip, as plain tuples of the
+# requested columns, and written to the file as they arrive: memory stays
+# flat whatever the period.
+
+ITERSIZE = 2000
+
+EXPORT_TABLES = {
+    'summaries': {
+        'label': "Résumés OTA",
+        'columns': (
+            'id', 'created_at', 'updated_at', 'version', 'platform', 'receptionist_name', 'guest_name',
+            'reservation_id', 'tarif', 'vad', 'commission', 'date_arrivee', 'date_depart',
+            'arrival_date', 'departure_date', 'sejour_details', 'summary_text', 'email_raw'
+        ),
+        'default_columns': (
+            'id', 'created_at', 'platform', 'receptionist_name', 'guest_name', 'reservation_id',
+            'tarif', 'vad', 'commission', 'arrival_date', 'departure_date'
+        ),
+    },
+    'activity_logs': {
+        'label': "Journal d'activité",
+        'columns': ('id', 'created_at', 'user_id', 'username', 'action_type', 'action_details'),
+        'default_columns': ('id', 'created_at', 'username', 'action_type', 'action_details'),
+    },
+}
+
+# Column kinds for the Parquet schema (text otherwise), so that a batch where a
+# column happens to be all NULL does not fix its type.
+COLUMN_KINDS = {
+    'id': 'int', 'version': 'int', 'user_id': 'int',
+    'created_at': 'timestamp', 'updated_at': 'timestamp',
+    'tarif': 'amount', 'vad': 'amount', 'commission': 'amount',
+    'arrival_date': 'date', 'departure_date': 'date',
+}
+
+EXPORT_FORMATS = {
+    'csv': {'label': "CSV (;)", 'extension': 'csv', 'mime': 'text/csv'},
+    'jsonl': {'label': "JSON Lines", 'extension': 'jsonl', 'mime': 'application/x-ndjson'},
+    'parquet': {'label': "Parquet", 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+}
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or parquet_available()]
+
+def _check_columns(table, columns):
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Table non exportable : {table}")
+    columns = tuple(columns or EXPORT_TABLES[table]['default_columns'])
+    unknown = [column for column in columns if column not in EXPORT_TABLES[table]['columns']]
+    if unknown:
+        raise ValueError(f"Colonne(s) inconnue(s) pour {table} : {', '.join(unknown)}")
+    return columns
+
+def stream_batches(table, columns=None, date_from=None, date_to=None, itersize=ITERSIZE):
+    """
+    Lists of row tuples of `table` (oldest first), created in [date_from, date_to).
+    Column names are checked against EXPORT_TABLES before being put in the query.
+    """
+    columns = _check_columns(table, columns)
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE 1=1"
+    params = []
+    if date_from:
+        query += ' AND created_at >= %s'
+        params.append(date_from)
+    if date_to:
+        query += ' AND created_at < %s'
+        params.append(date_to)
+    query += ' ORDER BY created_at, id'
+
+    with get_connection() as conn:
+        cur = conn.cursor(name=f'export_{table}')
+        cur.itersize = itersize
+        cur.execute(query, params)
+        try:
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+            conn.rollback()
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def write_csv(batches, columns, f):
+    # utf-8-sig and ';' so that Excel (French locale) opens it as is.
+    writer = csv.writer(f, delimiter=';')
+    writer.writerow(columns)
+    count = 0
+    for rows in batches:
+        # Amounts keep their two decimals (Decimal), dates are ISO.
+        writer.writerows(tuple(value.isoformat() if isinstance(value, (datetime, date)) else value for value in row)
+                         for row in rows)
+        count += len(rows)
+    return count
+
+def write_jsonl(batches, columns, f):
+    count = 0
+    for rows in batches:
+        f.writelines(json.dumps(dict(zip(columns, map(_plain, row))), ensure_ascii=False) + '\n' for row in rows)
+        count += len(rows)
+    return count
+
+def _parquet_schema(columns):
+    import pyarrow as pa
+    kinds = {'int': pa.int64(), 'timestamp': pa.timestamp('us'), 'amount': pa.decimal128(12, 2), 'date': pa.date32()}
+    return pa.schema([(column, kinds.get(COLUMN_KINDS.get(column), pa.string())) for column in columns])
+
+def write_parquet(batches, columns, path):
+    # One row group per batch.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _parquet_schema(columns)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            writer.write_table(pa.Table.from_pydict(
+                {column: [row[i] for row in rows] for i, column in enumerate(columns)}, schema=schema
+            ))
+            count += len(rows)
+    return count
+
+def export_to_file(table, fmt, path, columns=None, date_from=None, date_to=None, itersize=ITERSIZE):
+    """
+    Write `table` to `path` in `fmt` (csv, jsonl, parquet) and return the
+    number of rows. The file only appears once complete.
+    """
+    columns = _check_columns(table, columns)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format inconnu : {fmt}")
+    if fmt == 'parquet' and not parquet_available():
+        raise ValueError("L'export Parquet nécessite le paquet pyarrow.")
+
+    batches = stream_batches(table, columns, date_from, date_to, itersize)
+    partial_path = path + '.partial'
+    try:
+        if fmt == 'parquet':
+            count = write_parquet(batches, columns, partial_path)
+        else:
+            encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+            with open(partial_path, 'w', encoding=encoding, newline='') as f:
+                count = (write_csv if fmt == 'csv' else write_jsonl)(batches, columns, f)
+        os.replace(partial_path, path)
+    finally:
+        batches.close()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return count
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export d'une table (résumés, journal) en flux vers un fichier.")
+    parser.add_argument('table', choices=list(EXPORT_TABLES))
+    parser.add_argument('output', help="Fichier de sortie")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--columns', help="Colonnes séparées par des virgules (défaut : colonnes usuelles)")
+    parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help="Date de début incluse (AAAA-MM-JJ)")
+    parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help="Date de fin exclue (AAAA-MM-JJ)")
+    parser.add_argument('--itersize', type=int, default=ITERSIZE)
+    args = parser.parse_args()
+
+    columns = args.columns.split(',') if args.columns else None
+    count = export_to_file(args.table, args.format, args.output, columns, args.date_from, args.date_to, args.itersize)
+    print(f"{count} lignes exportées dans {args.output}")
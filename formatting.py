@@ -0,0 +1,28 @@
+# Price formatting shared by the parsers, the summary templates and the pages.
+
+NOT_FOUND = "[Non trouvé]"
+
+def format_price(price):
+    """Format price with French locale (comma as decimal separator)."""
+    if price is None:
+        return "Non trouvé"
+    return f"{price:,.2f}".replace(',', ' ').replace('.', ',').replace(' ', ' ') + " €"
+
+def format_price_eur(price):
+    """Format price as X.XX EUR."""
+    if price is None:
+        return NOT_FOUND
+    return f"{price:.2f} EUR"
+
+def format_amount(price):
+    """Format price as X.XX, without currency."""
+    if price is None:
+        return NOT_FOUND
+    return f"{price:.2f}"
+
+# Named formats usable in the summary templates, e.g. "Total : {tarif:eur}".
+PRICE_FORMATS = {
+    'fr': format_price,
+    'eur': format_price_eur,
+    'amount': format_amount,
+}
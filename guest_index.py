@@ -0,0 +1,268 @@
+from collections import Counter
+from date_parsing import normalize_date
+from reconcile import normalize_name
+
+# Guest identity index: the same guest comes back under variant spellings
+# ("ERARD Johann", "Erard JOHANN", "ERRARD Johann") or with different relay
+# addresses. Records from CMS transforms and OTA summaries are grouped by
+# blocking keys (exact folded name, consonant skeleton of the name, email
+# local part, distinctive name tokens); only records sharing a key are
+# scored, and pairs above MATCH_THRESHOLD are joined with a union-find. Each
+# resulting cluster is one guest.
+
+MATCH_THRESHOLD = 0.94
+# Added when both records carry the same real email address. Two different
+# real addresses are two guests, whatever the names (homonyms).
+EMAIL_WEIGHT = 0.05
+# Blocks larger than this (common first names...) are not compared pairwise;
+# the other keys of their records still are.
+MAX_BLOCK_SIZE = 40
+TOKEN_KEY_MIN_LENGTH = 4
+
+# Values of the CMS 'Mail' column that are not a guest address.
+NOT_AN_EMAIL = {'_', 'EXPEDIA'}
+
+VOWELS = set('AEIOUY')
+
+# Domains where dots in the local part are ignored by the provider.
+DOTLESS_DOMAINS = {'gmail.com', 'googlemail.com'}
+
+def skeleton(word):
+    """First letter, then consonants without repeats: ERARD, ERRARD -> ERD."""
+    letters = [word[0]]
+    for char in word[1:]:
+        if char not in VOWELS and char != letters[-1]:
+            letters.append(char)
+    return ''.join(letters)
+
+def squeeze(word):
+    """Doubled letters collapsed, a frequent spelling variant: ERRARD -> ERARD."""
+    return ''.join(char for i, char in enumerate(word) if i == 0 or char != word[i - 1])
+
+def email_key(email):
+    """Normalized real address ('Jean.Dupont+hotel@Gmail.com' -> 'jeandupont@gmail.com'), or None."""
+    if not email or email in NOT_AN_EMAIL or '@' not in str(email):
+        return None
+    local, _, domain = str(email).strip().lower().rpartition('@')
+    if 'expediapartnercentral' in domain:
+        return None  # relay addresses are per booking
+    local = local.split('+', 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        local = local.replace('.', '')
+    return f'{local}@{domain}' if local else None
+
+def jaro_winkler(a, b):
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    window = max(len(a), len(b)) // 2 - 1
+    used = 0  # bitmask of the matched positions of b
+    matches_a = []
+    for i, char in enumerate(a):
+        end = i + window + 1
+        j = b.find(char, max(0, i - window), end)
+        while j != -1 and used >> j & 1:
+            j = b.find(char, j + 1, end)
+        if j != -1:
+            used |= 1 << j
+            matches_a.append(char)
+    if not matches_a:
+        return 0.0
+    matches_b = [char for j, char in enumerate(b) if used >> j & 1]
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) / 2
+    m = len(matches_a)
+    jaro = (m / len(a) + m / len(b) + (m - transpositions) / m) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+def name_similarity(tokens_a, tokens_b, floor=0.0):
+    """
+    Names as sorted tuples of squeezed, folded tokens (make_record). Each token
+    is paired with its closest token of the other name and the name scores as
+    its weakest pair: a shared surname does not make CLAIRE and CLAUDE the
+    same guest. Names with a different number of tokens score 0; scoring
+    stops as soon as a pair falls below `floor`.
+    """
+    if not tokens_a or not tokens_b or len(tokens_a) != len(tokens_b):
+        return 0.0
+    if tokens_a == tokens_b:
+        return 1.0
+    remaining = list(tokens_b)
+    weakest = 1.0
+    for token in tokens_a:
+        if token in remaining:
+            remaining.remove(token)
+            continue
+        if len(remaining) == 1:
+            best_score, best = jaro_winkler(token, remaining[0]), remaining[0]
+        else:
+            best_score, best = max((jaro_winkler(token, other), other) for other in remaining)
+        weakest = min(weakest, best_score)
+        if weakest < floor:
+            return weakest
+        remaining.remove(best)
+    return weakest
+
+def similarity(a, b, floor=0.0):
+    """Score of two records (dicts from make_record), between 0 and 1."""
+    if a['email'] and b['email']:
+        if a['email'] != b['email']:
+            return 0.0
+        return min(name_similarity(a['tokens'], b['tokens'], floor - EMAIL_WEIGHT) + EMAIL_WEIGHT, 1.0)
+    return name_similarity(a['tokens'], b['tokens'], floor)
+
+def _name_keys(name):
+    name = normalize_name(name)
+    return name, tuple(sorted(squeeze(token) for token in name.split())) if name else ()
+
+def make_record(source, row_id, name, email=None, names=None):
+    """`names` is an optional dict memoizing the name normalization across records."""
+    if names is None:
+        name, tokens = _name_keys(name)
+    else:
+        if name not in names:
+            names[name] = _name_keys(name)
+        name, tokens = names[name]
+    return {'source': source, 'row_id': row_id, 'name': name, 'tokens': tokens, 'email': email_key(email)}
+
+def records_from_cms(df):
+    """Records of a CMS DataFrame (cms_parser.parse_csv_data), row_id = DataFrame position."""
+    records = []
+    names = {}
+    for position, (nom, prenom, mail) in enumerate(df[['Nom', 'Prénom', 'Mail']].itertuples(index=False)):
+        name = ' '.join(part for part in (nom, prenom) if part and part != '_')
+        records.append(make_record('cms', position, name, mail, names))
+    return records
+
+def records_from_summaries(summaries):
+    """Records of summaries rows (dicts with id and guest_name)."""
+    return [make_record('summary', summary['id'], summary.get('guest_name')) for summary in summaries]
+
+def blocking_keys(record):
+    keys = []
+    if record['name']:
+        tokens = record['name'].split()
+        keys.append('n:' + record['name'])
+        keys.append('k:' + ' '.join(sorted(skeleton(token) for token in tokens)))
+        keys.extend('t:' + token for token in tokens if len(token) >= TOKEN_KEY_MIN_LENGTH)
+    if record['email']:
+        keys.append('e:' + record['email'])
+    return keys
+
+def _find(parent, node):
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+def build_index(records, threshold=MATCH_THRESHOLD):
+    """
+    Cluster records into guests. Returns (guest_of, stats): guest_of[i] is
+    the guest number of records[i]; stats counts the candidate pairs scored.
+    """
+    # Identical (name, email) records are one node: exact repeats cost nothing.
+    # Records with neither name nor email stay on their own.
+    nodes = {}
+    node_of = []
+    for position, record in enumerate(records):
+        identity = (record['name'], record['email']) if record['name'] or record['email'] else position
+        node_of.append(nodes.setdefault(identity, len(nodes)))
+    representatives = [None] * len(nodes)
+    for record, node in zip(records, node_of):
+        if representatives[node] is None:
+            representatives[node] = record
+
+    blocks = {}
+    for node, record in enumerate(representatives):
+        for key in blocking_keys(record):
+            blocks.setdefault(key, []).append(node)
+
+    parent = list(range(len(representatives)))
+    compared = set()
+    skipped_blocks = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) > MAX_BLOCK_SIZE:
+            skipped_blocks += 1
+            continue
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a, b) in compared:
+                    continue
+                compared.add((a, b))
+                if _find(parent, a) != _find(parent, b) and \
+                        similarity(representatives[a], representatives[b], threshold) >= threshold:
+                    parent[_find(parent, a)] = _find(parent, b)
+
+    roots = {}
+    guest_of = [roots.setdefault(_find(parent, node), len(roots)) for node in node_of]
+    stats = {'records': len(records), 'distinct': len(representatives), 'guests': len(roots),
+             'pairs_scored': len(compared), 'blocks_skipped': skipped_blocks}
+    return guest_of, stats
+
+def _checkin_order(value, cache):
+    if value not in cache:
+        day = normalize_date(value) if value and value != '_' else None
+        cache[value] = day.toordinal() if day else 0
+    return cache[value]
+
+def _split_by_email(positions, records, order):
+    """
+    Lines of one cluster, one group per real address: records without an
+    address can chain two guests with different ones together (a relay
+    booking, a summary). Lines without an address join the group of the
+    most recent check-in.
+    """
+    groups = {}
+    for position in positions:
+        if records[position]['email']:
+            groups.setdefault(records[position]['email'], []).append(position)
+    if len(groups) < 2:
+        return [positions]
+    latest = max(groups.values(), key=lambda group: max(order(position) for position in group))
+    latest.extend(position for position in positions if not records[position]['email'])
+    return list(groups.values())
+
+def dedupe_cms(df, summaries=()):
+    """
+    One CMS line per guest: the most recent check-in of each cluster, with
+    the name split most seen in the cluster and a real email address when
+    one of its lines has it. Lines with different real addresses are never
+    merged. Summaries only link variants together.
+    Returns (deduplicated DataFrame, stats).
+    """
+    records = records_from_cms(df)
+    guest_of, stats = build_index(records + records_from_summaries(summaries))
+
+    members = {}
+    for position in range(len(records)):
+        members.setdefault(guest_of[position], []).append(position)
+
+    all_lines = df.to_dict('records')
+    checkin_days = {}
+    order = lambda position: _checkin_order(all_lines[position]['Date de checkin'], checkin_days)
+    rows = []
+    for cluster in members.values():
+        for positions in _split_by_email(cluster, records, order):
+            lines = [all_lines[position] for position in positions]
+            latest = dict(all_lines[max(positions, key=order)])
+            if len(lines) > 1:
+                latest['Nom'], latest['Prénom'] = Counter((line['Nom'], line['Prénom']) for line in lines).most_common(1)[0][0]
+                if latest['Mail'] in NOT_AN_EMAIL:
+                    emails = [line['Mail'] for line in lines if line['Mail'] not in NOT_AN_EMAIL]
+                    if emails:
+                        latest['Mail'] = Counter(emails).most_common(1)[0][0]
+            rows.append((min(positions), latest))
+    rows.sort(key=lambda item: item[0])
+
+    import pandas as pd
+    deduped = pd.DataFrame([row for _, row in rows], columns=df.columns)
+    stats['rows'] = len(df)
+    stats['merged'] = len(df) - len(deduped)
+    return deduped, stats
@@ -0,0 +1,97 @@
+import glob
+import importlib
+import os
+import tomllib
+
+# Registry of the OTA platforms. Each platform is a manifest: a TOML file in
+# ota_plugins/ or, for platforms shipped as separate packages, an entry point
+# of the ENTRY_POINT_GROUP group pointing to a dict with the same keys:
+#
+#   id = "booking"                         # internal id
+#   name = "Booking.com"                   # display name, also data['platform']
+#   priority = 5                           # lowest wins when several platforms match
+#   keywords = ["booking.com"]             # searched in the lowercased email
+#   parser = "ota_plugins.booking:parse"   # module:function(email_text) -> dict
+#
+#   [template]
+#   name = "Booking.com"
+#   description = "..."
+#   generator = "ota_plugins.booking:render"   # function(data, receptionist_name) -> str
+#
+# Manifests are read once; parser and template modules are only imported the
+# first time an email of that platform is parsed or rendered.
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ota_plugins')
+ENTRY_POINT_GROUP = 'causse_comtal.ota_plugins'
+DEFAULT_PLATFORM = 'direct'
+REQUIRED_KEYS = ('id', 'name', 'parser')
+
+_plugins = None
+_platform_names = None
+_callables = {}
+
+def _validate(manifest, origin):
+    missing = [key for key in REQUIRED_KEYS if key not in manifest]
+    if missing:
+        raise ValueError(f"Plugin OTA {origin} : clé(s) manquante(s) : {', '.join(missing)}")
+    manifest['keywords'] = [keyword.lower() for keyword in manifest.get('keywords', [])]
+    manifest.setdefault('priority', 50)
+    return manifest
+
+def _discover():
+    from importlib.metadata import entry_points  # ~20 ms, paid once on first use
+    plugins = {}
+    for path in sorted(glob.glob(os.path.join(PLUGIN_DIR, '*.toml'))):
+        with open(path, 'rb') as f:
+            manifest = _validate(tomllib.load(f), os.path.basename(path))
+        plugins[manifest['id']] = manifest
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        manifest = _validate(dict(entry_point.load()), entry_point.name)
+        # A manifest in ota_plugins/ overrides an installed package of the same id.
+        plugins.setdefault(manifest['id'], manifest)
+    return dict(sorted(plugins.items(), key=lambda item: item[1]['priority']))
+
+def get_plugins():
+    """Manifests by platform id, in detection order (priority)."""
+    global _plugins
+    if _plugins is None:
+        _plugins = _discover()
+    return _plugins
+
+def get_plugin(platform_id):
+    plugins = get_plugins()
+    return plugins.get(platform_id) or plugins[DEFAULT_PLATFORM]
+
+def resolve(spec):
+    """The callable named by 'module:attribute', imported on first use."""
+    target = _callables.get(spec)
+    if target is None:
+        module_name, _, attribute = spec.partition(':')
+        target = _callables[spec] = getattr(importlib.import_module(module_name), attribute)
+    return target
+
+def get_parser(platform_id):
+    return resolve(get_plugin(platform_id)['parser'])
+
+def get_template(platform_id):
+    plugin = get_plugin(platform_id)
+    if 'template' not in plugin:
+        plugin = get_plugin(DEFAULT_PLATFORM)
+    return resolve(plugin['template']['generator'])
+
+def platform_id_for(name):
+    """Platform id from a display name (data['platform']) or an id; the default platform otherwise."""
+    global _platform_names
+    if _platform_names is None:
+        _platform_names = {}
+        for platform_id, plugin in get_plugins().items():
+            _platform_names[plugin['name'].lower()] = platform_id
+            _platform_names[platform_id] = platform_id
+    return _platform_names.get((name or '').lower(), DEFAULT_PLATFORM)
+
+def reload():
+    """Forget the discovered manifests (after adding a plugin without restarting)."""
+    global _plugins, _platform_names
+    _plugins = None
+    _platform_names = None
+    _callables.clear()
@@ -1,5 +1,17 @@
 import re
 from datetime import datetime
+from date_parsing import normalize_date
+from formatting import format_price
+from rule_telemetry import search as rule_search
+from ota_registry import DEFAULT_PLATFORM, get_plugins, get_parser
+from recap import (
+    RECAP_MAX_CHARS,
+    WEEKENDESK_SECTIONS,
+    deadline as recap_deadline,
+    section_between,
+    weekendesk_dated_block,
+    smartbox_block
+)
 
 def normalize_price(price_str):
     """Normalize a price string to a float, handling French formats."""
@@ -25,7 +37,7 @@ def normalize_price(price_str):
 def extract_price(text, patterns):
     """Extract a price using multiple regex patterns."""
     for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        match = rule_search(pattern, text, re.IGNORECASE | re.DOTALL)
         if match:
             try:
                 return normalize_price(match.group(1))
@@ -36,101 +48,68 @@ def extract_price(text, patterns):
 def extract_text(text, patterns):
     """Extract text using multiple regex patterns."""
     for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        match = rule_search(pattern, text, re.IGNORECASE | re.DOTALL)
         if match:
             return match.group(1).strip()
     return None
 
-def format_price(price):
-    """Format price with French locale (comma as decimal separator)."""
-    if price is None:
-        return "Non trouvé"
-    return f"{price:,.2f}".replace(',', ' ').replace('.', ',').replace(' ', ' ') + " €"
-
 OTA_PLATFORMS = {
-    'weekendesk': {
-        'name': 'Weekendesk',
-        'keywords': ['weekendesk', 'week-end', 'noemi.valerio@weekendesk'],
-        'priority': 1
-    },
-    'expedia': {
-        'name': 'Expedia',
-        'keywords': ['expedia', 'expediapartnercentral', 'egencia', 'expedia virtual card'],
-        'priority': 2
-    },
-    'keytel': {
-        'name': 'Keytel',
-        'keywords': ['keytel', 'keytel.fr', 'keytel.com'],
-        'priority': 3
-    },
-    'smartbox': {
-        'name': 'Smartbox',
-        'keywords': ['smartbox', 'smart box', 'smartbox.com'],
-        'priority': 4
-    },
-    'direct': {
-        'name': 'Réservation Directe',
-        'keywords': [],
-        'priority': 99
-    }
+    platform_id: {'name': plugin['name'], 'keywords': plugin['keywords'], 'priority': plugin['priority']}
+    for platform_id, plugin in get_plugins().items()
 }
 
 def detect_platform(email_text):
     """Auto-detect the OTA platform from email content."""
     text_lower = email_text.lower()
     
-    detected = []
+    # Platforms are ordered by priority: the first match wins.
     for platform_id, config in OTA_PLATFORMS.items():
         for keyword in config['keywords']:
-            if keyword.lower() in text_lower:
-                detected.append((platform_id, config['priority']))
-                break
-    
-    if detected:
-        detected.sort(key=lambda x: x[1])
-        return detected[0][0]
+            if keyword in text_lower:
+                return platform_id
     
-    return 'direct'
+    return DEFAULT_PLATFORM
 
 def extract_weekendesk_recapitulatif(email_text):
     """
     Extract the activity recap block from Weekendesk emails.
     The recap is between "externe à votre établissement" and "Prix établissement payé par le client"
     """
-    patterns = [
-        r'externe[s]?\s+[àa]\s+votre\s+[eé]tablissement\)?(.+?)Prix\s+[eé]tablissement\s+pay[eé]\s+par\s+le\s+client',
-        r'R[eé]capitulatif\s+des\s+activit[eé]s(.+?)Prix\s+[eé]tablissement',
-        r'(\d{1,2}/\d{1,2}/\d{4}\s*\n(?:[\s\S]*?(?:\n\d{1,2}/\d{1,2}/\d{4}[\s\S]*?)*)?)(?=\s*Prix\s+[eé]tablissement|\s*$)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, email_text, re.IGNORECASE | re.DOTALL)
-        if match:
-            recap = match.group(1).strip()
-            lines = []
-            current_date = None
+    text = email_text[:RECAP_MAX_CHARS]
+    recap = None
+    for start_pattern, end_pattern in WEEKENDESK_SECTIONS:
+        recap = section_between(text, start_pattern, end_pattern)
+        if recap is not None:
+            break
+    if recap is None:
+        recap = weekendesk_dated_block(text, recap_deadline())
+    
+    if recap is not None:
+        recap = recap.strip()
+        lines = []
+        current_date = None
+        
+        for line in recap.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
             
-            for line in recap.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                
-                date_match = re.match(r'^(\d{1,2}/\d{1,2}/\d{4})$', line)
-                if date_match:
-                    current_date = date_match.group(1)
-                    lines.append(current_date)
-                elif line and not line.startswith('•'):
-                    if re.match(r'^[\d\w]', line) and not re.match(r'^\d{1,2}/\d{1,2}/', line):
-                        lines.append(f"• {line}")
-                    else:
-                        lines.append(line)
+            date_match = re.match(r'^(\d{1,2}/\d{1,2}/\d{4})$', line)
+            if date_match:
+                current_date = date_match.group(1)
+                lines.append(current_date)
+            elif line and not line.startswith('•'):
+                if re.match(r'^[\d\w]', line) and not re.match(r'^\d{1,2}/\d{1,2}/', line):
+                    lines.append(f"• {line}")
                 else:
                     lines.append(line)
-            
-            return '\n'.join(lines)
+            else:
+                lines.append(line)
+        
+        return '\n'.join(lines)
     
     date_block_pattern = r'(\d{1,2}/\d{1,2}/\d{4}[\s\S]*?)(?=Prix\s+[eé]tablissement|Montant\s+pay[eé]|$)'
-    match = re.search(date_block_pattern, email_text, re.IGNORECASE)
+    match = rule_search(date_block_pattern, text, re.IGNORECASE)
     if match:
         return format_recap_block(match.group(1).strip())
     
@@ -442,17 +421,8 @@ def parse_keytel(email_text):
 
 def extract_smartbox_recapitulatif(email_text):
     """Extract the activity recap block from Smartbox emails."""
-    patterns = [
-        r'R[eé]capitulatif\s*[:\-]?\s*([^\n]+(?:\n[^\n]+)*?)(?=\s*(?:Prix|Total|Montant|$))',
-        r'D[eé]tails?\s+(?:du\s+)?s[eé]jour\s*[:\-]?\s*([^\n]+(?:\n[^\n]+)*?)(?=\s*(?:Prix|Total|Montant|$))',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, email_text, re.IGNORECASE | re.DOTALL)
-        if match:
-            return match.group(1).strip()
-    
-    return None
+    recap = smartbox_block(email_text[:RECAP_MAX_CHARS], recap_deadline())
+    return recap.strip() if recap is not None else None
 
 def parse_smartbox(email_text):
     """Parse Smartbox reservation emails."""
@@ -537,21 +507,15 @@ def parse_smartbox(email_text):
     
     return result
 
-PARSERS = {
-    'weekendesk': parse_weekendesk,
-    'expedia': parse_expedia,
-    'keytel': parse_keytel,
-    'smartbox': parse_smartbox,
-    'direct': parse_direct,
-}
-
 def parse_email(email_text, platform=None):
     """Parse email based on detected or specified platform."""
     if platform is None:
         platform = detect_platform(email_text)
     
-    parser = PARSERS.get(platform, parse_direct)
-    return parser(email_text)
+    result = get_parser(platform)(email_text)
+    result['arrival_date'] = normalize_date(result.get('dates_arrivee'))
+    result['departure_date'] = normalize_date(result.get('dates_depart'))
+    return result
 
 def generate_summary(data, receptionist_name):
     """Generate the formatted summary using templates."""
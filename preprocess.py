@@ -0,0 +1,155 @@
+import email
+import email.policy
+import quopri
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+# Canonical text for the parsers: whatever the receptionist pastes (raw MIME
+# source, an HTML dump, quoted-printable leftovers, a reply thread), the
+# parsers get compact plain text with one kind of line break and no NBSP.
+
+MIME_HEADERS = re.compile(r'\A(?:[\w-]+:[^\n]*\n(?:[ \t][^\n]*\n)*)*?(?:MIME-Version|Content-Type):', re.IGNORECASE)
+HTML_TAG = re.compile(r'<(?:html|body|div|table|td|p|br|span|font)\b', re.IGNORECASE)
+QP_UTF8 = re.compile(r'=[C-F][0-9A-F]=[89AB][0-9A-F]')
+QP_SOFT_BREAK = re.compile(r'=\r?\n')
+
+# Reply attribution ("Le 3 déc. 2025 à 10:12, X a écrit :", "On ... wrote:")
+# followed by '>' lines.
+REPLY_ATTRIBUTION = re.compile(r'^(?:Le .{5,200}a [ée]crit\s*:|On .{5,200}wrote:)\s*\n(?=\s*>)', re.MULTILINE)
+QUOTE_PREFIX = re.compile(r'^[ \t]*>[> \t]?', re.MULTILINE)
+BOOKING_TERMS = re.compile(r'r[ée]servation|booking|confirmation', re.IGNORECASE)
+
+# Legal footers of the OTA emails: everything from the marker on is dropped.
+# Case-sensitive so the search can skip ahead on the literal prefixes.
+FOOTER_MARKERS = re.compile(
+    r'Vous b[ée]n[ée]ficiez d.un droit d.acc[èe]s'
+    r'|Protection des donn[ée]es et s[ée]curit[ée] \|'
+    r'|WEEKENDESK - SAS capital social'
+)
+
+class _TextExtractor(HTMLParser):
+    BLOCK_TAGS = {'br', 'p', 'div', 'tr', 'li', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr'}
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+        elif tag == 'td':
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+def html_to_text(html):
+    """Visible text of an HTML document, one line per block element."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ''.join(extractor.parts)
+
+def decode_quoted_printable(text):
+    """Undo quoted-printable encoding left in pasted text (soft breaks, =C3=A9)."""
+    raw = quopri.decodestring(text.encode('utf-8'))
+    return raw.decode('utf-8', errors='replace')
+
+def looks_quoted_printable(text):
+    return bool(QP_UTF8.search(text)) or len(QP_SOFT_BREAK.findall(text)) >= 3
+
+def mime_to_text(source):
+    """
+    Body of a raw MIME message (.eml): the text/plain part, or the text/html
+    part converted to text. From and Subject are kept on top since platform
+    detection relies on sender addresses. Transfer encodings (base64,
+    quoted-printable) and charsets are decoded by the email package.
+    """
+    if isinstance(source, bytes):
+        message = email.message_from_bytes(source, policy=email.policy.default)
+    else:
+        message = email.message_from_string(source, policy=email.policy.default)
+
+    plain = html = None
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_disposition() == 'attachment':
+            continue
+        content_type = part.get_content_type()
+        if content_type == 'text/plain' and plain is None:
+            plain = part.get_content()
+        elif content_type == 'text/html' and html is None:
+            html = part.get_content()
+
+    body = plain if plain and plain.strip() else html_to_text(html) if html else ''
+    headers = [f"{name} : {message[name]}" for name in ('From', 'Subject') if message[name]]
+    return '\n'.join(headers + ['', body])
+
+def holds_booking(text):
+    """True when the text parses to a booking on its own: a reservation id or a price is found."""
+    from parsers import parse_email
+    data = parse_email(text)
+    return bool(data.get('reservation_id')) or data.get('tarif') is not None
+
+def strip_quoted_reply(text):
+    """
+    Drop a quoted reply thread when the message above it already holds the
+    booking; otherwise (a forward such as "voici la réservation ci-dessous")
+    keep the quoted part, unquoted.
+    """
+    attribution = REPLY_ATTRIBUTION.search(text)
+    if not attribution:
+        return text
+    top = text[:attribution.start()]
+    if BOOKING_TERMS.search(top) and holds_booking(top):
+        return top
+    return top + QUOTE_PREFIX.sub('', text[attribution.end():])
+
+def strip_footer(text):
+    """Drop the legal footer, from its marker on; a marker with nothing before it is not a footer."""
+    footer = FOOTER_MARKERS.search(text)
+    if not footer or not text[:footer.start()].strip():
+        return text
+    return text[:footer.start()]
+
+def normalize_whitespace(text):
+    """
+    One space between words (NBSP and tabs included), no indentation, '\n'
+    line breaks and at most one blank line in a row.
+    """
+    lines = []
+    blank = True
+    for line in text.replace('\ufeff', '').splitlines():
+        line = ' '.join(line.split())
+        if line:
+            lines.append(line)
+            blank = False
+        elif not blank:
+            lines.append(line)
+            blank = True
+    return '\n'.join(lines).strip()
+
+def preprocess_email(raw):
+    """Compact canonical text of a pasted email or of a raw MIME source (str or bytes)."""
+    if isinstance(raw, bytes) or MIME_HEADERS.match(raw):
+        text = mime_to_text(raw)
+    else:
+        text = raw
+        if looks_quoted_printable(text):
+            text = decode_quoted_printable(text)
+        if HTML_TAG.search(text):
+            text = unescape(html_to_text(text))
+    # Normalized first: the reply and footer searches then run on the compact text.
+    text = normalize_whitespace(text)
+    return strip_footer(strip_quoted_reply(text)).strip()
@@ -0,0 +1,135 @@
+import re
+import time
+
+# Linear-time scanners for the activity recap of Weekendesk and Smartbox emails.
+#
+# They return exactly what the former DOTALL patterns captured, e.g. for Smartbox
+#   R[eé]capitulatif\s*[:\-]?\s*([^\n]+(?:\n[^\n]+)*?)(?=\s*(?:Prix|Total|Montant|$))
+# but find each boundary with one forward search instead of retrying the lazy
+# group at every character, which was quadratic on long forwarded threads.
+# Only the first RECAP_MAX_CHARS characters are scanned, and a scan that exceeds
+# RECAP_TIME_BUDGET seconds returns the block found so far.
+
+RECAP_MAX_CHARS = 200_000
+RECAP_TIME_BUDGET = 0.05
+
+FLAGS = re.IGNORECASE | re.DOTALL
+
+WEEKENDESK_SECTIONS = [
+    (re.compile(r'externe[s]?\s+[àa]\s+votre\s+[eé]tablissement\)?', FLAGS),
+     re.compile(r'Prix\s+[eé]tablissement\s+pay[eé]\s+par\s+le\s+client', FLAGS)),
+    (re.compile(r'R[eé]capitulatif\s+des\s+activit[eé]s', FLAGS),
+     re.compile(r'Prix\s+[eé]tablissement', FLAGS)),
+]
+FIRST_DATE_LINE = re.compile(r'\d{1,2}/\d{1,2}/\d{4}\s*\n')
+NEXT_DATE_LINE = re.compile(r'\n\d{1,2}/\d{1,2}/\d{4}')
+PRIX_ETABLISSEMENT = re.compile(r'Prix\s+[eé]tablissement', FLAGS)
+
+SMARTBOX_MARKERS = [
+    re.compile(r'(R[eé]capitulatif)\s*[:\-]?\s*', FLAGS),
+    re.compile(r'(D[eé]tails?\s+(?:du\s+)?s[eé]jour)\s*[:\-]?\s*', FLAGS),
+]
+SMARTBOX_STOP = re.compile(r'\s*(?:Prix|Total|Montant|$)', FLAGS)
+SMARTBOX_KEYWORD = re.compile(r'(?:Prix|Total|Montant)', FLAGS)
+SMARTBOX_KEYWORD_AT = re.compile(r'(?=(?:Prix|Total|Montant))', FLAGS)
+
+def deadline():
+    return time.perf_counter() + RECAP_TIME_BUDGET
+
+def section_between(text, start_pattern, end_pattern):
+    """
+    Text between the first start marker and the first end marker after it
+    (at least one character), like `start(.+?)end`; None without both markers.
+    """
+    start = start_pattern.search(text)
+    if not start:
+        return None
+    begin = start.end()
+    end = end_pattern.search(text, begin + 1)
+    if end:
+        return text[begin:end.start()]
+    if text[begin - 1:begin] == ')' and end_pattern.match(text, begin):
+        # `\)?` given back: the closing parenthesis alone is the section.
+        return text[begin - 1:begin]
+    return None
+
+def weekendesk_dated_block(text, until):
+    """
+    From the first 'dd/mm/yyyy' line to the first 'Prix établissement' (or the
+    end of the text), following consecutive date lines. None without a date line.
+    """
+    first = FIRST_DATE_LINE.search(text)
+    if not first:
+        return None
+    trailing = len(text.rstrip())
+    prix = PRIX_ETABLISSEMENT.search(text, first.end())
+    position = first.end()
+    while True:
+        if time.perf_counter() > until:
+            return text[first.start():position]
+        if prix and prix.start() < position:
+            prix = PRIX_ETABLISSEMENT.search(text, position)
+        # The block ends where only blanks separate it from 'Prix établissement'
+        # or from the end of the text, unless another date line comes first.
+        stop = max(position, trailing)
+        if prix:
+            blank = prix.start()
+            while blank > position and text[blank - 1].isspace():
+                blank -= 1
+            stop = min(stop, blank)
+        date = NEXT_DATE_LINE.search(text, position, stop)
+        if not date:
+            return text[first.start():stop]
+        position = date.end()
+
+def smartbox_block(text, until):
+    """
+    Recap lines after 'Récapitulatif' or 'Détails du séjour', up to the first
+    line followed by a price line (Prix, Total, Montant) or the end of the
+    text. None when no marker leads to a recap.
+    """
+    for marker in SMARTBOX_MARKERS:
+        for match in marker.finditer(text):
+            block = _smartbox_block_at(text, match.end(1), match.end(), until)
+            if block is not None:
+                return block
+    return None
+
+def _smartbox_block_at(text, word_end, begin, until):
+    if begin < len(text):
+        lines = []
+        line_start = begin
+        while True:
+            line_end = text.find('\n', line_start)
+            if line_end == -1:
+                line_end = len(text)
+            lines.append((line_start, line_end))
+            if SMARTBOX_STOP.match(text, line_end):
+                return text[begin:line_end]
+            if time.perf_counter() > until:
+                return text[begin:line_end]
+            if line_end + 1 >= len(text) or text[line_end + 1] == '\n':
+                break
+            line_start = line_end + 1
+
+        # No price line after a blank line: the block ends inside a line,
+        # right before its last price keyword.
+        for line_start, line_end in reversed(lines):
+            keyword = None
+            for keyword in SMARTBOX_KEYWORD_AT.finditer(text, line_start + 1, line_end):
+                pass
+            if keyword:
+                return text[begin:keyword.start()]
+
+        if not SMARTBOX_KEYWORD.match(text, begin):
+            return None
+
+    # The block starts with a price keyword (or is empty): only the separator
+    # between the marker and the keyword is captured.
+    start = begin - 1
+    while start >= word_end and text[start] == '\n':
+        start -= 1
+    if start < word_end:
+        return None
+    line_end = text.find('\n', start)
+    return text[start:begin if line_end == -1 else min(begin, line_end)]
@@ -0,0 +1,156 @@
+import re
+import unicodedata
+from date_parsing import normalize_date
+
+# Reconciliation of a PMS check-in export (CMS Helper) against the OTA summaries
+# saved by OTA Helper, for the night audit. The summaries arriving in the
+# export's date range are loaded once and indexed in two dicts: by normalized
+# reference, and by normalized guest name + arrival date. Each PMS row is then
+# matched with one lookup (reference first, then name + date), so a whole
+# export is reconciled in O(rows + summaries).
+
+PRICE_TOLERANCE = 0.01
+
+# Civilités et particules écartées des noms avant comparaison.
+NAME_STOPWORDS = {'M', 'MR', 'MME', 'MLLE', 'MRS', 'MS', 'MISS', 'DR'}
+
+STATUS_LABELS = {
+    'ok': 'Concordant',
+    'price_mismatch': 'Écart de prix',
+    'amount_missing': 'Montant non comparable',
+    'missing_summary': 'Résumé OTA manquant',
+    'missing_pms': 'Absent du PMS',
+}
+
+def normalize_reference(reference):
+    """'hcc-67180 ' -> 'HCC67180'; None for empty values."""
+    if reference is None or reference != reference:  # NaN from pandas
+        return None
+    reference = re.sub(r'[^0-9A-Za-z]', '', str(reference)).upper()
+    return reference or None
+
+def normalize_name(name):
+    """
+    Accents, case, civilities and word order removed: 'ERARD Johann',
+    'M. Johann Érard' and 'johann erard' give the same key.
+    """
+    if name is None or name != name:
+        return None
+    name = unicodedata.normalize('NFKD', str(name).upper())
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    words = [word for word in re.split(r'[^0-9A-Z]+', name) if word and word not in NAME_STOPWORDS]
+    return ' '.join(sorted(words)) or None
+
+def parse_amount(value):
+    """'74.22', '1 234,50 €' or a float -> float; None when absent or unreadable."""
+    if value is None or value != value:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r'[^0-9,.\-]', '', str(value))
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def reconciliation_records(df):
+    """The fields used for matching, from a raw PMS DataFrame (cms_parser.read_pms_csv)."""
+    records = []
+    for row in df.to_dict('records'):
+        records.append({
+            'reference': row.get('Référence'),
+            'name': row.get('Nom'),
+            'email': row.get('Email'),
+            'arrival_date': normalize_date(str(row.get('Date arrivée', row.get('Date arrivee', ''))).strip()),
+            'amount': parse_amount(row.get('CA TTC')),
+        })
+    return records
+
+def build_indexes(summaries):
+    """Two hash indexes over the summaries: reference -> summary, (name, date) -> [summaries]."""
+    by_reference = {}
+    by_name_date = {}
+    for summary in summaries:
+        reference = normalize_reference(summary.get('reservation_id'))
+        if reference:
+            by_reference.setdefault(reference, summary)
+        name = normalize_name(summary.get('guest_name'))
+        if name and summary.get('arrival_date'):
+            by_name_date.setdefault((name, summary['arrival_date']), []).append(summary)
+    return by_reference, by_name_date
+
+def reconcile(records, summaries, tolerance=PRICE_TOLERANCE):
+    """
+    Match PMS records against summaries. Returns one line per PMS record
+    (status ok, price_mismatch, amount_missing when the CA TTC or the tarif is
+    absent or unreadable, or missing_summary) followed by the summaries no PMS
+    record matched (missing_pms). Each summary matches at most once.
+    """
+    by_reference, by_name_date = build_indexes(summaries)
+    matched = set()
+    lines = []
+    for record in records:
+        summary, matched_on = None, None
+        reference = normalize_reference(record['reference'])
+        candidate = by_reference.get(reference) if reference else None
+        if candidate is not None and candidate['id'] not in matched:
+            summary, matched_on = candidate, 'reference'
+        else:
+            name = normalize_name(record['name'])
+            for candidate in by_name_date.get((name, record['arrival_date']), ()):
+                if candidate['id'] not in matched:
+                    summary, matched_on = candidate, 'nom + date'
+                    break
+
+        line = {
+            'pms_reference': record['reference'], 'pms_name': record['name'],
+            'arrival_date': record['arrival_date'], 'pms_amount': record['amount'],
+            'summary_id': None, 'platform': None, 'reservation_id': None, 'tarif': None,
+            'difference': None, 'matched_on': matched_on,
+        }
+        if summary is None:
+            line['status'] = 'missing_summary'
+        else:
+            matched.add(summary['id'])
+            tarif = float(summary['tarif']) if summary.get('tarif') is not None else None
+            line.update(summary_id=summary['id'], platform=summary.get('platform'),
+                        reservation_id=summary.get('reservation_id'), tarif=tarif)
+            if tarif is None or record['amount'] is None:
+                line['status'] = 'amount_missing'
+            else:
+                line['difference'] = round(record['amount'] - tarif, 2)
+                line['status'] = 'price_mismatch' if abs(line['difference']) > tolerance else 'ok'
+        lines.append(line)
+
+    for summary in summaries:
+        if summary['id'] not in matched:
+            lines.append({
+                'pms_reference': None, 'pms_name': summary.get('guest_name'),
+                'arrival_date': summary.get('arrival_date'), 'pms_amount': None,
+                'summary_id': summary['id'], 'platform': summary.get('platform'),
+                'reservation_id': summary.get('reservation_id'),
+                'tarif': float(summary['tarif']) if summary.get('tarif') is not None else None,
+                'difference': None, 'matched_on': None, 'status': 'missing_pms',
+            })
+    return lines
+
+def count_statuses(lines):
+    counts = dict.fromkeys(STATUS_LABELS, 0)
+    for line in lines:
+        counts[line['status']] += 1
+    return counts
+
+def reconcile_pms_file(file_content, separator=';', tolerance=PRICE_TOLERANCE):
+    """
+    Reconcile a PMS export (CSV text) against the summaries arriving in its
+    date range. Returns the lines of reconcile().
+    """
+    from cms_parser import read_pms_csv
+    from database import get_arrivals_between
+
+    records = reconciliation_records(read_pms_csv(file_content, separator))
+    dates = [record['arrival_date'] for record in records if record['arrival_date']]
+    summaries = get_arrivals_between(min(dates), max(dates)) if dates else []
+    return reconcile(records, summaries, tolerance)
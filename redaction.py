@@ -0,0 +1,58 @@
+import re
+
+CARD_MASK = '[CARTE MASQUÉE]'
+
+# Card number candidates, all in one pattern so the text is scanned once:
+# three groups of four followed by 1 to 7 digits (4-4-4-4 and longer PANs),
+# Amex 4-6-5, or 13 to 19 contiguous digits. Groups may be separated by up to
+# two spaces, tabs, non-breaking spaces or hyphens, but never a line break, so
+# the pattern can be applied line by line on streamed input.
+SEPARATOR = '[ \t\u00a0\u202f-]{0,2}'
+CARD_CANDIDATE = re.compile(
+    r'\b(?:'
+    rf'\d{{4}}(?:{SEPARATOR}\d{{4}}){{2}}{SEPARATOR}\d{{1,7}}'
+    rf'|\d{{4}}{SEPARATOR}\d{{6}}{SEPARATOR}\d{{5}}'
+    r'|\d{13,19}'
+    r')\b'
+)
+NON_DIGIT = re.compile(r'\D')
+
+def luhn_valid(digits):
+    """Luhn checksum of a string of digits."""
+    total = 0
+    parity = len(digits) % 2
+    for i, char in enumerate(digits):
+        n = ord(char) - 48
+        if i % 2 == parity:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return total % 10 == 0
+
+def _mask_candidate(match):
+    candidate = match.group(0)
+    digits = NON_DIGIT.sub('', candidate)
+    if 13 <= len(digits) <= 19 and luhn_valid(digits):
+        return CARD_MASK
+    return candidate
+
+def redact_card_numbers(text):
+    """
+    Mask payment card numbers in a text. Only digit sequences of card length
+    that pass the Luhn check are masked, so phone numbers, reservation
+    references and amounts are left untouched.
+    """
+    if not text:
+        return text
+    return CARD_CANDIDATE.sub(_mask_candidate, text)
+
+def redact_lines(lines):
+    """Mask card numbers in an iterable of lines (e.g. an open file), lazily."""
+    for line in lines:
+        yield CARD_CANDIDATE.sub(_mask_candidate, line)
+
+def redact_stream(src, dst):
+    """Copy a text stream to another, masking card numbers without loading it whole."""
+    for line in redact_lines(src):
+        dst.write(line)
@@ -0,0 +1,107 @@
+"""
+Golden-output regression corpus for the OTA parsers and templates.
+
+A snapshot of the fields and summary produced by the production engine is
+stored in regression/golden.json for every sample in attached_assets/ and for
+a deterministic set of generated variants (benchmarks/corpus.py). Any parser
+or template rewrite must reproduce it exactly.
+
+    python -m regression.golden record                       # (re)write the snapshot
+    python -m regression.golden check                        # production vs snapshot
+    python -m regression.golden check --engine pkg.mod:ENGINE
+    python -m regression.golden compare --candidate pkg.mod:ENGINE
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from differential import PRODUCTION_ENGINE, load_engine, run_engine, diff_outputs, format_diffs
+from benchmarks.corpus import base_corpus, synthesize
+
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.json')
+
+DEFAULT_CORPUS = {'variants': 60, 'seed': 0, 'pad_kb': 4}
+
+
+def build_corpus(variants, seed, pad_kb):
+    """(name, text) pairs: every base sample, then the generated variants."""
+    corpus = [(name, text) for name, text in base_corpus(seed)]
+    for i, (name, text) in enumerate(synthesize(variants, seed=seed, pad_kb=pad_kb)):
+        corpus.append((f"variant-{i:03d} {name}", text))
+    return corpus
+
+
+def record(args):
+    params = DEFAULT_CORPUS
+    samples = {name: run_engine(PRODUCTION_ENGINE, text) for name, text in build_corpus(**params)}
+    with open(SNAPSHOT_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'corpus': params, 'samples': samples}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write('\n')
+    print(f"{len(samples)} échantillons enregistrés dans {os.path.relpath(SNAPSHOT_FILE, ROOT)}")
+    return 0
+
+
+def report(results, verbose):
+    """Print the per-sample diffs; returns the exit status."""
+    mismatches = {name: diffs for name, diffs in results.items() if diffs}
+    for name, diffs in mismatches.items():
+        print(f"✗ {name}")
+        if verbose:
+            print(format_diffs(diffs))
+        else:
+            print('  ' + ', '.join(sorted({field for field, _, _ in diffs})))
+    print(f"\n{len(results) - len(mismatches)}/{len(results)} échantillons identiques")
+    return 1 if mismatches else 0
+
+
+def check(args):
+    with open(SNAPSHOT_FILE, encoding='utf-8') as f:
+        snapshot = json.load(f)
+    engine = load_engine(args.engine) if args.engine else PRODUCTION_ENGINE
+    corpus = dict(build_corpus(**snapshot['corpus']))
+    results = {}
+    for name, expected in snapshot['samples'].items():
+        if name not in corpus:
+            results[name] = [('sample', 'présent', 'absent du corpus')]
+            continue
+        results[name] = diff_outputs(expected, run_engine(engine, corpus[name]))
+    return report(results, args.verbose)
+
+
+def compare(args):
+    baseline = load_engine(args.baseline) if args.baseline else PRODUCTION_ENGINE
+    candidate = load_engine(args.candidate)
+    results = {}
+    for name, text in build_corpus(args.variants, args.seed, args.pad_kb):
+        results[name] = diff_outputs(run_engine(baseline, text), run_engine(candidate, text))
+    return report(results, args.verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('record', help="Enregistre la sortie du moteur de production")
+
+    check_parser = commands.add_parser('check', help="Compare un moteur au snapshot")
+    check_parser.add_argument('--engine', help="Moteur à vérifier (module:attribut), production par défaut")
+    check_parser.add_argument('-v', '--verbose', action='store_true', help="Affiche les valeurs des champs divergents")
+
+    compare_parser = commands.add_parser('compare', help="Exécute deux moteurs côte à côte")
+    compare_parser.add_argument('--candidate', required=True, help="Moteur candidat (module:attribut)")
+    compare_parser.add_argument('--baseline', help="Moteur de référence, production par défaut")
+    compare_parser.add_argument('--variants', type=int, default=200)
+    compare_parser.add_argument('--seed', type=int, default=0)
+    compare_parser.add_argument('--pad-kb', type=int, default=16)
+    compare_parser.add_argument('-v', '--verbose', action='store_true')
+
+    args = parser.parse_args()
+    return {'record': record, 'check': check, 'compare': compare}[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
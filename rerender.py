@@ -0,0 +1,248 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from db_pool import get_connection, execute_batch
+from analytics import rebuild_rollups
+from database import sanitize_card_numbers
+from parsers import parse_email
+from preprocess import preprocess_email
+from ota_registry import platform_id_for
+from templates import generate_summary_with_template
+
+# Re-parse and re-render the stored history after a parser rule or a template
+# changes. The rows are read by keyset pages (id > last id seen), each page in
+# its own short read, so no transaction stays open for the whole scan; changed
+# rows are written back by batch, each batch in its own short transaction
+# together with the checkpoint, so an interrupted job resumes after the last
+# committed id.
+
+BATCH_SIZE = 500
+
+# Parsed columns rewritten with --fields, and the parser key they come from
+# (as in database.save_summary). platform and reservation_id identify the
+# reservation (unique index) and are never rewritten.
+FIELD_KEYS = {
+    'guest_name': 'guest_name', 'tarif': 'tarif', 'vad': 'vad', 'commission': 'commission',
+    'date_arrivee': 'dates_arrivee', 'date_depart': 'dates_depart',
+    'arrival_date': 'arrival_date', 'departure_date': 'departure_date', 'sejour_details': 'sejour_details',
+}
+FIELD_COLUMNS = tuple(FIELD_KEYS)
+AMOUNT_COLUMNS = ('tarif', 'vad', 'commission')
+
+def init_rerender_table():
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS rerender_checkpoints (
+                job VARCHAR(100) PRIMARY KEY,
+                last_id INTEGER NOT NULL DEFAULT 0,
+                scanned INTEGER NOT NULL DEFAULT 0,
+                changed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                rollups_from DATE,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        cur.close()
+
+def get_checkpoint(job):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''SELECT last_id, scanned, changed, failed, rollups_from, finished_at
+                       FROM rerender_checkpoints WHERE job = %s''', (job,))
+        row = cur.fetchone()
+        cur.close()
+    if row is None:
+        return None
+    return dict(zip(('last_id', 'scanned', 'changed', 'failed', 'rollups_from', 'finished_at'), row))
+
+def reset_checkpoint(job):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('DELETE FROM rerender_checkpoints WHERE job = %s', (job,))
+        conn.commit()
+        cur.close()
+
+def _number(value):
+    return None if value is None else round(float(value), 2)
+
+def rerender_row(row):
+    """
+    New summary (and parsed fields) for one stored row, or None when nothing
+    changed. The footer keeps the date the summary was saved on. Runs in the
+    worker processes.
+    """
+    email_text = preprocess_email(row['email_raw'])
+    data = parse_email(email_text, platform_id_for(row['platform']))
+    today = row['saved_at'].strftime("%d/%m/%Y")
+    summary = sanitize_card_numbers(
+        generate_summary_with_template(data, row['receptionist_name'] or '', today=today)
+    )
+    fields = {column: data.get(key) for column, key in FIELD_KEYS.items()}
+    fields['sejour_details'] = sanitize_card_numbers(fields['sejour_details'])
+    changed_fields = [
+        column for column in FIELD_COLUMNS
+        if (_number(fields[column]) != _number(row[column]) if column in AMOUNT_COLUMNS
+            else fields[column] != row[column])
+    ]
+    if summary == row['summary_text'] and not changed_fields:
+        return None
+    return {'id': row['id'], 'summary_text': summary, 'fields': fields, 'changed_fields': changed_fields,
+            'day': row['created_at'].date()}
+
+def _safe_rerender_row(row):
+    try:
+        return rerender_row(row), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _stream_batches(last_id, batch_size):
+    columns = ('id', 'created_at', 'saved_at', 'platform', 'receptionist_name', 'email_raw', 'summary_text') + FIELD_COLUMNS
+    query = f'''SELECT id, created_at, COALESCE(updated_at, created_at), platform, receptionist_name,
+                       email_raw, summary_text, {', '.join(FIELD_COLUMNS)}
+                FROM summaries WHERE id > %s AND email_raw IS NOT NULL ORDER BY id LIMIT %s'''
+    while True:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query, (last_id, batch_size))
+            rows = cur.fetchall()
+            conn.commit()
+            cur.close()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [dict(zip(columns, row)) for row in rows]
+
+def _write_batch(job, results, last_id, counts, update_fields):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        summaries = [(result['summary_text'], result['id']) for result in results if result['summary_text'] is not None]
+        execute_batch(cur, 'UPDATE summaries SET summary_text = %s WHERE id = %s', summaries)
+        if update_fields:
+            assignments = ', '.join(f'{column} = %s' for column in FIELD_COLUMNS)
+            execute_batch(cur, f'UPDATE summaries SET {assignments} WHERE id = %s', [
+                tuple(result['fields'][column] for column in FIELD_COLUMNS) + (result['id'],)
+                for result in results if result['changed_fields']
+            ])
+        cur.execute('''
+            INSERT INTO rerender_checkpoints (job, last_id, scanned, changed, failed, rollups_from, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (job) DO UPDATE SET
+                last_id = EXCLUDED.last_id, scanned = EXCLUDED.scanned, changed = EXCLUDED.changed,
+                failed = EXCLUDED.failed, rollups_from = EXCLUDED.rollups_from, updated_at = EXCLUDED.updated_at
+        ''', (job, last_id, counts['scanned'], counts['changed'], counts['failed'], counts['rollups_from']))
+        conn.commit()
+        cur.close()
+
+def _finish(job):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('UPDATE rerender_checkpoints SET finished_at = CURRENT_TIMESTAMP WHERE job = %s', (job,))
+        conn.commit()
+        cur.close()
+
+def run_job(job='default', batch_size=BATCH_SIZE, workers=None, update_fields=False, dry_run=False,
+            restart=False, on_progress=None):
+    """
+    Re-parse and re-render every stored email after the job's checkpoint.
+    Returns the counts: scanned, changed and failed rows since the job started,
+    and for this run the rows whose summary changed and the changed fields per
+    column. With dry_run nothing is written, checkpoint included, so the counts
+    are a diff preview.
+    """
+    init_rerender_table()
+    if restart or dry_run:
+        checkpoint = None
+    else:
+        checkpoint = get_checkpoint(job)
+        if checkpoint and checkpoint['finished_at']:
+            checkpoint = None
+    if checkpoint is None and not dry_run:
+        reset_checkpoint(job)
+    counts = {
+        'scanned': checkpoint['scanned'] if checkpoint else 0,
+        'changed': checkpoint['changed'] if checkpoint else 0,
+        'failed': checkpoint['failed'] if checkpoint else 0,
+        'rollups_from': checkpoint['rollups_from'] if checkpoint else None,
+        'summaries': 0,
+        'fields': {},
+        'errors': [],
+    }
+    last_id = checkpoint['last_id'] if checkpoint else 0
+    workers = workers or os.cpu_count() or 1
+
+    # Workers are spawned, not forked: a fork would copy the pool's open
+    # database connections into every child.
+    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    try:
+        for rows in _stream_batches(last_id, batch_size):
+            if executor is None:
+                outcomes = [_safe_rerender_row(row) for row in rows]
+            else:
+                outcomes = list(executor.map(_safe_rerender_row, rows, chunksize=max(1, len(rows) // (workers * 4))))
+            results = []
+            for row, (result, error) in zip(rows, outcomes):
+                if error:
+                    counts['failed'] += 1
+                    if len(counts['errors']) < 20:
+                        counts['errors'].append((row['id'], error))
+                elif result is not None:
+                    if result['summary_text'] == row['summary_text']:
+                        result['summary_text'] = None
+                    results.append(result)
+            counts['scanned'] += len(rows)
+            counts['changed'] += len(results)
+            for result in results:
+                if result['summary_text'] is not None:
+                    counts['summaries'] += 1
+                for column in result['changed_fields']:
+                    counts['fields'][column] = counts['fields'].get(column, 0) + 1
+                if update_fields and any(column in AMOUNT_COLUMNS for column in result['changed_fields']):
+                    counts['rollups_from'] = min(counts['rollups_from'] or result['day'], result['day'])
+            last_id = rows[-1]['id']
+            if not dry_run:
+                _write_batch(job, results, last_id, counts, update_fields)
+            if on_progress:
+                on_progress(counts)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not dry_run:
+        if counts['rollups_from'] is not None:
+            # Amounts feed the daily rollups; rebuild from the first day touched.
+            rebuild_rollups(since=counts['rollups_from'])
+        _finish(job)
+    return counts
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-génère les résumés enregistrés après un changement de parseur ou de template.")
+    parser.add_argument('--job', default='default', help="Nom du job (un point de reprise par job)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="Processus de parsing (défaut : nombre de CPU)")
+    parser.add_argument('--fields', action='store_true',
+                        help="Réécrit aussi les champs extraits (client, montants, dates, détails)")
+    parser.add_argument('--dry-run', action='store_true', help="Compte les différences sans rien écrire")
+    parser.add_argument('--restart', action='store_true', help="Ignore le point de reprise et repart du début")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    def show_progress(counts):
+        elapsed = time.perf_counter() - started
+        print(f"\r{counts['scanned']} lus, {counts['changed']} modifiés, {counts['failed']} erreurs "
+              f"({counts['scanned'] / elapsed:.0f} lignes/s)", end='', flush=True)
+
+    counts = run_job(args.job, args.batch_size, args.workers, args.fields, args.dry_run, args.restart, show_progress)
+    print()
+    print(f"{'Différences' if args.dry_run else 'Mis à jour'} : {counts['summaries']} résumés")
+    for column, count in sorted(counts['fields'].items()):
+        print(f"  {column} : {count}")
+    for row_id, error in counts['errors']:
+        print(f"  ✗ id {row_id} : {error}")
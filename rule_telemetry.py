@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Opt-in per-pattern telemetry for the extraction rules of parsers.py.
+# OTA_RULE_TELEMETRY=1 enables it; counters are aggregated in memory and
+# flushed every OTA_RULE_TELEMETRY_FLUSH seconds to regex_rule_stats.
+
+FLUSH_INTERVAL = float(os.environ.get('OTA_RULE_TELEMETRY_FLUSH', '60'))
+SCALING_MIN_CHARS = 4096
+
+# Helpers whose caller is reported as the rule's site (the parse_* function).
+_HELPERS = {'search', 'extract_price', 'extract_text'}
+
+_enabled = os.environ.get('OTA_RULE_TELEMETRY', '0') == '1'
+_lock = threading.Lock()
+_pending = {}
+_flusher = None
+_last_error = None
+
+def is_enabled():
+    return _enabled
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+def _caller_site():
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_name in _HELPERS:
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else '?'
+
+def search(pattern, text, flags=0):
+    """re.search() that counts hits, misses and time per (site, pattern) when enabled."""
+    if not _enabled:
+        return re.search(pattern, text, flags)
+    compiled = re.compile(pattern, flags)  # outside the timing: compilation is a one-off
+    start = time.perf_counter_ns()
+    match = compiled.search(text)
+    elapsed_us = (time.perf_counter_ns() - start) / 1000
+    _record(_caller_site(), pattern, match is not None, elapsed_us, len(text))
+    return match
+
+def _record(site, pattern, hit, elapsed_us, chars):
+    # On short emails fixed costs dominate; only long inputs tell how a pattern scales.
+    us_per_kb = elapsed_us * 1024 / chars if chars >= SCALING_MIN_CHARS else 0.0
+    with _lock:
+        stats = _pending.get((site, pattern))
+        if stats is None:
+            stats = _pending[(site, pattern)] = {
+                'calls': 0, 'hits': 0, 'total_us': 0.0, 'max_us': 0.0, 'max_chars': 0, 'worst_us_per_kb': 0.0,
+            }
+        stats['calls'] += 1
+        stats['hits'] += hit
+        stats['total_us'] += elapsed_us
+        if elapsed_us > stats['max_us']:
+            stats['max_us'] = elapsed_us
+            stats['max_chars'] = chars
+        stats['worst_us_per_kb'] = max(stats['worst_us_per_kb'], us_per_kb)
+    _ensure_flusher()
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None or FLUSH_INTERVAL <= 0:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, daemon=True)
+            _flusher.start()
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        previous_error = _last_error
+        try:
+            flush()
+        except Exception:
+            pass
+        # The counters are kept for the next flush. A new error, or the
+        # recovery, goes to the activity log like the other background errors
+        # (shadow mode); a database that stays down is logged once, and
+        # last_flush_error() reports it in the Back Office if the log is down too.
+        if _last_error == previous_error:
+            continue
+        details = _last_error or f"Écriture rétablie après : {previous_error}"
+        try:
+            from activity_log import log_activity
+            log_activity(None, None, 'rule_telemetry_error', details[:500])
+        except Exception:
+            pass
+
+def last_flush_error():
+    """Message of the last failed flush, or None once a flush succeeded."""
+    return _last_error
+
+def pending_stats():
+    """In-memory counters not yet flushed, as rows sorted like rule_report()."""
+    with _lock:
+        rows = [dict(site=site, pattern=pattern, **stats) for (site, pattern), stats in _pending.items()]
+    return rank(rows)
+
+def clear():
+    with _lock:
+        _pending.clear()
+
+def init_rule_stats_table():
+    from db_pool import get_connection
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS regex_rule_stats (
+                site VARCHAR(100) NOT NULL,
+                pattern TEXT NOT NULL,
+                calls BIGINT NOT NULL DEFAULT 0,
+                hits BIGINT NOT NULL DEFAULT 0,
+                total_us DOUBLE PRECISION NOT NULL DEFAULT 0,
+                max_us DOUBLE PRECISION NOT NULL DEFAULT 0,
+                max_chars INTEGER NOT NULL DEFAULT 0,
+                worst_us_per_kb DOUBLE PRECISION NOT NULL DEFAULT 0,
+                last_seen TIMESTAMP,
+                PRIMARY KEY (site, pattern)
+            )
+        ''')
+        conn.commit()
+        cur.close()
+
+def flush():
+    """
+    Write the in-memory counters to regex_rule_stats; returns the number of
+    rules written. On failure the counters are merged back into the pending
+    ones and the exception is raised.
+    """
+    global _last_error
+    with _lock:
+        snapshot = dict(_pending)
+        _pending.clear()
+    if not snapshot:
+        return 0
+
+    rows = [(site, pattern, s['calls'], s['hits'], s['total_us'], s['max_us'], s['max_chars'], s['worst_us_per_kb'])
+            for (site, pattern), s in snapshot.items()]
+    try:
+        _write_rows(rows)
+    except Exception as e:
+        _restore(snapshot)
+        _last_error = f"{type(e).__name__}: {e}"
+        raise
+    _last_error = None
+    return len(rows)
+
+def _restore(snapshot):
+    """Merge the counters of a failed flush with those recorded since."""
+    with _lock:
+        for key, stats in snapshot.items():
+            current = _pending.get(key)
+            if current is None:
+                _pending[key] = stats
+                continue
+            current['calls'] += stats['calls']
+            current['hits'] += stats['hits']
+            current['total_us'] += stats['total_us']
+            if stats['max_us'] > current['max_us']:
+                current['max_us'] = stats['max_us']
+                current['max_chars'] = stats['max_chars']
+            current['worst_us_per_kb'] = max(current['worst_us_per_kb'], stats['worst_us_per_kb'])
+
+def _write_rows(rows):
+    from db_pool import get_connection, execute_batch
+    now = datetime.now()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        execute_batch(cur, '''
+            INSERT INTO regex_rule_stats (site, pattern, calls, hits, total_us, max_us, max_chars, worst_us_per_kb, last_seen)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (site, pattern) DO UPDATE SET
+                calls = regex_rule_stats.calls + EXCLUDED.calls,
+                hits = regex_rule_stats.hits + EXCLUDED.hits,
+                total_us = regex_rule_stats.total_us + EXCLUDED.total_us,
+                max_chars = CASE WHEN EXCLUDED.max_us > regex_rule_stats.max_us
+                                 THEN EXCLUDED.max_chars ELSE regex_rule_stats.max_chars END,
+                max_us = GREATEST(regex_rule_stats.max_us, EXCLUDED.max_us),
+                worst_us_per_kb = GREATEST(regex_rule_stats.worst_us_per_kb, EXCLUDED.worst_us_per_kb),
+                last_seen = EXCLUDED.last_seen
+        ''', [row + (now,) for row in rows])
+        conn.commit()
+        cur.close()
+
+# Linear patterns stay under ~100 µs per KB of email here; beyond, the pattern backtracks.
+BACKTRACKING_US_PER_KB = 150
+
+def rank(rows, backtracking_us_per_kb=BACKTRACKING_US_PER_KB):
+    """
+    Add 'avg_us' and a 'verdict' to each row ('backtracking', 'morte' for a rule
+    that never matched, or ''), worst first: backtracking, then dead, then by
+    total time.
+    """
+    for row in rows:
+        row['avg_us'] = row['total_us'] / row['calls'] if row['calls'] else 0.0
+        if row['worst_us_per_kb'] >= backtracking_us_per_kb:
+            row['verdict'] = 'backtracking'
+        elif row['hits'] == 0:
+            row['verdict'] = 'morte'
+        else:
+            row['verdict'] = ''
+    order = {'backtracking': 0, 'morte': 1, '': 2}
+    rows.sort(key=lambda r: (order[r['verdict']], -r['total_us']))
+    return rows
+
+def rule_report(backtracking_us_per_kb=BACKTRACKING_US_PER_KB):
+    """Flushed statistics per rule, ranked by rank()."""
+    from psycopg2.extras import RealDictCursor
+    from db_pool import get_connection
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute('''
+            SELECT site, pattern, calls, hits, total_us, max_us, max_chars, worst_us_per_kb, last_seen
+            FROM regex_rule_stats
+        ''')
+        rows = [dict(row) for row in cur.fetchall()]
+        cur.close()
+    return rank(rows, backtracking_us_per_kb)
+
+def reset_rule_stats():
+    from db_pool import get_connection
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('DELETE FROM regex_rule_stats')
+        conn.commit()
+        cur.close()
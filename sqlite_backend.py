@@ -0,0 +1,214 @@
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+# SQLite backend for offline and development runs (DATABASE_URL=sqlite:///path.db).
+# The modules keep writing PostgreSQL: translate() rewrites the few constructs
+# SQLite lacks, and the connection mimics the psycopg2 API the modules use
+# (cursor(), %s parameters, cursor_factory for dict rows, named cursors,
+# commit/rollback). The database runs in WAL mode so readers do not block the
+# writer.
+
+BUSY_TIMEOUT_MS = 5000
+
+# Types come back as with psycopg2 (datetime, date, Decimal, bool), from the
+# declared column types.
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter('DECIMAL', lambda raw: Decimal(raw.decode()))
+sqlite3.register_converter('BOOLEAN', lambda raw: raw not in (b'0', b''))
+
+# Expressions (COALESCE(updated_at, created_at)...) have no declared type: their
+# timestamps are recognized by shape.
+TIMESTAMP_TEXT = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d{1,6})?')
+
+ADD_COLUMN_IF_NOT_EXISTS = re.compile(r'ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+REGCLASS = re.compile(r"to_regclass\('(\w+)'\)\s+IS\s+NOT\s+NULL", re.IGNORECASE)
+DATERANGE_OVERLAP = re.compile(
+    r"daterange\(([^,()]+),\s*([^,()]+),\s*'\[\)'\)\s*&&\s*daterange\(([^,()]+),\s*([^,()]+),\s*'\[\)'\)"
+)
+REGEX_NO_MATCH = re.compile(r'(\w+)\s+!~\s+')
+REGEX_MATCH = re.compile(r'(\w+)\s+~\s+')
+CAST_DATE = re.compile(r'CAST\(([^()]+)\s+AS\s+DATE\)', re.IGNORECASE)
+TRANSLATIONS = (
+    (re.compile(r'\bSERIAL\s+PRIMARY\s+KEY', re.IGNORECASE), 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'\bILIKE\b', re.IGNORECASE), 'LIKE'),
+    (re.compile(r'\bGREATEST\(', re.IGNORECASE), 'MAX('),
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE), ''),
+    (REGCLASS, r"EXISTS (SELECT 1 FROM sqlite_master WHERE name = '\1')"),
+    (DATERANGE_OVERLAP, r'ranges_overlap(\1, \2, \3, \4)'),
+    (REGEX_NO_MATCH, r'\1 NOT REGEXP '),
+    (REGEX_MATCH, r'\1 REGEXP '),
+    (CAST_DATE, r'date(\1)'),
+)
+
+def translate(query):
+    """
+    SQLite version of a PostgreSQL query, or None for a statement with no
+    SQLite equivalent that can be skipped (GiST index).
+    """
+    if re.search(r'\bUSING\s+GIST\b', query, re.IGNORECASE):
+        return None
+    for pattern, replacement in TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    return query.replace('%s', '?')
+
+def _regexp(pattern, value):
+    return value is not None and re.search(pattern, value) is not None
+
+def _ranges_overlap(start, end, other_start, other_end):
+    # Half-open [start, end) ranges of ISO dates; an empty range overlaps nothing.
+    if None in (start, end, other_start, other_end) or start >= end or other_start >= other_end:
+        return False
+    return start < other_end and other_start < end
+
+def _convert(value):
+    if isinstance(value, str) and 19 <= len(value) <= 26 and TIMESTAMP_TEXT.fullmatch(value):
+        return datetime.fromisoformat(value)
+    return value
+
+class SQLiteCursor:
+    """The subset of a psycopg2 cursor used by the modules."""
+
+    def __init__(self, connection, dict_rows=False):
+        self._connection = connection
+        self._cursor = connection.cursor()
+        self._dict_rows = dict_rows
+        self.itersize = 2000
+        self.arraysize = 1
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=None):
+        alter = ADD_COLUMN_IF_NOT_EXISTS.match(query.strip())
+        if alter:
+            table, column = alter.groups()
+            existing = {row[1] for row in self._connection.execute(f'PRAGMA table_info({table})')}
+            if column in existing:
+                return
+            query = ADD_COLUMN_IF_NOT_EXISTS.sub(r'ALTER TABLE \1 ADD COLUMN \2', query)
+        elif re.search(r'\bFOR\s+UPDATE\b', query, re.IGNORECASE) and not self._connection.in_transaction:
+            # Row locks do not exist: take the database write lock up front so
+            # the read-then-write sequence cannot be interleaved.
+            self._connection.execute('BEGIN IMMEDIATE')
+        query = translate(query)
+        if query is None:
+            return
+        self._cursor.execute(query, tuple(params or ()))
+
+    def executemany(self, query, params_seq):
+        query = translate(query)
+        if query is not None:
+            self._cursor.executemany(query, [tuple(params) for params in params_seq])
+
+    def _row(self, row):
+        row = tuple(_convert(value) for value in row)
+        if self._dict_rows:
+            return dict(zip((column[0] for column in self._cursor.description), row))
+        return row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._row(row)
+
+    def fetchmany(self, size=None):
+        return [self._row(row) for row in self._cursor.fetchmany(size or self.arraysize)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class SQLiteConnection:
+    """A sqlite3 connection behind the psycopg2 connection methods used by the modules."""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                           check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+        self._connection.create_function('regexp', 2, _regexp, deterministic=True)
+        self._connection.create_function('ranges_overlap', 4, _ranges_overlap, deterministic=True)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+
+    def cursor(self, name=None, cursor_factory=None):
+        # A named (server-side) cursor is a plain cursor: sqlite3 already
+        # steps through the result as rows are fetched. Any cursor_factory
+        # (RealDictCursor) means dict rows.
+        return SQLiteCursor(self._connection, dict_rows=cursor_factory is not None)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def close(self):
+        self._connection.close()
+
+class SQLitePool:
+    """Same interface as psycopg2's SimpleConnectionPool, safe across threads."""
+
+    def __init__(self, minconn, maxconn, path):
+        self.path = path
+        self.maxconn = maxconn
+        self._idle = []
+        self._lock = threading.Lock()
+        for _ in range(minconn):
+            self._idle.append(SQLiteConnection(path))
+
+    def getconn(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return SQLiteConnection(self.path)
+
+    def putconn(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.maxconn:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def closeall(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+
+def path_from_url(url):
+    """'sqlite:///data/hotel.db' -> 'data/hotel.db', 'sqlite:////var/hotel.db' -> '/var/hotel.db'."""
+    return url[len('sqlite:///'):] if url.startswith('sqlite:///') else url[len('sqlite://'):]
+
+def execute_batch(cur, query, params_seq):
+    cur.executemany(query, params_seq)
@@ -0,0 +1,60 @@
+import os
+import re
+import weakref
+from db_pool import BACKEND
+
+# Server-side prepared statements for the fixed SQL of the hot paths (login,
+# summary save, activity log). Each statement is PREPAREd the first time it
+# runs on a pooled connection, then sent as EXECUTE name (params): PostgreSQL
+# skips parsing and planning on every later call. Which statements a
+# connection holds is tracked per connection object and server backend, so a
+# connection replaced by the pool after a disconnect prepares them again.
+#
+# OTA_PREPARED_STATEMENTS=0 sends the plain SQL instead (needed behind a
+# transaction-mode pooler such as PgBouncer, where the session changes under
+# the connection). On SQLite the plain SQL is always used; sqlite3 keeps its
+# own statement cache.
+
+ENABLED = os.environ.get('OTA_PREPARED_STATEMENTS', '1') != '0' and BACKEND != 'sqlite'
+
+_prepared = weakref.WeakKeyDictionary()
+_names = set()
+
+class PreparedStatement:
+    def __init__(self, name, query):
+        if name in _names:
+            raise ValueError(f"Requête préparée déjà déclarée : {name}")
+        _names.add(name)
+        self.name = name
+        self.query = query
+        self.param_count = query.count('%s')
+        self.numbered_query = numbered(query)
+        self._prepare = f'PREPARE {name} AS ' + self.numbered_query
+        self._execute = f"EXECUTE {name} ({', '.join(['%s'] * self.param_count)})" if self.param_count else f'EXECUTE {name}'
+
+    def execute(self, cur, params=()):
+        if not ENABLED:
+            cur.execute(self.query, params)
+            return
+        connection = cur.connection
+        backend_pid = connection.get_backend_pid()
+        held = _prepared.get(connection)
+        if held is None or held[0] != backend_pid:
+            held = _prepared[connection] = (backend_pid, set())
+        if self.name not in held[1]:
+            cur.execute(self._prepare)
+            held[1].add(self.name)
+        cur.execute(self._execute, params)
+
+def numbered(query):
+    """The query with its %s placeholders numbered $1, $2... (PREPARE, asyncpg)."""
+    numbers = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f'${next(numbers)}', query)
+
+def prepared(name, query):
+    """Declare a statement (SQL with %s parameters) to be prepared on each connection."""
+    return PreparedStatement(name, query)
+
+def forget(connection):
+    """Drop the tracking of a connection (after DEALLOCATE ALL or DISCARD ALL)."""
+    _prepared.pop(connection, None)
@@ -0,0 +1,153 @@
+import string
+import time
+from datetime import date, datetime, timedelta
+from formatting import PRICE_FORMATS
+
+# Declarative summary templates. A template is a list of items, one per output
+# line (or group of lines):
+#
+#   "Encaisser TDS + Extras"                  literal line
+#   "Total : {tarif:eur}"                     line with fields; a named format from
+#                                             formatting.PRICE_FORMATS or a format spec
+#   choose((present('recapitulatif'), "{recapitulatif}"), [...])
+#                                             first branch whose condition holds,
+#                                             else the default (item, list or None)
+#   when(present('sejour_details'), "{sejour_details}")
+#
+# compile_template() generates the source of one Python function per template
+# (literal lines folded, fields read once, present()/known() conditions inlined)
+# and compiles it once; rendering a summary is then a single plain function
+# call, as fast as the hand-written generators it replaces. {receptionist_name}
+# and {today} come from the render call rather than from the parsed data.
+
+CONTEXT_FIELDS = ('receptionist_name', 'today')
+
+# Footer date and the timestamp of the next local midnight, when it expires:
+# formatting the date costs more than rendering the rest of a summary.
+_today = ('', 0.0)
+
+def today_string():
+    global _today
+    if time.time() >= _today[1]:
+        day = date.today()
+        _today = (day.strftime("%d/%m/%Y"), datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp())
+    return _today[0]
+
+def _condition(kind, fields, check):
+    check.kind = kind
+    check.fields = fields
+    return check
+
+def present(*fields):
+    """Condition: every field has a truthy value."""
+    return _condition('present', fields, lambda data: all(data.get(field) for field in fields))
+
+def known(*fields):
+    """Condition: every field is set (0 included)."""
+    return _condition('known', fields, lambda data: all(data.get(field) is not None for field in fields))
+
+def choose(*branches, default=None):
+    return ('choose', branches, default)
+
+def when(condition, item):
+    return ('choose', ((condition, item),), None)
+
+class _Compiler:
+    """Source of one render function; globals collects the objects it refers to."""
+
+    def __init__(self):
+        self.lines = []
+        self.fields = {}
+        self.globals = {'today_string': today_string}
+
+    def emit(self, depth, code):
+        self.lines.append('    ' * depth + code)
+
+    def name_for(self, prefix, value):
+        for name, known_value in self.globals.items():
+            if known_value is value:
+                return name
+        name = f'{prefix}{len(self.globals)}'
+        self.globals[name] = value
+        return name
+
+    def field(self, name):
+        if name in CONTEXT_FIELDS:
+            return name
+        if name not in self.fields:
+            self.fields[name] = f'f{len(self.fields)}'
+        return self.fields[name]
+
+    def line(self, text):
+        """Expression of one output line."""
+        parts = []
+        for literal, name, spec, _ in string.Formatter().parse(text):
+            if literal:
+                parts.append(repr(literal))
+            if name is None:
+                continue
+            value = self.field(name)
+            if not spec:
+                parts.append('today' if name == 'today' else f'str({value})')
+            elif spec in PRICE_FORMATS:
+                parts.append(f"{self.name_for('fmt', PRICE_FORMATS[spec])}({value})")
+            else:
+                parts.append(f'format({value}, {spec!r})')
+        return ' + '.join(parts) or "''"
+
+    def condition(self, condition):
+        kind = getattr(condition, 'kind', None)
+        if kind == 'present':
+            return ' and '.join(self.field(name) for name in condition.fields)
+        if kind == 'known':
+            return ' and '.join(f'{self.field(name)} is not None' for name in condition.fields)
+        return f"{self.name_for('cond', condition)}(data)"
+
+    def item(self, item, depth):
+        if item is None:
+            return
+        if isinstance(item, str):
+            self.emit(depth, f'add({self.line(item)})')
+        elif isinstance(item, list):
+            for sub_item in item:
+                self.item(sub_item, depth)
+        else:
+            _, branches, default = item
+            for i, (condition, branch) in enumerate(branches):
+                self.emit(depth, f"{'if' if i == 0 else 'elif'} {self.condition(condition)}:")
+                self._block(branch, depth + 1)
+            if default is not None:
+                self.emit(depth, 'else:')
+                self._block(default, depth + 1)
+
+    def _block(self, item, depth):
+        start = len(self.lines)
+        self.item(item, depth)
+        if len(self.lines) == start:
+            self.emit(depth, 'pass')
+
+def compile_template(items, name='render'):
+    """
+    Render function of a template: (data, receptionist_name, today=None) -> str,
+    today defaulting to the current date.
+    """
+    compiler = _Compiler()
+    for item in items:
+        compiler.item(item, 1)
+    header = [
+        f'def {name}(data, receptionist_name, today=None):',
+        '    today = today or today_string()',
+        '    get = data.get',
+    ]
+    header += [f'    {variable} = get({field!r})' for field, variable in compiler.fields.items()]
+    header += ['    out = []', '    add = out.append']
+    source = '\n'.join(header + compiler.lines + ['    return "\\n".join(out)'])
+    namespace = dict(compiler.globals)
+    exec(compile(source, f'<template {name}>', 'exec'), namespace)
+    render = namespace[name]
+    render.template_source = source
+    return render
+
+def is_compiled(template):
+    """True for the functions of compile_template, which take a `today` argument."""
+    return hasattr(template, 'template_source')
@@ -1,243 +1,98 @@
-from datetime import datetime
+from ota_registry import get_plugins, get_template, platform_id_for
+from template_engine import choose, compile_template, is_compiled, known, present, today_string, when
 
 TEMPLATES = {
-    'weekendesk': {
-        'name': 'Weekendesk',
-        'description': 'Format pour réservations Weekendesk avec récapitulatif des activités'
-    },
-    'expedia': {
-        'name': 'Expedia / Egencia',
-        'description': 'Format pour réservations Expedia avec logique carte virtuelle'
-    },
-    'keytel': {
-        'name': 'Keytel',
-        'description': 'Format pour réservations Keytel avec PDJ inclus'
-    },
-    'smartbox': {
-        'name': 'Smartbox',
-        'description': 'Format pour réservations Smartbox avec commission'
-    },
-    'direct': {
-        'name': 'Réservation Directe',
-        'description': 'Format pour réservations directes avec garantie CB'
-    }
+    platform_id: {'name': plugin['template']['name'], 'description': plugin['template']['description']}
+    for platform_id, plugin in get_plugins().items() if 'template' in plugin
 }
 
-def format_price_eur(price):
-    """Format price as X.XX EUR."""
-    if price is None:
-        return "[Non trouvé]"
-    return f"{price:.2f} EUR"
+FOOTER = "{receptionist_name}, le {today}"
+TYPE_HEBERGEMENT = choose((present('type_hebergement'), "{type_hebergement}"),
+                          default="[Type d'hébergement non détecté]")
+TYPE_CHAMBRE = choose((present('type_chambre'), "{type_chambre}"),
+                      default="[Type de chambre non détecté]")
+# Recap block, or the stay dates and details when no recap was extracted.
+RECAPITULATIF = choose((present('recapitulatif'), "{recapitulatif}"), default=[
+    when(present('dates_arrivee', 'dates_depart'), "Du {dates_arrivee} au {dates_depart}"),
+    when(present('sejour_details'), "{sejour_details}"),
+])
 
-def generate_weekendesk(data, receptionist_name):
-    """
-    Format Weekendesk exact :
-    Weekendesk
-    [TYPE_HEBERGEMENT]
-    Total : [PRIX_CLIENT] EUR
-    Payline : [MONTANT_WEEKENDESK] EUR
-    Commission : [COMMISSION] EUR
-    [RECAPITULATIF avec dates et bullets]
-    Encaisser TDS + Extras
-    [Réceptionniste], le [DATE_DU_JOUR]
-    """
-    today = datetime.now().strftime("%d/%m/%Y")
-    
-    lines = ["Weekendesk"]
-    
-    type_heb = data.get('type_hebergement')
-    if type_heb:
-        lines.append(type_heb)
-    else:
-        lines.append("[Type d'hébergement non détecté]")
-    
-    tarif = data.get('tarif')
-    vad = data.get('vad')
-    commission = data.get('commission')
-    
-    lines.append(f"Total : {format_price_eur(tarif)}")
-    lines.append(f"Payline : {format_price_eur(vad)}")
-    lines.append(f"Commission : {format_price_eur(commission)}")
-    
-    recapitulatif = data.get('recapitulatif')
-    if recapitulatif:
-        lines.append(recapitulatif)
-    else:
-        if data.get('dates_arrivee') and data.get('dates_depart'):
-            lines.append(f"Du {data['dates_arrivee']} au {data['dates_depart']}")
-        if data.get('sejour_details'):
-            lines.append(data['sejour_details'])
-    
-    lines.append("Encaisser TDS + Extras")
-    lines.append(f"{receptionist_name}, le {today}")
-    
-    return "\n".join(lines)
+generate_weekendesk = compile_template([
+    "Weekendesk",
+    TYPE_HEBERGEMENT,
+    "Total : {tarif:eur}",
+    "Payline : {vad:eur}",
+    "Commission : {commission:eur}",
+    RECAPITULATIF,
+    "Encaisser TDS + Extras",
+    FOOTER,
+], name='generate_weekendesk')
 
-def generate_expedia(data, receptionist_name):
-    """
-    Format Expedia :
-    EXPEDIA
-    [TYPE_CHAMBRE]
-    [Logique paiement conditionnelle]
-    [Réceptionniste], le [DATE_DU_JOUR]
-    
-    Logique paiement :
-    - Si carte virtuelle Expedia : "Faire Payline [PRIX] + Encaisser TDS et Extras"
-    - Sinon : "Encaisser la totalité"
-    """
-    today = datetime.now().strftime("%d/%m/%Y")
-    
-    lines = ["EXPEDIA"]
-    
-    type_ch = data.get('type_chambre')
-    if type_ch:
-        lines.append(type_ch)
-    else:
-        lines.append("[Type de chambre non détecté]")
-    
-    is_virtual_card = data.get('is_virtual_card', False)
-    tarif = data.get('tarif')
-    
-    if is_virtual_card and tarif is not None:
-        lines.append(f"Faire Payline {format_price_eur(tarif)} + Encaisser TDS et Extras")
-    elif is_virtual_card:
-        lines.append("Faire Payline [Montant non trouvé] + Encaisser TDS et Extras")
-    else:
-        lines.append("Encaisser la totalité")
-    
-    lines.append(f"{receptionist_name}, le {today}")
-    
-    return "\n".join(lines)
+# Expedia virtual card: Payline for the amount, TDS and extras at the hotel.
+generate_expedia = compile_template([
+    "EXPEDIA",
+    TYPE_CHAMBRE,
+    choose(
+        (lambda data: data.get('is_virtual_card') and data.get('tarif') is not None,
+         "Faire Payline {tarif:eur} + Encaisser TDS et Extras"),
+        (present('is_virtual_card'), "Faire Payline [Montant non trouvé] + Encaisser TDS et Extras"),
+        default="Encaisser la totalité",
+    ),
+    FOOTER,
+], name='generate_expedia')
 
-def generate_direct(data, receptionist_name):
-    """
-    Format Réservation Directe :
-    Réservation Directe (Garantie CB)
-    [TYPE_CHAMBRE]
-    Encaisser la totalité ([PRIX_TOTAL_TTC]) + TDS + Extras
-    [Réceptionniste], le [DATE_DU_JOUR]
-    """
-    today = datetime.now().strftime("%d/%m/%Y")
-    
-    lines = ["Réservation Directe (Garantie CB)"]
-    
-    type_ch = data.get('type_chambre')
-    if type_ch:
-        lines.append(type_ch)
-    else:
-        lines.append("[Type de chambre non détecté]")
-    
-    tarif = data.get('tarif')
-    if tarif is not None:
-        lines.append(f"Encaisser la totalité ({format_price_eur(tarif)}) + TDS + Extras")
-    else:
-        lines.append("Encaisser la totalité + TDS + Extras")
-    
-    lines.append(f"{receptionist_name}, le {today}")
-    
-    return "\n".join(lines)
+generate_direct = compile_template([
+    "Réservation Directe (Garantie CB)",
+    TYPE_CHAMBRE,
+    choose((known('tarif'), "Encaisser la totalité ({tarif:eur}) + TDS + Extras"),
+           default="Encaisser la totalité + TDS + Extras"),
+    FOOTER,
+], name='generate_direct')
 
-def generate_keytel(data, receptionist_name):
-    """
-    Format Keytel :
-    KEYTEL
-    [TYPE_CHAMBRE]
-    Total [PRIX_TOTAL] € PDJ Inclus
-    Paiement Keytel
-    Encaisser TDS + Extras
-    [Réceptionniste], le [DATE_DU_JOUR]
-    """
-    today = datetime.now().strftime("%d/%m/%Y")
-    
-    lines = ["KEYTEL"]
-    
-    type_ch = data.get('type_chambre')
-    if type_ch:
-        lines.append(type_ch)
-    else:
-        lines.append("[Type de chambre non détecté]")
-    
-    tarif = data.get('tarif')
-    if tarif is not None:
-        lines.append(f"Total {tarif:.2f} € PDJ Inclus")
-    else:
-        lines.append("Total [Non trouvé] € PDJ Inclus")
-    
-    lines.append("Paiement Keytel")
-    lines.append("Encaisser TDS + Extras")
-    lines.append(f"{receptionist_name}, le {today}")
-    
-    return "\n".join(lines)
+generate_keytel = compile_template([
+    "KEYTEL",
+    TYPE_CHAMBRE,
+    "Total {tarif:amount} € PDJ Inclus",
+    "Paiement Keytel",
+    "Encaisser TDS + Extras",
+    FOOTER,
+], name='generate_keytel')
 
-def generate_smartbox(data, receptionist_name):
-    """
-    Format Smartbox :
-    Smartbox
-    [TYPE_HEBERGEMENT]
-    Prix total : [VALEUR DE PRIX_CLIENT]
-    Prix hors commission : [PRIX_HORS_COMMISSION]
-    Commission : [VALEUR DE COMMISSION]
-    [VALEUR DE RECAPITULATIF]
-    Encaisser TDS + Extras
-    [Réceptionniste], le [DATE_DU_JOUR]
-    """
-    today = datetime.now().strftime("%d/%m/%Y")
-    
-    lines = ["Smartbox"]
-    
-    type_heb = data.get('type_hebergement')
-    if type_heb:
-        lines.append(type_heb)
-    else:
-        lines.append("[Type d'hébergement non détecté]")
-    
-    tarif = data.get('tarif')
-    vad = data.get('vad')
-    commission = data.get('commission')
-    
-    lines.append(f"Prix total : {format_price_eur(tarif)}")
-    lines.append(f"Prix hors commission : {format_price_eur(vad)}")
-    lines.append(f"Commission : {format_price_eur(commission)}")
-    
-    recapitulatif = data.get('recapitulatif')
-    if recapitulatif:
-        lines.append(recapitulatif)
-    else:
-        if data.get('dates_arrivee') and data.get('dates_depart'):
-            lines.append(f"Du {data['dates_arrivee']} au {data['dates_depart']}")
-        if data.get('sejour_details'):
-            lines.append(data['sejour_details'])
-    
-    lines.append("Encaisser TDS + Extras")
-    lines.append(f"{receptionist_name}, le {today}")
-    
-    return "\n".join(lines)
+generate_smartbox = compile_template([
+    "Smartbox",
+    TYPE_HEBERGEMENT,
+    "Prix total : {tarif:eur}",
+    "Prix hors commission : {vad:eur}",
+    "Commission : {commission:eur}",
+    RECAPITULATIF,
+    "Encaisser TDS + Extras",
+    FOOTER,
+], name='generate_smartbox')
 
-TEMPLATE_GENERATORS = {
-    'weekendesk': generate_weekendesk,
-    'expedia': generate_expedia,
-    'keytel': generate_keytel,
-    'smartbox': generate_smartbox,
-    'direct': generate_direct,
-}
+def _render(template, data, receptionist_name, today):
+    # Plugin generators outside this module keep the (data, receptionist_name) signature.
+    if is_compiled(template):
+        return template(data, receptionist_name, today)
+    return template(data, receptionist_name)
 
-def generate_summary_with_template(data, receptionist_name, template_id=None):
+def generate_summary_with_template(data, receptionist_name, template_id=None, today=None):
     """Generate summary using the appropriate template based on platform."""
     if template_id is None:
-        platform = data.get('platform', '').lower()
-        if 'weekendesk' in platform:
-            template_id = 'weekendesk'
-        elif 'expedia' in platform:
-            template_id = 'expedia'
-        elif 'keytel' in platform:
-            template_id = 'keytel'
-        elif 'smartbox' in platform:
-            template_id = 'smartbox'
-        else:
-            template_id = 'direct'
-    
-    generator = TEMPLATE_GENERATORS.get(template_id, generate_direct)
-    return generator(data, receptionist_name)
+        template_id = platform_id_for(data.get('platform'))
+
+    return _render(get_template(template_id), data, receptionist_name, today)
+
+def render_batch(items, today=None):
+    """
+    Summaries of (data, receptionist_name) pairs, in order. The footer date is
+    computed once for the batch unless given (e.g. the original date when
+    re-rendering history).
+    """
+    today = today or today_string()
+    return [
+        _render(get_template(platform_id_for(data.get('platform'))), data, receptionist_name, today)
+        for data, receptionist_name in items
+    ]
 
 def get_template_list():
     """Return list of available templates for UI."""
@@ -0,0 +1,179 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+BUFFER_SIZE = int(os.environ.get('OTA_TRACING_BUFFER', '5000'))
+
+_enabled = os.environ.get('OTA_TRACING', '1') != '0'
+_buffer = deque(maxlen=BUFFER_SIZE)
+_local = threading.local()
+
+def is_enabled():
+    return _enabled
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+class _Span:
+    __slots__ = ('name', 'start', 'db_queries', 'db_rows')
+
+    def __init__(self, name):
+        self.name = name
+        self.db_queries = 0
+        self.db_rows = 0
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        _local.stack.pop()
+        _buffer.append({
+            'at': time.time(),
+            'name': self.name,
+            'duration_ms': duration_ms,
+            'db_queries': self.db_queries,
+            'db_rows': self.db_rows,
+            'error': exc_type.__name__ if exc_type else None,
+        })
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP = _NoopSpan()
+
+def span(name):
+    """
+    Time a block and record it in the ring buffer:
+
+        with span('ota.parse'):
+            data = parse_email(text)
+
+    Costs a single flag check when tracing is disabled (OTA_TRACING=0).
+    """
+    return _Span(name) if _enabled else _NOOP
+
+def traced(name=None):
+    """Decorator form of span(); the span is named after the function by default."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_query(rows):
+    """Count one database round-trip (and its rows) in every span open on this thread."""
+    for active in getattr(_local, 'stack', ()):
+        active.db_queries += 1
+        if rows and rows > 0:
+            active.db_rows += rows
+
+def get_records(name=None):
+    records = list(_buffer)
+    if name is not None:
+        records = [r for r in records if r['name'] == name]
+    return records
+
+def clear():
+    _buffer.clear()
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def stage_stats():
+    """Per-span statistics over the ring buffer, slowest p95 first."""
+    by_name = {}
+    for record in list(_buffer):
+        by_name.setdefault(record['name'], []).append(record)
+    stats = []
+    for name, records in by_name.items():
+        durations = sorted(r['duration_ms'] for r in records)
+        stats.append({
+            'name': name,
+            'count': len(records),
+            'p50_ms': _percentile(durations, 50),
+            'p95_ms': _percentile(durations, 95),
+            'max_ms': durations[-1],
+            'db_queries': sum(r['db_queries'] for r in records) / len(records),
+            'db_rows': sum(r['db_rows'] for r in records) / len(records),
+            'errors': sum(1 for r in records if r['error']),
+        })
+    stats.sort(key=lambda s: s['p95_ms'], reverse=True)
+    return stats
+
+def export_jsonl(path):
+    """Append the current buffer to a JSON Lines file."""
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in list(_buffer):
+            f.write(json.dumps(record) + '\n')
+
+class TracedCursor:
+    """Cursor proxy counting round-trips and rows for the active spans."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        result = self._cursor.execute(query, params)
+        record_query(self._cursor.rowcount)
+        return result
+
+    def executemany(self, query, params_seq):
+        result = self._cursor.executemany(query, params_seq)
+        record_query(self._cursor.rowcount)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # itersize, arraysize... belong to the wrapped cursor.
+        if name == '_cursor':
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._cursor.__exit__(exc_type, exc, tb)
+
+class TracedConnection:
+    """Connection proxy whose cursors are TracedCursor."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
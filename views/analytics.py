@@ -0,0 +1,69 @@
+import streamlit as st
+from datetime import date, timedelta
+from database import init_db
+from formatting import format_price
+from views.cache import cached_daily_rollups, cached_platform_totals
+
+@st.cache_resource(show_spinner=False)
+def ensure_rollup_tables():
+    # Le tableau de bord peut être ouvert avant OTA Helper.
+    init_db()
+    return True
+
+def run():
+    st.title("Tableau de bord - Chiffre d'affaires OTA")
+
+    if not st.session_state.get('user', {}).get('is_admin', False):
+        st.error("Accès refusé. Vous devez être administrateur.")
+        return
+
+    ensure_rollup_tables()
+
+    today = date.today()
+    date_range = st.date_input(
+        "Période",
+        value=(date(today.year, 1, 1), today),
+        format="DD/MM/YYYY",
+        key="analytics_date_range"
+    )
+    if len(date_range) < 2:
+        st.info("Sélectionnez une date de début et une date de fin.")
+        return
+    date_from, date_to = date_range
+
+    totals = cached_platform_totals(date_from, date_to)
+
+    if not totals:
+        st.info("Aucune réservation sur cette période.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Réservations", sum(row['booking_count'] for row in totals))
+    col2.metric("Tarif total", format_price(sum(row['total_tarif'] for row in totals)))
+    col3.metric("VAD / Payline", format_price(sum(row['total_vad'] for row in totals)))
+    col4.metric("Commissions", format_price(sum(row['total_commission'] for row in totals)))
+
+    st.subheader("Par plateforme")
+    st.dataframe([{
+        'Plateforme': row['platform'],
+        'Réservations': row['booking_count'],
+        'Tarif total': format_price(row['total_tarif']),
+        'VAD / Payline': format_price(row['total_vad']),
+        'Commission': format_price(row['total_commission']),
+    } for row in totals], use_container_width=True, hide_index=True)
+
+    st.subheader("Tarif journalier par plateforme")
+    daily = cached_daily_rollups(date_from, date_to)
+    chart_data = {}
+    for row in daily:
+        chart_data.setdefault(row['day'], {})[row['platform']] = float(row['total_tarif'])
+    platforms = sorted({row['platform'] for row in daily})
+    day = date_from
+    chart_rows = []
+    while day <= date_to:
+        values = chart_data.get(day, {})
+        chart_rows.append({'Jour': day, **{p: values.get(p, 0.0) for p in platforms}})
+        day += timedelta(days=1)
+    st.bar_chart(chart_rows, x='Jour', y=platforms)
+
+    st.caption("Données issues des agrégats journaliers (mis à jour à chaque résumé enregistré).")
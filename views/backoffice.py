@@ -1,6 +1,21 @@
+import os
+import tempfile
 import streamlit as st
-from auth import get_all_users, create_user, delete_user, update_user_password, toggle_admin, count_admins
-from activity_log import log_activity, get_activity_logs, get_action_label
+from datetime import datetime, time, timedelta
+from auth import create_user, delete_user, update_user_password, toggle_admin
+from activity_log import ACTION_LABELS, get_action_label
+import tracing
+import rule_telemetry
+import exports
+from views.cache import (
+    cached_users,
+    cached_admin_count,
+    cached_logs_page,
+    invalidate_users,
+    record_activity
+)
+
+LOGS_PAGE_SIZES = [50, 100, 500]
 
 def run():
     st.title("Back Office - Gestion des Utilisateurs")
@@ -9,13 +24,21 @@ def run():
         st.error("Accès refusé. Vous devez être administrateur.")
         return
     
-    tab_users, tab_logs = st.tabs(["Utilisateurs", "Journal d'activité"])
+    tab_users, tab_logs, tab_perf, tab_exports = st.tabs(["Utilisateurs", "Journal d'activité", "Performance", "Exports"])
     
     with tab_users:
         show_users_management()
     
     with tab_logs:
         show_activity_logs()
+    
+    with tab_perf:
+        show_performance()
+        st.markdown("---")
+        show_rule_telemetry()
+    
+    with tab_exports:
+        show_exports()
 
 def show_users_management():
     st.markdown("---")
@@ -39,8 +62,9 @@ def show_users_management():
                 else:
                     result = create_user(new_username, new_password, is_admin)
                     if result:
+                        invalidate_users()
                         current_user = st.session_state.get('user', {})
-                        log_activity(current_user.get('id'), current_user.get('username'), 'user_created', f"Utilisateur: {new_username}, Admin: {is_admin}")
+                        record_activity(current_user.get('id'), current_user.get('username'), 'user_created', f"Utilisateur: {new_username}, Admin: {is_admin}")
                         st.success(f"Utilisateur '{new_username}' créé avec succès !")
                         st.rerun()
                     else:
@@ -48,12 +72,14 @@ def show_users_management():
     
     st.subheader("Utilisateurs existants")
     
-    users = get_all_users()
+    users = cached_users()
     
     if not users:
         st.info("Aucun utilisateur enregistré.")
         return
     
+    admin_count = cached_admin_count()
+    
     for user in users:
         with st.container():
             col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
@@ -73,21 +99,20 @@ def show_users_management():
             
             with col3:
                 if user['id'] != st.session_state.user['id']:
-                    admin_count = count_admins()
                     can_toggle = not (user['is_admin'] and admin_count <= 1)
                     
                     if can_toggle:
                         btn_text = "Retirer admin" if user['is_admin'] else "Rendre admin"
                         if st.button(btn_text, key=f"admin_{user['id']}"):
                             toggle_admin(user['id'])
+                            invalidate_users()
                             current_user = st.session_state.get('user', {})
                             action = "retiré admin" if user['is_admin'] else "rendu admin"
-                            log_activity(current_user.get('id'), current_user.get('username'), 'user_admin_toggled', f"Utilisateur: {user['username']} {action}")
+                            record_activity(current_user.get('id'), current_user.get('username'), 'user_admin_toggled', f"Utilisateur: {user['username']} {action}")
                             st.rerun()
             
             with col4:
                 if user['id'] != st.session_state.user['id']:
-                    admin_count = count_admins()
                     can_delete = not (user['is_admin'] and admin_count <= 1)
                     
                     if can_delete:
@@ -103,7 +128,7 @@ def show_users_management():
                             if new_pwd and len(new_pwd) >= 4:
                                 update_user_password(user['id'], new_pwd)
                                 current_user = st.session_state.get('user', {})
-                                log_activity(current_user.get('id'), current_user.get('username'), 'user_password_changed', f"Utilisateur: {user['username']}")
+                                record_activity(current_user.get('id'), current_user.get('username'), 'user_password_changed', f"Utilisateur: {user['username']}")
                                 st.session_state[f"edit_pwd_{user['id']}"] = False
                                 st.success("Mot de passe modifié !")
                                 st.rerun()
@@ -121,8 +146,9 @@ def show_users_management():
                     if st.button("Oui, supprimer", key=f"yes_del_{user['id']}", type="primary"):
                         deleted_username = user['username']
                         delete_user(user['id'])
+                        invalidate_users()
                         current_user = st.session_state.get('user', {})
-                        log_activity(current_user.get('id'), current_user.get('username'), 'user_deleted', f"Utilisateur: {deleted_username}")
+                        record_activity(current_user.get('id'), current_user.get('username'), 'user_deleted', f"Utilisateur: {deleted_username}")
                         st.session_state[f"confirm_del_{user['id']}"] = False
                         st.rerun()
                 with col_no:
@@ -135,29 +161,218 @@ def show_users_management():
 def show_activity_logs():
     st.subheader("Journal d'activité")
     
-    logs = get_activity_logs(limit=200)
+    col_user, col_action, col_dates, col_size = st.columns([2, 2, 3, 1])
+    
+    with col_user:
+        usernames = sorted(user['username'] for user in cached_users())
+        username = st.selectbox("Utilisateur", ["all"] + usernames,
+                                format_func=lambda u: "Tous" if u == "all" else u,
+                                key="logs_username")
+    
+    with col_action:
+        action_type = st.selectbox("Action", ["all"] + list(ACTION_LABELS),
+                                   format_func=lambda a: "Toutes" if a == "all" else get_action_label(a),
+                                   key="logs_action_type")
+    
+    with col_dates:
+        date_range = st.date_input("Période", value=(), format="DD/MM/YYYY", key="logs_date_range")
+    
+    with col_size:
+        page_size = st.selectbox("Par page", LOGS_PAGE_SIZES, key="logs_page_size")
+    
+    date_from = date_to = None
+    if len(date_range) >= 1:
+        date_from = datetime.combine(date_range[0], time.min)
+        date_to = datetime.combine(date_range[-1] + timedelta(days=1), time.min)
+    
+    filters = {
+        'username': None if username == "all" else username,
+        'action_type': None if action_type == "all" else action_type,
+        'date_from': date_from,
+        'date_to': date_to,
+    }
+    
+    # Pile des curseurs des pages déjà parcourues ; réinitialisée si les filtres changent.
+    if st.session_state.get('logs_filters') != (filters, page_size):
+        st.session_state['logs_filters'] = (filters, page_size)
+        st.session_state['logs_cursors'] = []
+    cursors = st.session_state['logs_cursors']
+    
+    logs, next_cursor = cached_logs_page(page_size, cursors[-1] if cursors else None, **filters)
     
     if not logs:
         st.info("Aucune activité enregistrée.")
         return
     
-    st.write(f"**{len(logs)} dernières activités**")
-    
-    for log in logs:
-        col_time, col_user, col_action, col_details = st.columns([2, 2, 2, 3])
-        
-        with col_time:
-            st.caption(log['created_at'].strftime('%d/%m/%Y %H:%M:%S'))
-        
-        with col_user:
-            st.write(f"**{log['username'] or 'Système'}**")
-        
-        with col_action:
-            action_label = get_action_label(log['action_type'])
-            st.write(action_label)
-        
-        with col_details:
-            if log['action_details']:
-                st.caption(log['action_details'])
+    st.write(f"**Page {len(cursors) + 1}** — {len(logs)} activités")
     
-    st.markdown("---")
+    rows = [{
+        'Date': log['created_at'].strftime('%d/%m/%Y %H:%M:%S'),
+        'Utilisateur': log['username'] or 'Système',
+        'Action': get_action_label(log['action_type']),
+        'Détails': log['action_details'] or '',
+    } for log in logs]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    
+    col_newer, col_older = st.columns(2)
+    with col_newer:
+        if st.button("← Plus récentes", key="logs_newer", disabled=not cursors, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col_older:
+        if st.button("Plus anciennes →", key="logs_older", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+
+def show_performance():
+    st.subheader("Performance")
+    
+    if not tracing.is_enabled():
+        st.info("Le traçage est désactivé (OTA_TRACING=0).")
+        return
+    
+    stats = tracing.stage_stats()
+    if not stats:
+        st.info("Aucune mesure pour le moment.")
+        return
+    
+    total = sum(stage['count'] for stage in stats)
+    st.caption(f"{total} mesures de ce serveur depuis son démarrage (tampon circulaire de {tracing.BUFFER_SIZE}).")
+    
+    st.dataframe([{
+        'Étape': stage['name'],
+        'Appels': stage['count'],
+        'p50 (ms)': round(stage['p50_ms'], 2),
+        'p95 (ms)': round(stage['p95_ms'], 2),
+        'Max (ms)': round(stage['max_ms'], 2),
+        'Requêtes SQL / appel': round(stage['db_queries'], 1),
+        'Lignes / appel': round(stage['db_rows'], 1),
+        'Erreurs': stage['errors'],
+    } for stage in stats], use_container_width=True, hide_index=True)
+    
+    if st.button("Réinitialiser les mesures", key="perf_clear"):
+        tracing.clear()
+        st.rerun()
+
+def show_rule_telemetry():
+    st.subheader("Règles d'extraction")
+    
+    if not rule_telemetry.is_enabled():
+        st.info("La télémétrie des règles est désactivée (OTA_RULE_TELEMETRY=1 pour l'activer).")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Enregistrer les compteurs en attente", key="rules_flush"):
+            try:
+                rule_telemetry.flush()
+            except Exception:
+                pass  # reported just below; the counters stay pending
+    with col2:
+        if st.button("Réinitialiser les statistiques", key="rules_reset"):
+            rule_telemetry.clear()
+            rule_telemetry.reset_rule_stats()
+            st.rerun()
+    
+    flush_error = rule_telemetry.last_flush_error()
+    if flush_error:
+        st.warning(f"Échec du dernier enregistrement des compteurs ({flush_error}) : "
+                   "ils restent en mémoire et seront réécrits au prochain essai.")
+    
+    rules = rule_telemetry.rule_report()
+    if not rules:
+        st.info("Aucune statistique enregistrée pour le moment.")
+        return
+    
+    verdicts = {'backtracking': '⚠️ Backtracking', 'morte': '💤 Jamais utilisée', '': ''}
+    st.caption(
+        "Backtracking : plus de "
+        f"{rule_telemetry.BACKTRACKING_US_PER_KB} µs par Ko de texte sur au moins un email."
+    )
+    st.dataframe([{
+        'Diagnostic': verdicts[rule['verdict']],
+        'Fonction': rule['site'],
+        'Motif': rule['pattern'],
+        'Appels': rule['calls'],
+        'Succès': rule['hits'],
+        'Moyenne (µs)': round(rule['avg_us'], 1),
+        'Max (µs)': round(rule['max_us'], 1),
+        'Taille au max (car.)': rule['max_chars'],
+        'Pire µs / Ko': round(rule['worst_us_per_kb'], 1),
+        'Total (ms)': round(rule['total_us'] / 1000, 1),
+    } for rule in rules], use_container_width=True, hide_index=True)
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'causse_comtal_exports')
+# Le bouton de téléchargement charge le fichier en mémoire : au-delà, l'export
+# se fait en ligne de commande (python exports.py).
+EXPORT_DOWNLOAD_MAX_MB = float(os.environ.get('OTA_EXPORT_DOWNLOAD_MAX_MB', '100'))
+# Fichiers d'export laissés par d'autres sessions, supprimés au prochain export.
+EXPORT_RETENTION_HOURS = 24
+
+def purge_old_exports():
+    """Supprime les fichiers de EXPORT_DIR plus anciens que EXPORT_RETENTION_HOURS."""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    limit = datetime.now().timestamp() - EXPORT_RETENTION_HOURS * 3600
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def show_exports():
+    st.subheader("Exports")
+    st.caption("Les lignes sont lues par lots et écrites au fil de l'eau dans un fichier, "
+               "quelle que soit la période : adapté aux exports annuels de la comptabilité.")
+    
+    col_table, col_format = st.columns(2)
+    with col_table:
+        table = st.selectbox("Données", list(exports.EXPORT_TABLES),
+                             format_func=lambda t: exports.EXPORT_TABLES[t]['label'], key="export_table")
+    with col_format:
+        fmt = st.selectbox("Format", exports.available_formats(),
+                           format_func=lambda f: exports.EXPORT_FORMATS[f]['label'], key="export_format")
+    
+    columns = st.multiselect("Colonnes", exports.EXPORT_TABLES[table]['columns'],
+                             default=list(exports.EXPORT_TABLES[table]['default_columns']),
+                             key=f"export_columns_{table}")
+    date_range = st.date_input("Période (toute la table si vide)", value=(), format="DD/MM/YYYY", key="export_range")
+    
+    if st.button("Préparer l'export", key="export_run", type="primary", disabled=not columns):
+        date_from = date_to = None
+        if len(date_range) >= 1:
+            date_from = datetime.combine(date_range[0], time.min)
+            date_to = datetime.combine(date_range[-1] + timedelta(days=1), time.min)
+        previous = st.session_state.pop('export_file', None)
+        if previous and os.path.exists(previous['path']):
+            os.remove(previous['path'])
+        purge_old_exports()
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        file_name = f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{exports.EXPORT_FORMATS[fmt]['extension']}"
+        path = os.path.join(EXPORT_DIR, file_name)
+        try:
+            with st.spinner("Export en cours..."):
+                count = exports.export_to_file(table, fmt, path, columns, date_from, date_to)
+        except Exception as e:
+            st.error(f"Erreur lors de l'export : {e}")
+        else:
+            st.session_state['export_file'] = {'path': path, 'name': file_name, 'count': count, 'format': fmt,
+                                               'table': table}
+            current_user = st.session_state.get('user', {})
+            record_activity(current_user.get('id'), current_user.get('username'), 'data_exported',
+                            f"{exports.EXPORT_TABLES[table]['label']} : {count} lignes ({fmt})")
+    
+    export_file = st.session_state.get('export_file')
+    if export_file and os.path.exists(export_file['path']):
+        size_mb = os.path.getsize(export_file['path']) / 1024 / 1024
+        st.success(f"{export_file['count']} lignes exportées ({size_mb:.1f} Mo).")
+        if size_mb > EXPORT_DOWNLOAD_MAX_MB:
+            st.warning(f"Fichier trop volumineux pour le téléchargement depuis le navigateur "
+                       f"(limite {EXPORT_DOWNLOAD_MAX_MB:.0f} Mo) : réduisez la période ou utilisez "
+                       f"`python exports.py {export_file['table']} {export_file['name']}` sur le serveur.")
+            return
+        with open(export_file['path'], 'rb') as f:
+            st.download_button("Télécharger", data=f, file_name=export_file['name'],
+                               mime=exports.EXPORT_FORMATS[export_file['format']]['mime'],
+                               key="export_download", use_container_width=True)
@@ -0,0 +1,73 @@
+"""
+Cache des données lues à chaque rerun Streamlit (utilisateurs, journal, agrégats de chiffre d'affaires).
+Les entrées expirent après un TTL et sont invalidées par les actions qui les modifient.
+"""
+import streamlit as st
+from auth import get_all_users, count_admins
+from activity_log import log_activity, get_activity_logs_page
+from analytics import get_daily_rollups, get_platform_totals
+
+USERS_TTL = 300
+LOGS_TTL = 30
+SUMMARIES_TTL = 60
+
+
+@st.cache_data(ttl=USERS_TTL, show_spinner=False)
+def cached_users():
+    return [dict(user) for user in get_all_users()]
+
+
+@st.cache_data(ttl=USERS_TTL, show_spinner=False)
+def cached_admin_count():
+    return count_admins()
+
+
+@st.cache_data(ttl=LOGS_TTL, show_spinner=False)
+def cached_latest_logs(page_size, username=None, action_type=None, date_from=None, date_to=None):
+    logs, next_cursor = get_activity_logs_page(page_size, None, username, action_type, date_from, date_to)
+    return [dict(log) for log in logs], next_cursor
+
+
+@st.cache_data(ttl=LOGS_TTL * 20, show_spinner=False)
+def cached_older_logs(page_size, before, username=None, action_type=None, date_from=None, date_to=None):
+    # Les pages situées avant un curseur ne changent pas quand une action est
+    # journalisée : seule la première page est invalidée.
+    logs, next_cursor = get_activity_logs_page(page_size, before, username, action_type, date_from, date_to)
+    return [dict(log) for log in logs], next_cursor
+
+
+def cached_logs_page(page_size, before=None, username=None, action_type=None, date_from=None, date_to=None):
+    if before is None:
+        return cached_latest_logs(page_size, username, action_type, date_from, date_to)
+    return cached_older_logs(page_size, before, username, action_type, date_from, date_to)
+
+
+@st.cache_data(ttl=SUMMARIES_TTL, show_spinner=False)
+def cached_daily_rollups(date_from, date_to, platform=None):
+    return get_daily_rollups(date_from, date_to, platform)
+
+
+@st.cache_data(ttl=SUMMARIES_TTL, show_spinner=False)
+def cached_platform_totals(date_from, date_to):
+    return get_platform_totals(date_from, date_to)
+
+
+def invalidate_users():
+    """À appeler après toute création, suppression ou modification d'utilisateur."""
+    cached_users.clear()
+    cached_admin_count.clear()
+
+
+def invalidate_logs():
+    cached_latest_logs.clear()
+
+
+def invalidate_summaries():
+    cached_daily_rollups.clear()
+    cached_platform_totals.clear()
+
+
+def record_activity(user_id, username, action_type, action_details=None):
+    """Journalise une action et invalide les pages du journal devenues obsolètes."""
+    log_activity(user_id, username, action_type, action_details)
+    invalidate_logs()
@@ -1,7 +1,13 @@
 import streamlit as st
 from datetime import datetime
 from cms_parser import process_pms_file, parse_csv_data, generate_markdown_table
-from activity_log import log_activity
+from views.cache import record_activity
+
+@st.cache_resource(show_spinner=False)
+def ensure_cms_seen_table():
+    from cms_incremental import init_cms_seen_table
+    init_cms_seen_table()
+    return True
 
 def run():
     st.title("CMS Helper")
@@ -44,6 +50,18 @@ def run():
         format_func=lambda x: {";" : "Point-virgule (;)", "," : "Virgule (,)", "\t" : "Tabulation"}[x]
     )
     
+    incremental = st.checkbox(
+        "Mode incrémental : uniquement les clients nouveaux ou modifiés depuis le dernier export",
+        key="cms_incremental",
+        help="Les lignes déjà transmises au CMS (même référence, mêmes nom, email et date) sont ignorées."
+    )
+    
+    dedupe = st.checkbox(
+        "Dédoublonner les clients (variantes d'orthographe, adresses relais)",
+        key="cms_dedupe",
+        help="Une seule ligne par client : son check-in le plus récent, avec une adresse email réelle si l'une de ses lignes en a une."
+    )
+    
     process_button = st.button("Transformer les données", type="primary", use_container_width=True)
     
     if process_button:
@@ -51,17 +69,48 @@ def run():
             st.error("Veuillez importer un fichier ou coller des données.")
         else:
             try:
-                df, markdown_output = process_pms_file(
-                    st.session_state['cms_file_content'], 
-                    separator
-                )
+                if incremental:
+                    from cms_incremental import process_pms_file_incremental, record_seen
+                    ensure_cms_seen_table()
+                    # The seen-set is only updated once the export is downloaded or confirmed.
+                    df, markdown_output, stats = process_pms_file_incremental(
+                        st.session_state['cms_file_content'],
+                        separator=separator,
+                        mark_seen=False
+                    )
+                    seen_rows = stats.pop('seen_rows')
+                    if not seen_rows['emitted']:
+                        # Nothing to send: only the retention of the guests still present is refreshed.
+                        record_seen(seen_rows)
+                        seen_rows = None
+                    details = (f"Incrémental : {stats['new']} nouveaux, {stats['changed']} modifiés, "
+                               f"{stats['unchanged']} inchangés sur {stats['total']}")
+                else:
+                    df, markdown_output = process_pms_file(
+                        st.session_state['cms_file_content'], 
+                        separator
+                    )
+                    stats = None
+                    seen_rows = None
+                    details = f"{len(df)} enregistrements traités"
+                
+                dedupe_stats = None
+                if dedupe and len(df):
+                    from guest_index import dedupe_cms
+                    df, dedupe_stats = dedupe_cms(df, summaries_for_checkins(df))
+                    markdown_output = generate_markdown_table(df)
+                    details += f", {dedupe_stats['merged']} doublons fusionnés"
                 
                 st.session_state['cms_df'] = df
                 st.session_state['cms_markdown'] = markdown_output
+                st.session_state['cms_stats'] = stats
+                st.session_state['cms_seen_pending'] = seen_rows
+                st.session_state['cms_seen_recorded'] = False
+                st.session_state['cms_dedupe_stats'] = dedupe_stats
                 st.session_state['cms_processed'] = True
                 
                 current_user = st.session_state.get('user', {})
-                log_activity(current_user.get('id'), current_user.get('username'), 'cms_helper_generate', f"{len(df)} enregistrements traités")
+                record_activity(current_user.get('id'), current_user.get('username'), 'cms_helper_generate', details)
                 
             except Exception as e:
                 st.error(f"Erreur lors du traitement : {str(e)}")
@@ -74,6 +123,14 @@ def run():
         df = st.session_state.get('cms_df')
         if df is not None:
             st.write(f"**{len(df)} enregistrements traités**")
+            stats = st.session_state.get('cms_stats')
+            if stats:
+                st.caption(f"Mode incrémental : {stats['new']} nouveaux, {stats['changed']} modifiés, "
+                           f"{stats['unchanged']} déjà transmis (ignorés) sur {stats['total']} lignes du fichier.")
+            dedupe_stats = st.session_state.get('cms_dedupe_stats')
+            if dedupe_stats:
+                st.caption(f"Dédoublonnage : {dedupe_stats['rows']} lignes -> {len(df)} clients "
+                           f"({dedupe_stats['merged']} doublons fusionnés).")
             
             with st.expander("Aperçu des données transformées", expanded=True):
                 st.dataframe(df, use_container_width=True)
@@ -97,6 +154,7 @@ def run():
                     data=markdown_output,
                     file_name=f"cms_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
                     mime="text/plain",
+                    on_click=confirm_cms_export,
                     use_container_width=True
                 )
             
@@ -107,11 +165,20 @@ def run():
                     data=csv_output,
                     file_name=f"cms_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                     mime="text/csv",
+                    on_click=confirm_cms_export,
                     use_container_width=True
                 )
-    
+            
+            show_seen_confirmation()
+
+    if st.session_state.get('cms_file_content'):
+        show_reconciliation(separator)
+
+    if incremental:
+        show_seen_reset()
+
     st.markdown("---")
-    
+
     with st.expander("Format d'entrée attendu"):
         st.markdown("""
         **Colonnes requises :**
@@ -134,3 +201,105 @@ def run():
         [Données ligne par ligne]
         ```
         """)
+
+def confirm_cms_export():
+    """Enregistre l'export incrémental affiché comme transmis au CMS."""
+    from cms_incremental import DEFAULT_HOTEL, record_seen
+    
+    seen_rows = st.session_state.get('cms_seen_pending')
+    if not seen_rows:
+        return
+    try:
+        ensure_cms_seen_table()
+        record_seen(seen_rows, DEFAULT_HOTEL)
+    except Exception as e:
+        st.session_state['cms_seen_error'] = str(e)
+        return
+    st.session_state['cms_seen_pending'] = None
+    st.session_state['cms_seen_recorded'] = True
+    st.session_state['cms_seen_error'] = None
+
+def show_seen_confirmation():
+    """État de l'export incrémental : en attente de transmission ou enregistré."""
+    error = st.session_state.get('cms_seen_error')
+    if error:
+        st.error(f"Erreur lors de l'enregistrement de l'export : {error}")
+    if st.session_state.get('cms_seen_pending'):
+        st.info("Mode incrémental : ces clients seront considérés comme transmis au téléchargement, "
+                "ou après confirmation si le tableau est copié-collé.")
+        st.button("Confirmer l'envoi au CMS", on_click=confirm_cms_export, use_container_width=True)
+    elif st.session_state.get('cms_seen_recorded'):
+        st.success("Export enregistré : ces clients ne seront plus transmis tant qu'ils ne changent pas.")
+
+def show_reconciliation(separator):
+    """Rapprochement de l'export PMS avec les résumés OTA enregistrés (audit de nuit)."""
+    import pandas as pd
+    from reconcile import STATUS_LABELS, count_statuses, reconcile_pms_file
+    
+    st.markdown("---")
+    st.subheader("Rapprochement avec les résumés OTA")
+    st.caption("Compare chaque ligne du PMS aux résumés enregistrés (référence, puis nom + date d'arrivée) "
+               "et signale les résumés manquants et les écarts entre le tarif et le CA TTC.")
+    
+    if st.button("Rapprocher avec l'historique", use_container_width=True):
+        try:
+            lines = reconcile_pms_file(st.session_state['cms_file_content'], separator)
+        except Exception as e:
+            st.error(f"Erreur lors du rapprochement : {str(e)}")
+            return
+        st.session_state['cms_reconciliation'] = lines
+        current_user = st.session_state.get('user', {})
+        counts = count_statuses(lines)
+        record_activity(current_user.get('id'), current_user.get('username'), 'cms_reconciliation',
+                        f"{counts['price_mismatch']} écarts, {counts['amount_missing']} montants non comparables, "
+                        f"{counts['missing_summary']} résumés manquants")
+    
+    lines = st.session_state.get('cms_reconciliation')
+    if lines is None:
+        return
+    
+    counts = count_statuses(lines)
+    columns = st.columns(len(STATUS_LABELS))
+    for column, (status, label) in zip(columns, STATUS_LABELS.items()):
+        column.metric(label, counts[status])
+    
+    only_issues = st.checkbox("Afficher uniquement les anomalies", value=True)
+    shown = [line for line in lines if line['status'] != 'ok'] if only_issues else lines
+    if not shown:
+        st.success("Aucune anomalie : toutes les lignes du PMS ont un résumé au bon tarif.")
+        return
+    df = pd.DataFrame(shown)
+    df['status'] = df['status'].map(STATUS_LABELS)
+    df = df.rename(columns={
+        'status': 'Statut', 'pms_reference': 'Référence PMS', 'pms_name': 'Nom',
+        'arrival_date': 'Arrivée', 'pms_amount': 'CA TTC', 'tarif': 'Tarif OTA', 'difference': 'Écart',
+        'platform': 'Plateforme', 'reservation_id': 'Réf. OTA', 'matched_on': 'Rapproché par',
+    })
+    st.dataframe(df[['Statut', 'Référence PMS', 'Nom', 'Arrivée', 'CA TTC', 'Tarif OTA', 'Écart',
+                     'Plateforme', 'Réf. OTA', 'Rapproché par']], use_container_width=True, hide_index=True)
+
+def summaries_for_checkins(df):
+    """Résumés OTA arrivant sur la période du tableau : ils relient les variantes d'un même client."""
+    from database import get_arrivals_between
+    from date_parsing import normalize_date
+    
+    days = [day for day in (normalize_date(value) for value in df['Date de checkin'].unique() if value != '_') if day]
+    if not days:
+        return []
+    try:
+        return get_arrivals_between(min(days), max(days))
+    except Exception as e:
+        st.warning(f"Résumés OTA indisponibles ({str(e)}) : dédoublonnage sur les seules lignes du PMS.")
+        return []
+
+def show_seen_reset():
+    """Oubli des exports précédents : le prochain export incrémental sera complet."""
+    from cms_incremental import DEFAULT_HOTEL, forget_hotel
+    
+    with st.expander("Historique du mode incrémental"):
+        st.caption(f"Établissement : {DEFAULT_HOTEL}. Les clients absents des exports depuis "
+                   "plusieurs mois sont oubliés automatiquement.")
+        if st.button("Oublier les exports précédents"):
+            ensure_cms_seen_table()
+            deleted = forget_hotel(DEFAULT_HOTEL)
+            st.success(f"{deleted} clients oubliés : le prochain export sera transmis en entier.")
@@ -8,10 +8,22 @@ from parsers import (
     OTA_PLATFORMS
 )
 from database import init_db, save_summary
-from activity_log import log_activity
+from preprocess import preprocess_email
+from differential import run_shadow
+from tracing import span
+from views.cache import invalidate_summaries, record_activity
 
-def run():
+PLATFORM_OPTIONS = [("auto", "Détection automatique")] + [(pid, cfg['name']) for pid, cfg in OTA_PLATFORMS.items()]
+PLATFORM_LABELS = [label for _, label in PLATFORM_OPTIONS]
+PLATFORM_IDS = [pid for pid, _ in PLATFORM_OPTIONS]
+
+@st.cache_resource(show_spinner=False)
+def ensure_summaries_table():
     init_db()
+    return True
+
+def run():
+    ensure_summaries_table()
     
     st.title("OTA Helper")
     st.markdown("Transformez vos emails de réservation en résumés standardisés pour le PMS")
@@ -27,16 +39,18 @@ def run():
             key="email_input"
         )
         
-        platform_options = [("auto", "Détection automatique")] + [(pid, cfg['name']) for pid, cfg in OTA_PLATFORMS.items()]
-        platform_labels = [label for _, label in platform_options]
-        platform_ids = [pid for pid, _ in platform_options]
+        eml_file = st.file_uploader(
+            "Ou importez l'email (.eml)",
+            type=["eml"],
+            key="eml_file"
+        )
         
         selected_platform_label = st.selectbox(
             "Plateforme OTA",
-            platform_labels,
+            PLATFORM_LABELS,
             index=0
         )
-        selected_platform = platform_ids[platform_labels.index(selected_platform_label)]
+        selected_platform = PLATFORM_IDS[PLATFORM_LABELS.index(selected_platform_label)]
         
         receptionist_name = st.text_input(
             "Nom du Réceptionniste",
@@ -53,29 +67,49 @@ def run():
         st.subheader("Résumé formaté")
         
         if generate_button:
-            if not email_input.strip():
+            raw_email = eml_file.getvalue() if eml_file is not None else email_input
+            if eml_file is None and not email_input.strip():
                 st.error("Veuillez coller le contenu de l'email.")
             elif not receptionist_name.strip():
                 st.error("Veuillez entrer votre nom.")
             else:
-                if selected_platform == "auto":
-                    detected = detect_platform(email_input)
-                else:
-                    detected = selected_platform
+                with span('ota.generate'):
+                    with span('ota.preprocess'):
+                        email_text = preprocess_email(raw_email)
+                    
+                    with span('ota.detect'):
+                        if selected_platform == "auto":
+                            detected = detect_platform(email_text)
+                        else:
+                            detected = selected_platform
+                    
+                    st.session_state['detected_platform'] = OTA_PLATFORMS.get(detected, {}).get('name', detected)
+                    
+                    with span('ota.parse'):
+                        data = parse_email(email_text, detected)
+                    with span('ota.render'):
+                        summary = generate_summary(data, receptionist_name.strip())
+                    
+                    try:
+                        if isinstance(raw_email, bytes):
+                            raw_email = raw_email.decode('utf-8', errors='replace')
+                        save_summary(data, summary, receptionist_name.strip(), raw_email)
+                        invalidate_summaries()
+                        st.session_state['saved'] = True
+                        current_user = st.session_state.get('user', {})
+                        platform_name = OTA_PLATFORMS.get(detected, {}).get('name', detected)
+                        record_activity(current_user.get('id'), current_user.get('username'), 'ota_helper_generate', f"Plateforme: {platform_name}")
+                    except Exception as e:
+                        st.session_state['saved'] = False
                 
-                st.session_state['detected_platform'] = OTA_PLATFORMS.get(detected, {}).get('name', detected)
+                current_user = st.session_state.get('user', {})
+                user_id, username = current_user.get('id'), current_user.get('username')
                 
-                data = parse_email(email_input, detected)
-                summary = generate_summary(data, receptionist_name.strip())
+                def log_shadow_mismatch(diffs):
+                    fields = ", ".join(field for field, _, _ in diffs)
+                    record_activity(user_id, username, 'parser_shadow_mismatch', f"Plateforme: {detected} — {fields}"[:500])
                 
-                try:
-                    save_summary(data, summary, receptionist_name.strip(), email_input)
-                    st.session_state['saved'] = True
-                    current_user = st.session_state.get('user', {})
-                    platform_name = OTA_PLATFORMS.get(detected, {}).get('name', detected)
-                    log_activity(current_user.get('id'), current_user.get('username'), 'ota_helper_generate', f"Plateforme: {platform_name}")
-                except Exception as e:
-                    st.session_state['saved'] = False
+                run_shadow(raw_email, detected, data, summary, receptionist_name.strip(), log_shadow_mismatch)
                 
                 st.session_state['summary'] = summary
                 st.session_state['data'] = data